@@ -0,0 +1,100 @@
+"""Background job that keeps old completed tasks out of the tasks table.
+
+Done tasks stay on the board, and in every tasks index, until someone
+deletes them, so a long-lived account's working set only grows. Every
+archive_interval_minutes, ArchiveJob moves the Done tasks completed more
+than archive_after_days ago into archived_tasks, with their subtasks.
+
+Each batch of archive_batch_size tasks is one crud.archive_completed_tasks
+transaction, sent through run_write so it queues with the other writes
+under group commit. The job pauses archive_pause_ms between batches so
+interactive writes get the lock. Archived tasks are listed at
+GET /tasks/archive and come back on restore, or when moved out of Done.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+import crud
+from config import settings
+from database import SessionLocal
+from write_queue import run_write
+
+logger = logging.getLogger("blitzit.archive")
+
+class ArchiveJob:
+    def __init__(self, after_days: int, batch_size: int, interval_minutes: float, pause_ms: float):
+        self.after_days = after_days
+        self.batch_size = max(batch_size, 1)
+        self.interval = interval_minutes * 60
+        self.pause = pause_ms / 1000
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._runs = 0
+        self._archived = 0
+        self._last_run = None
+        self._last_seconds = 0.0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None and self.after_days > 0:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="archive", daemon=True)
+                self._thread.start()
+
+    def run_once(self) -> int:
+        """Archive everything old enough now, batch by batch; returns how many tasks moved."""
+        start = time.perf_counter()
+        completed_before = datetime.utcnow() - timedelta(days=self.after_days)
+        archived = 0
+        db = SessionLocal()
+        try:
+            while not self._stop.is_set():
+                moved = run_write(
+                    db, crud.archive_completed_tasks, completed_before=completed_before, batch_size=self.batch_size
+                )
+                archived += moved
+                if moved < self.batch_size:
+                    break
+                time.sleep(self.pause)
+        finally:
+            db.close()
+        with self._lock:
+            self._runs += 1
+            self._archived += archived
+            self._last_run = datetime.utcnow()
+            self._last_seconds = time.perf_counter() - start
+        return archived
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                # Retried next interval
+                logger.exception("Archiving completed tasks failed")
+            self._stop.wait(self.interval)
+
+    def shutdown(self):
+        self._stop.set()
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout=5)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "runs": self._runs,
+                "archived": self._archived,
+                "last_run": self._last_run.isoformat() if self._last_run else None,
+                "last_run_seconds": round(self._last_seconds, 3),
+            }
+
+archive_job = ArchiveJob(
+    after_days=settings.archive_after_days,
+    batch_size=settings.archive_batch_size,
+    interval_minutes=settings.archive_interval_minutes,
+    pause_ms=settings.archive_pause_ms,
+)
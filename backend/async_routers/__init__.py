@@ -0,0 +1,4 @@
+"""The data routers as async def, for settings.async_database.
+
+The endpoints of routers/ served over an AsyncSession (see endpoints.py).
+"""
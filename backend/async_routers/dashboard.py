@@ -0,0 +1,3 @@
+from routers.dashboard import endpoints
+
+router = endpoints.async_router()
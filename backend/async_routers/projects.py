@@ -0,0 +1,3 @@
+from routers.projects import endpoints
+
+router = endpoints.async_router()
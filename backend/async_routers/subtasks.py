@@ -0,0 +1,3 @@
+from routers.subtasks import endpoints
+
+router = endpoints.async_router()
@@ -0,0 +1,3 @@
+from routers.sync import endpoints
+
+router = endpoints.async_router()
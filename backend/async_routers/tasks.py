@@ -0,0 +1,3 @@
+from routers.tasks import endpoints
+
+router = endpoints.async_router()
@@ -4,9 +4,10 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from sqlalchemy.orm import Session
-from database import get_db
+from database import get_db, get_async_db
 from config import settings
 import crud
+from cache import user_cache, UserPrincipal
 from schemas import TokenData
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -21,26 +22,53 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _token_subject(token: str) -> str:
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
         username: str = payload.get("sub")
         if username is None:
-            raise credentials_exception
+            raise _credentials_exception()
         token_data = TokenData(username=username)
     except JWTError:
-        raise credentials_exception
-    user = crud.get_user_by_username(db, username=token_data.username)
+        raise _credentials_exception()
+    return token_data.username
+
+def _cache_principal(username: str, user):
     if user is None:
-        raise credentials_exception
-    return user
+        raise _credentials_exception()
+    principal = UserPrincipal(id=user.id, username=user.username, is_active=user.is_active)
+    user_cache.set(username, principal)
+    return principal
+
+# Plain def, not async def: FastAPI runs sync dependencies in its thread pool,
+# so the user lookup below never blocks the event loop.
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    username = _token_subject(token)
+    principal = user_cache.get(username)
+    if principal is None:
+        principal = _cache_principal(username, crud.get_user_by_username(db, username=username))
+    return principal
 
-async def get_current_active_user(current_user: crud.User = Depends(get_current_user)):
+def get_current_active_user(current_user: UserPrincipal = Depends(get_current_user)):
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
+
+# Async mode: the lookup awaits an AsyncSession instead of taking a thread
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db = Depends(get_async_db)):
+    username = _token_subject(token)
+    principal = user_cache.get(username)
+    if principal is None:
+        user = await db.run_sync(crud.get_user_by_username, username=username)
+        principal = _cache_principal(username, user)
+    return principal
+
+async def get_current_active_user_async(current_user: UserPrincipal = Depends(get_current_user_async)):
+    return get_current_active_user(current_user)
@@ -0,0 +1,242 @@
+"""Content-negotiated response compression.
+
+CompressionMiddleware compresses response bodies of compressible types
+(JSON, text, XML) once they reach `minimum_size` bytes, with the best
+encoding the client accepts. zstd and Brotli are used when the zstandard
+and brotli packages are installed, and gzip always. Bodies are compressed
+as they stream: a response sent in several chunks is never buffered whole.
+
+A compressed response drops Content-Length unless it was sent in one
+chunk, and gets Vary: Accept-Encoding. When the client accepts an
+encoding, ETags are made weak: the bytes may differ from the identity
+encoding, and conditional.py's weak comparison still answers
+If-None-Match with 304.
+
+Per-route byte totals before and after compression are kept in
+`compression_stats` (shown in /health) and exported as
+http_compression_bytes_total, to tune levels against CPU cost.
+"""
+import threading
+import zlib
+from collections import defaultdict
+from metrics import registry, route_label
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml", "+json", "+xml")
+NO_BODY_STATUSES = {204, 304}
+
+class _Gzip:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip container
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+class _Brotli:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+class _Zstd:
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+def available_encodings():
+    """Encodings this process can produce, most preferred first."""
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+def negotiate(accept_encoding: str, encodings) -> str:
+    """The best of `encodings` for an Accept-Encoding header, or None for identity.
+
+    The highest q-value wins; ties go to the earlier of `encodings`. "*"
+    covers the encodings the header does not name.
+    """
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name] = weight
+    best, best_weight = None, 0.0
+    for encoding in encodings:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+compressed_bytes = registry.counter(
+    "http_compression_bytes_total",
+    "Bytes of compressed response bodies before (stage=in) and after (stage=out) compression.",
+    ("route", "stage"),
+)
+
+class CompressionStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = defaultdict(lambda: {"responses": 0, "bytes_in": 0, "bytes_out": 0})
+
+    def record(self, route: str, bytes_in: int, bytes_out: int):
+        with self._lock:
+            totals = self._routes[route]
+            totals["responses"] += 1
+            totals["bytes_in"] += bytes_in
+            totals["bytes_out"] += bytes_out
+        compressed_bytes.inc(bytes_in, route=route, stage="in")
+        compressed_bytes.inc(bytes_out, route=route, stage="out")
+
+    def snapshot(self):
+        """Per route: compressed responses, bytes before and after, and their ratio."""
+        with self._lock:
+            return {
+                route: {**totals, "ratio": round(totals["bytes_out"] / totals["bytes_in"], 4) if totals["bytes_in"] else 1.0}
+                for route, totals in self._routes.items()
+            }
+
+compression_stats = CompressionStats()
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6,
+                 brotli_quality: int = 4, zstd_level: int = 3, stats: CompressionStats = compression_stats):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.stats = stats
+        self.encodings = available_encodings()
+        self._compressors = {
+            "gzip": lambda: _Gzip(gzip_level),
+            "br": lambda: _Brotli(brotli_quality),
+            "zstd": lambda: _Zstd(zstd_level),
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+        responder = _Responder(self, scope, send, negotiate(accept_encoding, self.encodings))
+        await self.app(scope, receive, responder.send)
+
+class _Responder:
+    def __init__(self, middleware: CompressionMiddleware, scope, send, encoding):
+        self.middleware = middleware
+        self.scope = scope
+        self._send = send
+        self.encoding = encoding
+        self.start = None
+        self.compressor = None
+        self.passthrough = False
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def _eligible(self, start) -> bool:
+        if start["status"] in NO_BODY_STATUSES or self.scope["method"] == "HEAD":
+            return False
+        content_type = ""
+        for name, value in start.get("headers", []):
+            if name == b"content-encoding":
+                return False
+            if name == b"content-type":
+                content_type = value.decode("latin-1").lower()
+        return any(kind in content_type for kind in COMPRESSIBLE_TYPES)
+
+    def _headers(self, content_length=None):
+        headers = []
+        vary = None
+        for name, value in self.start.get("headers", []):
+            if name == b"content-length":
+                continue
+            if name == b"vary":
+                vary = value
+                continue
+            headers.append((name, value))
+        vary = b"Accept-Encoding" if vary is None else vary + b", Accept-Encoding"
+        headers += [(b"content-encoding", self.encoding.encode()), (b"vary", vary)]
+        if content_length is not None:
+            headers.append((b"content-length", str(content_length).encode()))
+        return headers
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            if self.encoding is not None:
+                # Whether or not this body ends up compressed, so a 304 and
+                # small and large 200s all carry the same validator
+                message = {**message, "headers": [
+                    (name, b"W/" + value if name == b"etag" and not value.startswith(b"W/") else value)
+                    for name, value in message.get("headers", [])
+                ]}
+            self.start = message
+            self.passthrough = self.encoding is None or not self._eligible(message)
+            if self.passthrough:
+                await self._send(message)
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressor is None:
+            if not more_body and len(body) < self.middleware.minimum_size:
+                # Small and complete: not worth the CPU
+                self.passthrough = True
+                await self._send(self.start)
+                await self._send(message)
+                return
+            self.compressor = self.middleware._compressors[self.encoding]()
+            if not more_body:
+                compressed = self.compressor.compress(body) + self.compressor.finish()
+                self._record(len(body), len(compressed))
+                await self._send({**self.start, "headers": self._headers(len(compressed))})
+                await self._send({"type": "http.response.body", "body": compressed})
+                return
+            await self._send({**self.start, "headers": self._headers()})
+
+        self.bytes_in += len(body)
+        compressed = self.compressor.compress(body)
+        if not more_body:
+            compressed += self.compressor.finish()
+        self.bytes_out += len(compressed)
+        if not more_body:
+            self._record(self.bytes_in, self.bytes_out)
+        await self._send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+    def _record(self, bytes_in: int, bytes_out: int):
+        self.middleware.stats.record(route_label(self.scope), bytes_in, bytes_out)
@@ -0,0 +1,42 @@
+"""Conditional GET: ETags derived from the per-user revision.
+
+Every crud write bumps the owner's revision, so a list the client already
+holds is still current while the revision is unchanged. The revision is a
+single primary-key read, so a matching If-None-Match is answered with 304
+before the list query runs or anything is serialised.
+"""
+from typing import Optional
+from fastapi import Request, Response
+from sqlalchemy.orm import Session
+import crud
+
+def _etag(user_id: int, revision: int, parts) -> str:
+    tag = ".".join(str(part) for part in (user_id, revision, *parts))
+    return f'"{tag}"'
+
+def revision_etag(db: Session, user_id: int, *parts) -> str:
+    """A strong ETag for the user's data at its current revision.
+
+    `parts` distinguish representations that can change without a write,
+    such as a time bucket for figures that depend on the clock.
+    """
+    return _etag(user_id, crud.get_revision(db, user_id), parts)
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison
+    candidates = (candidate.strip() for candidate in if_none_match.split(","))
+    return etag in (candidate[2:] if candidate.startswith("W/") else candidate for candidate in candidates)
+
+def not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """Return a 304 response if the client's copy is current.
+
+    Otherwise set the validator headers on `response` and return None.
+    """
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
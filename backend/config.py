@@ -1,12 +1,97 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     database_url: str = "sqlite:///./blitzit.db"
+    # Serve the data routers as async def over an AsyncSession. The async URL
+    # defaults to database_url with its async driver (aiosqlite / asyncpg).
+    async_database: bool = False
+    async_database_url: Optional[str] = None
+    # SQLite pragmas applied to every new connection
+    sqlite_journal_mode: str = "WAL"  # readers no longer block behind a writer
+    sqlite_synchronous: str = "NORMAL"  # durable in WAL mode, fsync at checkpoints
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 268435456  # 256 MiB
+    sqlite_cache_size: int = -64000  # negative = KiB, so 64 MB of page cache
+    sqlite_foreign_keys: bool = True  # enforce foreign keys, so ON DELETE CASCADE applies
+    # Connection pool for server databases (Postgres)
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_pre_ping: bool = True
+    db_pool_recycle: int = 1800  # seconds
     secret_key: str = "your-secret-key-here-change-in-production"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    # Authenticated-user cache (size 0 or TTL 0 disables it)
+    user_cache_size: int = 1024
+    user_cache_ttl_seconds: float = 60.0
+    # Password hashing pool (0 workers hashes in the request thread);
+    # keep the queue limit below the request thread pool size
+    password_hash_workers: int = 2
+    password_hash_queue_limit: int = 16
+    # Group commit: route crud writes through one writer thread that commits
+    # concurrent requests' writes together, waiting up to the window for more
+    group_commit: bool = False
+    group_commit_max_batch: int = 64
+    group_commit_window_ms: float = 2.0
+    # Rank keys longer than this trigger a background rebalance of the column
+    rank_max_length: int = 24
+    # Projects with more tasks than one purge batch are hidden at once and
+    # their tasks deleted in batches after the response, pausing between
+    # batches so other writers get the database lock
+    project_purge_batch_size: int = 1000
+    project_purge_pause_ms: float = 50.0
+    # Done tasks completed more than archive_after_days ago are moved to the
+    # archive tables every archive_interval_minutes, a batch per transaction.
+    # Off (0 days) unless configured: archived tasks leave GET /tasks and the
+    # dashboard's task counts
+    archive_after_days: int = 0
+    archive_batch_size: int = 1000
+    archive_interval_minutes: float = 60.0
+    archive_pause_ms: float = 50.0
+    # Task reminders are sent by a scheduler thread (see reminders.py) that
+    # holds the next reminder_window_minutes of them in memory, to
+    # reminder_sink: "change_feed" (the owner's change stream) or "webhook"
+    # (a JSON POST to reminder_webhook_url)
+    reminders: bool = True
+    reminder_window_minutes: float = 60.0
+    reminder_sink: str = "change_feed"
+    reminder_webhook_url: Optional[str] = None
+    reminder_webhook_timeout_seconds: float = 5.0
+    # Events buffered per change-stream connection before it is told to resync
+    change_feed_buffer: int = 100
+    # Response compression (zstd and Brotli when their packages are installed,
+    # else gzip) for compressible bodies of at least compression_minimum_size
+    compression: bool = True
+    compression_minimum_size: int = 1024
+    compression_gzip_level: int = 6  # 1-9
+    compression_brotli_quality: int = 4  # 0-11
+    compression_zstd_level: int = 3  # 1-22
+    # Request and SQL metrics at /metrics (Prometheus format), plus a
+    # Server-Timing header on every response
+    metrics: bool = True
+    server_timing: bool = True
+    # Slow-query log: statements slower than the threshold are written with
+    # their query plan to a rotating JSON-lines file (see slow_queries.py)
+    slow_query_log: bool = False
+    slow_query_threshold_ms: float = 100.0
+    slow_query_log_path: str = "slow_queries.log"
+    slow_query_log_max_bytes: int = 10485760  # 10 MiB per file
+    slow_query_log_backups: int = 3
 
     class Config:
         env_file = ".env"
 
+    def get_async_database_url(self) -> str:
+        if self.async_database_url:
+            return self.async_database_url
+        for sync_prefix, async_prefix in (
+            ("sqlite://", "sqlite+aiosqlite://"),
+            ("postgresql://", "postgresql+asyncpg://"),
+            ("postgresql+psycopg2://", "postgresql+asyncpg://"),
+        ):
+            if self.database_url.startswith(sync_prefix):
+                return async_prefix + self.database_url[len(sync_prefix):]
+        return self.database_url
+
 settings = Settings()
@@ -1,11 +1,21 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func
-from models import User, Project, Task, SubTask
+from sqlalchemy.orm import Session, selectinload, joinedload
+from sqlalchemy import and_, or_, func, case, insert, update, select, literal
+from sqlalchemy.dialects import postgresql, sqlite
+from models import User, Project, Task, SubTask, ArchivedTask, ArchivedSubTask, TaskCounter, DailyUserStat, UserRevision, Tombstone
 from schemas import UserCreate, ProjectCreate, TaskCreate, SubTaskCreate
-from datetime import datetime, timedelta
-from passlib.context import CryptContext
+import schemas
+from fastjson import schema_columns, row_dicts
+from datetime import date, datetime, timedelta
+from collections import defaultdict
+from cache import user_cache
+from hashing import password_pool
+from events import change_feed
+from ranks import key_between, evenly_spaced_keys
+from config import settings
+import search
+import reminders
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+VALID_COLUMNS = ["Backlog", "This Week", "Today", "Done"]
 
 # User CRUD operations
 def get_user_by_email(db: Session, email: str):
@@ -15,7 +25,7 @@ def get_user_by_username(db: Session, username: str):
     return db.query(User).filter(User.username == username).first()
 
 def create_user(db: Session, user: UserCreate):
-    hashed_password = pwd_context.hash(user.password)
+    hashed_password = password_pool.hash(user.password)
     db_user = User(
         email=user.email,
         username=user.username,
@@ -27,8 +37,33 @@ def create_user(db: Session, user: UserCreate):
     db.refresh(db_user)
     return db_user
 
+def get_user(db: Session, user_id: int):
+    return db.query(User).filter(User.id == user_id).first()
+
+def update_user(db: Session, user_id: int, user_update: dict):
+    db_user = get_user(db, user_id)
+    if db_user:
+        # Cached principals are keyed by username, which may be about to change
+        old_username = db_user.username
+        for key, value in user_update.items():
+            if value is not None:
+                setattr(db_user, key, value)
+        db.commit()
+        user_cache.invalidate(old_username)
+        db.refresh(db_user)
+    return db_user
+
+def set_user_active(db: Session, user_id: int, is_active: bool):
+    db_user = get_user(db, user_id)
+    if db_user:
+        db_user.is_active = is_active
+        db.commit()
+        user_cache.invalidate(db_user.username)
+        db.refresh(db_user)
+    return db_user
+
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_pool.verify(plain_password, hashed_password)
 
 def authenticate_user(db: Session, username: str, password: str):
     user = get_user_by_username(db, username)
@@ -38,20 +73,126 @@ def authenticate_user(db: Session, username: str, password: str):
         return False
     return user
 
+# Per-user revisions
+def get_revision(db: Session, user_id: int):
+    revision = db.query(UserRevision.revision).filter(UserRevision.owner_id == user_id).scalar()
+    return revision or 0
+
+def _bump_revision(db: Session, user_id: int):
+    """Advance the user's revision in the caller's transaction and return it."""
+    updated = db.query(UserRevision).filter(UserRevision.owner_id == user_id).update(
+        {UserRevision.revision: UserRevision.revision + 1}, synchronize_session=False
+    )
+    if not updated:
+        db.add(UserRevision(owner_id=user_id, revision=1))
+        db.flush()
+    return get_revision(db, user_id)
+
+def _add_tombstones(db: Session, user_id: int, entity: str, entity_ids, revision: int):
+    """Record deleted rows for /sync, in the caller's transaction."""
+    now = datetime.utcnow()
+    rows = [
+        {"owner_id": user_id, "entity": entity, "entity_id": entity_id, "revision": revision, "deleted_at": now}
+        for entity_id in entity_ids
+    ]
+    if rows:
+        db.execute(insert(Tombstone), rows)
+
+def _publish(db: Session, user_id: int, *events):
+    """Announce committed changes on the user's change feed.
+
+    A session that commits later than crud thinks (the group-commit writer)
+    collects the events in db.info and publishes them after its commit.
+    """
+    deferred = db.info.get("deferred_events")
+    if deferred is not None:
+        deferred.append((user_id, events))
+    else:
+        change_feed.publish(user_id, events)
+
+def _schedule_reminders(db: Session, changes):
+    """Hand committed (task id, remind_at) changes to the reminder scheduler, deferred like _publish."""
+    deferred = db.info.get("deferred_reminders")
+    if deferred is not None:
+        deferred.extend(changes)
+    elif changes:
+        reminders.reminder_scheduler.schedule_many(changes)
+
+def _task_update_event(task_id: int, revision: int, before, after):
+    if after["column"] == before["column"]:
+        kind = "task.updated"
+    elif after["column"] == "Done":
+        kind = "task.completed"
+    else:
+        kind = "task.moved"
+    return {"type": kind, "id": task_id, "revision": revision, "column": after["column"]}
+
+def get_changes(db: Session, user_id: int, since: int = 0):
+    """Everything that changed after revision `since`, for incremental sync.
+
+    With since=0 every live row is returned and no deletions. A project
+    tombstone also stands for the project's tasks, and a task tombstone for
+    the task's subtasks. The returned revision is
+    read first, so a write racing with the sync is at worst sent again.
+    """
+    revision = get_revision(db, user_id)
+    projects = db.query(Project).filter(Project.owner_id == user_id, Project.deleted_at.is_(None))
+    tasks = db.query(Task).filter(Task.owner_id == user_id, _in_live_project(user_id))
+    subtasks = db.query(SubTask).join(Task, SubTask.parent_task_id == Task.id).filter(
+        Task.owner_id == user_id, _in_live_project(user_id)
+    )
+    deleted = {"projects": [], "tasks": [], "subtasks": []}
+    if since:
+        projects = projects.filter(Project.revision > since)
+        tasks = tasks.filter(Task.revision > since)
+        subtasks = subtasks.filter(SubTask.revision > since)
+        tombstones = db.query(Tombstone.entity, Tombstone.entity_id).filter(
+            Tombstone.owner_id == user_id, Tombstone.revision > since
+        ).order_by(Tombstone.id)
+        for entity, entity_id in tombstones:
+            deleted[entity + "s"].append(entity_id)
+    return {
+        "revision": revision,
+        "projects": projects.order_by(Project.id).all(),
+        "tasks": tasks.order_by(Task.id).all(),
+        "subtasks": subtasks.order_by(SubTask.id).all(),
+        "deleted": deleted,
+    }
+
 # Project CRUD operations
+def _in_live_project(user_id: int = None, model=Task):
+    """Filter for tasks (or archived tasks) outside projects deleted and waiting to be purged.
+
+    The deleted projects are found once per statement (an uncorrelated
+    subquery on the deleted_at index), not looked up per task.
+    """
+    deleted = select(Project.id).where(Project.deleted_at.isnot(None))
+    if user_id is not None:
+        deleted = deleted.where(Project.owner_id == user_id)
+    return or_(model.project_id.is_(None), model.project_id.notin_(deleted))
+
 def get_projects(db: Session, user_id: int):
-    return db.query(Project).filter(Project.owner_id == user_id).all()
+    return db.query(Project).filter(Project.owner_id == user_id, Project.deleted_at.is_(None)).all()
+
+PROJECT_COLUMNS = schema_columns(schemas.Project, Project)
+
+def get_project_rows(db: Session, user_id: int):
+    """get_projects as plain dicts shaped like schemas.Project (see fastjson.py)."""
+    names, columns = zip(*PROJECT_COLUMNS)
+    return row_dicts(names, db.query(*columns).filter(Project.owner_id == user_id, Project.deleted_at.is_(None)))
 
 def create_project(db: Session, project: ProjectCreate, user_id: int):
     db_project = Project(**project.dict(), owner_id=user_id)
     db.add(db_project)
+    db_project.revision = _bump_revision(db, user_id)
     db.commit()
     db.refresh(db_project)
+    _publish(db, user_id, {"type": "project.created", "id": db_project.id, "revision": db_project.revision})
     return db_project
 
 def get_project(db: Session, project_id: int, user_id: int):
     return db.query(Project).filter(
-        and_(Project.id == project_id, Project.owner_id == user_id)
+        and_(Project.id == project_id, Project.owner_id == user_id, Project.deleted_at.is_(None))
     ).first()
 
 def update_project(db: Session, project_id: int, project_update: dict, user_id: int):
@@ -61,74 +202,709 @@ def update_project(db: Session, project_id: int, project_update: dict, user_id:
             if value is not None:
                 setattr(db_project, key, value)
         db_project.updated_at = datetime.utcnow()
+        db_project.revision = _bump_revision(db, user_id)
         db.commit()
         db.refresh(db_project)
+        _publish(db, user_id, {"type": "project.updated", "id": db_project.id, "revision": db_project.revision})
     return db_project
 
+def _delete_tasks(db: Session, task_ids, task_model=Task, subtask_model=SubTask):
+    """Delete tasks and their subtasks in two set-based statements."""
+    db.query(subtask_model).filter(subtask_model.parent_task_id.in_(task_ids)).delete(synchronize_session=False)
+    db.query(task_model).filter(task_model.id.in_(task_ids)).delete(synchronize_session=False)
+
 def delete_project(db: Session, project_id: int, user_id: int):
+    """Delete a project, its tasks and their subtasks.
+
+    A project of up to project_purge_batch_size tasks is deleted at once. A
+    larger one is only marked deleted, which hides it and its tasks from
+    every read; purge_deleted_project then removes the rows in batches.
+    Either way the request does no per-task work beyond one batch: the
+    counters are adjusted by column, and the project's tombstone and
+    project.deleted event stand for its tasks.
+    """
     db_project = get_project(db, project_id, user_id)
     if db_project:
-        # Delete all tasks in this project first
-        db.query(Task).filter(Task.project_id == project_id).delete()
-        db.delete(db_project)
+        # Take the project's tasks out of the counters in one grouped query
+        per_column = db.query(
+            Task.column, func.count(Task.id), func.count(Task.due_date)
+        ).filter(Task.owner_id == user_id, Task.project_id == project_id).group_by(Task.column).all()
+        for column, task_count, due_count in per_column:
+            _adjust_task_counter(db, user_id, column, -task_count, -due_count)
+        
+        revision = _bump_revision(db, user_id)
+        _add_tombstones(db, user_id, "project", [project_id], revision)
+        
+        # Only as many ids as a small project can have
+        batch_size = settings.project_purge_batch_size
+        task_ids, archived_ids = (
+            [
+                task_id for (task_id,) in db.query(task_model.id).filter(
+                    task_model.owner_id == user_id, task_model.project_id == project_id
+                ).limit(batch_size + 1)
+            ]
+            for task_model in (Task, ArchivedTask)
+        )
+        if len(task_ids) + len(archived_ids) <= batch_size:
+            if task_ids:
+                _delete_tasks(db, task_ids)
+            if archived_ids:
+                _delete_tasks(db, archived_ids, ArchivedTask, ArchivedSubTask)
+            db.delete(db_project)
+        else:
+            db_project.deleted_at = datetime.utcnow()
+            db_project.revision = revision
         db.commit()
+        _publish(db, user_id, {"type": "project.deleted", "id": project_id, "revision": revision})
         return True
     return False
 
+def get_deleted_project_ids(db: Session):
+    """Projects marked deleted whose rows are still to be purged."""
+    return [project_id for (project_id,) in db.query(Project.id).filter(Project.deleted_at.isnot(None))]
+
+def purge_deleted_project(db: Session, project_id: int, batch_size: int):
+    """Delete up to `batch_size` of a deleted project's tasks in one short transaction.
+
+    Returns how many tasks were deleted. The archived tasks go after the
+    live ones. Once none are left the project row goes too and 0 is
+    returned; call until then, yielding between calls.
+    """
+    db_project = db.query(Project).filter(Project.id == project_id, Project.deleted_at.isnot(None)).first()
+    if db_project is None:
+        return 0
+    for task_model, subtask_model in ((Task, SubTask), (ArchivedTask, ArchivedSubTask)):
+        task_ids = [
+            task_id for (task_id,) in db.query(task_model.id).filter(
+                task_model.owner_id == db_project.owner_id, task_model.project_id == project_id
+            ).limit(batch_size)
+        ]
+        if task_ids:
+            _delete_tasks(db, task_ids, task_model, subtask_model)
+            db.commit()
+            return len(task_ids)
+    db.delete(db_project)
+    db.commit()
+    return 0
+
+# Task bookkeeping shared by the write paths
+def _task_snapshot(task: Task):
+    # created_at and the minute defaults are only filled in at flush
+    return {
+        "owner_id": task.owner_id,
+        "column": task.column,
+        "has_due_date": task.due_date is not None,
+        "project_id": task.project_id,
+        "created_on": (task.created_at or datetime.utcnow()).date(),
+        "completed_on": task.completed_at.date() if task.completed_at else None,
+        "estimated_time": task.estimated_time or 0,
+        "actual_time": task.actual_time or 0,
+    }
+
+# Fields that re-arm a reminder that was already sent
+REMINDER_FIELDS = {"due_date", "reminder_enabled", "reminder_offset"}
+
+def _rearm_reminder(task: Task, changed_fields, was_done: bool):
+    """Recompute task.remind_at after a write; returns whether it changed.
+
+    Only a new due date or reminder setting, or moving into or out of
+    Done, touches it, so editing a task doesn't send its reminder again.
+    """
+    if not REMINDER_FIELDS.intersection(changed_fields) and (task.column == "Done") == was_done:
+        return False
+    remind_at = reminders.reminder_time(task.column, task.due_date, task.reminder_enabled, task.reminder_offset)
+    if remind_at == task.remind_at:
+        return False
+    task.remind_at = remind_at
+    return True
+
+def _increment(db: Session, model, key, amounts):
+    """Add `amounts` to the `model` row with primary key `key`, creating it if missing.
+
+    One INSERT ... ON CONFLICT DO UPDATE that adds in SQL, so concurrent
+    writers' deltas add up instead of overwriting each other, and two
+    writers creating the same row don't collide on its primary key.
+    """
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    statement = dialect.insert(model).values(**key, **amounts)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=list(key),
+        set_={name: getattr(model, name) + getattr(statement.excluded, name) for name in amounts},
+    ))
+
+def _adjust_task_counter(db: Session, owner_id: int, column: str, task_delta: int, due_delta: int):
+    _increment(
+        db, TaskCounter, {"owner_id": owner_id, "column": column}, {"task_count": task_delta, "due_count": due_delta}
+    )
+
+def _daily_stat_amounts(snapshot):
+    """What one task contributes to the daily rollup: {key: (created, completed, estimated, actual)}."""
+    project_id = snapshot["project_id"] or 0
+    amounts = defaultdict(lambda: [0, 0, 0, 0])
+    amounts[(snapshot["owner_id"], snapshot["created_on"], project_id)][0] += 1
+    if snapshot["completed_on"] is not None:
+        completed = amounts[(snapshot["owner_id"], snapshot["completed_on"], project_id)]
+        completed[1] += 1
+        completed[2] += snapshot["estimated_time"]
+        completed[3] += snapshot["actual_time"]
+    return amounts
+
+def _adjust_daily_stat(db: Session, key, deltas):
+    owner_id, day, project_id = key
+    _increment(
+        db, DailyUserStat, {"owner_id": owner_id, "day": day, "project_id": project_id},
+        dict(zip(("tasks_created", "tasks_completed", "estimated_minutes", "actual_minutes"), deltas)),
+    )
+
+def _track_task_changes(db: Session, changes):
+    """Apply derived-data updates for (before, after) task snapshots.
+
+    Either side may be None for a created or deleted task. Runs in the
+    caller's transaction, before it commits. Deleting a task leaves its
+    history in the daily rollup.
+    """
+    counters = defaultdict(lambda: [0, 0])
+    daily = defaultdict(lambda: [0, 0, 0, 0])
+    for before, after in changes:
+        if before is not None:
+            counter = counters[(before["owner_id"], before["column"])]
+            counter[0] -= 1
+            counter[1] -= int(before["has_due_date"])
+        if after is not None:
+            counter = counters[(after["owner_id"], after["column"])]
+            counter[0] += 1
+            counter[1] += int(after["has_due_date"])
+            for sign, snapshot in ((-1, before), (1, after)):
+                if snapshot is None:
+                    continue
+                for key, amounts in _daily_stat_amounts(snapshot).items():
+                    daily[key] = [total + sign * amount for total, amount in zip(daily[key], amounts)]
+    # A change within one column cancels out and costs no statement
+    for (owner_id, column), (task_delta, due_delta) in counters.items():
+        if task_delta or due_delta:
+            _adjust_task_counter(db, owner_id, column, task_delta, due_delta)
+    for key, deltas in daily.items():
+        if any(deltas):
+            _adjust_daily_stat(db, key, deltas)
+
+def rebuild_task_counters(db: Session, user_id: int = None, commit: bool = True):
+    """Recompute task counters from the tasks table and fix any drift.
+
+    Returns a list of (owner_id, column, stored, actual) tuples for every
+    counter that was wrong, where stored/actual are (task_count, due_count).
+    """
+    query = db.query(
+        Task.owner_id,
+        Task.column,
+        func.count(Task.id),
+        func.sum(case((Task.due_date.isnot(None), 1), else_=0)),
+    ).filter(_in_live_project(user_id))
+    counters = db.query(TaskCounter)
+    if user_id is not None:
+        query = query.filter(Task.owner_id == user_id)
+        counters = counters.filter(TaskCounter.owner_id == user_id)
+    actual = {
+        (owner_id, column): (task_count, due_count or 0)
+        for owner_id, column, task_count, due_count in query.group_by(Task.owner_id, Task.column)
+    }
+    stored = {(c.owner_id, c.column): c for c in counters}
+    
+    drift = []
+    for key in stored.keys() | actual.keys():
+        counter = stored.get(key)
+        stored_counts = (counter.task_count, counter.due_count) if counter else (0, 0)
+        actual_counts = actual.get(key, (0, 0))
+        if stored_counts == actual_counts:
+            continue
+        drift.append((key[0], key[1], stored_counts, actual_counts))
+        if counter is None:
+            counter = TaskCounter(owner_id=key[0], column=key[1])
+            db.add(counter)
+        counter.task_count, counter.due_count = actual_counts
+    # Fixed counters change what the dashboard reports
+    for owner_id in {owner_id for owner_id, _, _, _ in drift}:
+        _bump_revision(db, owner_id)
+    if commit:
+        db.commit()
+    return drift
+
 # Task CRUD operations
-def get_tasks(db: Session, user_id: int, project_id: int = None):
-    query = db.query(Task).filter(Task.owner_id == user_id)
+def _task_list_query(
+    query,
+    user_id: int,
+    project_id: int = None,
+    column: str = None,
+    due_before: datetime = None,
+    due_after: datetime = None,
+    task_priority: str = None,
+    is_urgent: bool = None,
+    is_important: bool = None,
+    limit: int = None,
+    cursor: int = None,
+):
+    query = query.filter(Task.owner_id == user_id, _in_live_project(user_id))
     if project_id:
         query = query.filter(Task.project_id == project_id)
-    return query.all()
+    if column is not None:
+        query = query.filter(Task.column == column)
+    if due_before is not None:
+        query = query.filter(Task.due_date < due_before)
+    if due_after is not None:
+        query = query.filter(Task.due_date >= due_after)
+    if task_priority is not None:
+        query = query.filter(Task.task_priority == task_priority)
+    if is_urgent is not None:
+        query = query.filter(Task.is_urgent == is_urgent)
+    if is_important is not None:
+        query = query.filter(Task.is_important == is_important)
+
+    # Keyset pagination: the cursor is the id of the last task on the previous page
+    if cursor is not None:
+        query = query.filter(Task.id > cursor)
+    query = query.order_by(Task.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+def get_tasks(
+    db: Session,
+    user_id: int,
+    include_subtasks: bool = False,
+    include_subtask_counts: bool = False,
+    **filters,
+):
+    """List tasks; `filters` are those of _task_list_query."""
+    query = _task_list_query(db.query(Task), user_id, **filters)
+    if include_subtasks:
+        # One IN query for the whole page's subtasks
+        query = query.options(selectinload(Task.subtasks))
+    tasks = query.all()
+    
+    if include_subtasks:
+        for task in tasks:
+            task.included_subtasks = task.subtasks
+            task.subtask_count = len(task.subtasks)
+            task.completed_subtask_count = sum(1 for subtask in task.subtasks if subtask.is_completed)
+    elif include_subtask_counts and tasks:
+        counts = get_subtask_counts(db, [task.id for task in tasks])
+        for task in tasks:
+            task.subtask_count, task.completed_subtask_count = counts.get(task.id, (0, 0))
+    return tasks
+
+TASK_LIST_COLUMNS = schema_columns(schemas.TaskListItem, Task, exclude={"subtasks"})
+SUBTASK_COLUMNS = schema_columns(schemas.SubTask, SubTask)
+
+def get_task_rows(
+    db: Session,
+    user_id: int,
+    include_subtasks: bool = False,
+    include_subtask_counts: bool = False,
+    **filters,
+):
+    """get_tasks as plain dicts shaped like schemas.TaskListItem (see fastjson.py)."""
+    names, columns = zip(*TASK_LIST_COLUMNS)
+    tasks = row_dicts(names, _task_list_query(db.query(*columns), user_id, **filters))
+    for task in tasks:
+        task["subtasks"] = task["subtask_count"] = task["completed_subtask_count"] = None
+    if not tasks:
+        return tasks
+    
+    task_ids = [task["id"] for task in tasks]
+    if include_subtasks:
+        subtask_names, subtask_columns = zip(*SUBTASK_COLUMNS)
+        by_parent = defaultdict(list)
+        subtasks = db.query(*subtask_columns).filter(SubTask.parent_task_id.in_(task_ids)).order_by(SubTask.rank)
+        for subtask in row_dicts(subtask_names, subtasks):
+            by_parent[subtask["parent_task_id"]].append(subtask)
+        for task in tasks:
+            task["subtasks"] = by_parent.get(task["id"], [])
+            task["subtask_count"] = len(task["subtasks"])
+            task["completed_subtask_count"] = sum(1 for subtask in task["subtasks"] if subtask["is_completed"])
+    elif include_subtask_counts:
+        counts = get_subtask_counts(db, task_ids)
+        for task in tasks:
+            task["subtask_count"], task["completed_subtask_count"] = counts.get(task["id"], (0, 0))
+    return tasks
+
+def get_subtask_counts(db: Session, task_ids):
+    """Map task id -> (subtask count, completed subtask count) in one grouped query."""
+    rows = db.query(
+        SubTask.parent_task_id,
+        func.count(SubTask.id),
+        func.sum(case((SubTask.is_completed == True, 1), else_=0)),
+    ).filter(SubTask.parent_task_id.in_(task_ids)).group_by(SubTask.parent_task_id)
+    return {task_id: (count, completed or 0) for task_id, count, completed in rows}
+
+def search_tasks(db: Session, user_id: int, query: str, limit: int = 20, cursor: str = None):
+    """Tasks matching every word of `query`, best match first.
+
+    Each task gets `search_score`, `title_highlight` and `notes_snippet`
+    attributes. `cursor` is the `next_cursor` of the previous page; returns
+    (tasks, next_cursor), where next_cursor is None on the last page.
+    Raises ValueError for a malformed cursor.
+    """
+    terms = search.parse_terms(query)
+    if not terms:
+        return [], None
+    after = None
+    if cursor:
+        score, _, task_id = cursor.partition(",")
+        after = (float(score), int(task_id))
+    rows = search.search_task_ids(db, user_id, terms, limit, after)
+    
+    tasks = {
+        task.id: task
+        for task in db.query(Task).filter(
+            Task.owner_id == user_id, Task.id.in_([row[0] for row in rows]), _in_live_project(user_id)
+        )
+    }
+    results = []
+    for task_id, score, title_highlight, notes_snippet in rows:
+        task = tasks.get(task_id)
+        if task is None:
+            continue  # in a project being purged
+        task.search_score = score
+        task.title_highlight = title_highlight
+        task.notes_snippet = notes_snippet or None
+        results.append(task)
+    next_cursor = f"{rows[-1][1]!r},{rows[-1][0]}" if len(rows) == limit else None
+    return results, next_cursor
+
+def _last_rank(db: Session, user_id: int, column: str):
+    return db.query(func.max(Task.rank)).filter(Task.owner_id == user_id, Task.column == column).scalar()
 
 def create_task(db: Session, task: TaskCreate, user_id: int):
     db_task = Task(**task.dict(), owner_id=user_id)
+    # New tasks go to the bottom of their column
+    db_task.rank = key_between(_last_rank(db, user_id, db_task.column), None)
+    db_task.remind_at = reminders.reminder_time(
+        db_task.column, db_task.due_date, db_task.reminder_enabled, db_task.reminder_offset
+    )
     db.add(db_task)
+    _track_task_changes(db, [(None, _task_snapshot(db_task))])
+    db_task.revision = _bump_revision(db, user_id)
     db.commit()
     db.refresh(db_task)
+    _publish(db, user_id, {"type": "task.created", "id": db_task.id, "revision": db_task.revision, "column": db_task.column})
+    if db_task.remind_at is not None:
+        _schedule_reminders(db, [(db_task.id, db_task.remind_at)])
     return db_task
 
 def get_task(db: Session, task_id: int, user_id: int):
     return db.query(Task).filter(
-        and_(Task.id == task_id, Task.owner_id == user_id)
+        and_(Task.id == task_id, Task.owner_id == user_id, _in_live_project(user_id))
+    ).first()
+
+def get_task_with_subtasks(db: Session, task_id: int, user_id: int):
+    return db.query(Task).options(joinedload(Task.subtasks)).filter(
+        and_(Task.id == task_id, Task.owner_id == user_id, _in_live_project(user_id))
     ).first()
 
 def update_task(db: Session, task_id: int, task_update: dict, user_id: int):
     db_task = get_task(db, task_id, user_id)
+    if db_task is None and task_update.get("column") not in (None, "Done"):
+        # Reopening an archived task brings it back first
+        db_task = _unarchive_task(db, task_id, user_id)
     if db_task:
+        before = _task_snapshot(db_task)
         for key, value in task_update.items():
             if value is not None:
                 setattr(db_task, key, value)
         db_task.updated_at = datetime.utcnow()
         
-        # Set completed_at if task is moved to Done
+        # Set completed_at if task is moved to Done, clear it if moved out;
+        # edits that leave the column alone keep it
         if task_update.get('column') == 'Done' and db_task.completed_at is None:
             db_task.completed_at = datetime.utcnow()
-        elif task_update.get('column') != 'Done':
+        elif task_update.get('column') not in (None, 'Done'):
             db_task.completed_at = None
-            
+        
+        changed = [key for key, value in task_update.items() if value is not None]
+        rearmed = _rearm_reminder(db_task, changed, before["column"] == "Done")
+        after = _task_snapshot(db_task)
+        _track_task_changes(db, [(before, after)])
+        db_task.revision = _bump_revision(db, user_id)
         db.commit()
         db.refresh(db_task)
+        _publish(db, user_id, _task_update_event(db_task.id, db_task.revision, before, after))
+        if rearmed:
+            _schedule_reminders(db, [(db_task.id, db_task.remind_at)])
+    return db_task
+
+def position_task(db: Session, task_id: int, user_id: int, after_id: int = None, before_id: int = None, column: str = None):
+    """Move a task between two neighbours, rewriting only its own rank.
+
+    `after_id` is the task it should follow and `before_id` the task it
+    should precede; either may be None at the ends of the column, and with
+    neither the task goes to the bottom. Raises ValueError when a
+    neighbour is missing, in another column, or out of order (a stale
+    client view).
+    """
+    neighbour_ids = [neighbour_id for neighbour_id in (after_id, before_id) if neighbour_id is not None]
+    tasks = {
+        task.id: task
+        for task in db.query(Task).filter(
+            Task.owner_id == user_id, Task.id.in_([task_id, *neighbour_ids]), _in_live_project(user_id)
+        )
+    }
+    db_task = tasks.get(task_id)
+    if db_task is None:
+        return None
+    column = column or db_task.column
+    if task_id in neighbour_ids:
+        raise ValueError("A task cannot be its own neighbour")
+    for neighbour_id in neighbour_ids:
+        if neighbour_id not in tasks or tasks[neighbour_id].column != column:
+            raise ValueError(f"Task {neighbour_id} is not in column {column}")
+    
+    before_rank = tasks[after_id].rank if after_id is not None else None
+    after_rank = tasks[before_id].rank if before_id is not None else None
+    if after_id is None and before_id is None:
+        before_rank = _last_rank(db, user_id, column)
+    try:
+        rank = key_between(before_rank, after_rank)
+    except ValueError:
+        raise ValueError("Neighbours are out of order; refresh and retry")
+    
+    before = _task_snapshot(db_task)
+    db_task.rank = rank
+    if column != db_task.column:
+        db_task.column = column
+        # Same completed_at rule as update_task
+        if column == "Done" and db_task.completed_at is None:
+            db_task.completed_at = datetime.utcnow()
+        elif column != "Done":
+            db_task.completed_at = None
+    db_task.updated_at = datetime.utcnow()
+    rearmed = _rearm_reminder(db_task, (), before["column"] == "Done")
+    after = _task_snapshot(db_task)
+    _track_task_changes(db, [(before, after)])
+    db_task.revision = _bump_revision(db, user_id)
+    db.commit()
+    db.refresh(db_task)
+    event = _task_update_event(db_task.id, db_task.revision, before, after)
+    if event["type"] == "task.updated":
+        event["type"] = "task.moved"
+    _publish(db, user_id, {**event, "rank": db_task.rank})
+    if rearmed:
+        _schedule_reminders(db, [(db_task.id, db_task.remind_at)])
     return db_task
 
+def rebalance_ranks(db: Session, user_id: int, column: str):
+    """Reissue short, evenly spaced ranks for one column, keeping its order."""
+    task_ids = [
+        task_id for (task_id,) in db.query(Task.id).filter(
+            Task.owner_id == user_id, Task.column == column
+        ).order_by(Task.rank, Task.id)
+    ]
+    if not task_ids:
+        return 0
+    revision = _bump_revision(db, user_id)
+    db.execute(update(Task), [
+        {"id": task_id, "rank": rank, "revision": revision}
+        for task_id, rank in zip(task_ids, evenly_spaced_keys(len(task_ids)))
+    ])
+    db.commit()
+    _publish(db, user_id, {"type": "column.reranked", "column": column, "revision": revision})
+    return len(task_ids)
+
 def delete_task(db: Session, task_id: int, user_id: int):
     db_task = get_task(db, task_id, user_id)
     if db_task:
         # Delete all subtasks first
         db.query(SubTask).filter(SubTask.parent_task_id == task_id).delete()
+        _track_task_changes(db, [(_task_snapshot(db_task), None)])
+        revision = _bump_revision(db, user_id)
+        _add_tombstones(db, user_id, "task", [task_id], revision)
         db.delete(db_task)
         db.commit()
+        _publish(db, user_id, {"type": "task.deleted", "id": task_id, "revision": revision})
+        return True
+    # An archived task is already off the board and tombstoned, but the
+    # archive listing changes
+    archived = db.query(ArchivedTask.id).filter(ArchivedTask.id == task_id, ArchivedTask.owner_id == user_id).first()
+    if archived:
+        _delete_tasks(db, [task_id], ArchivedTask, ArchivedSubTask)
+        revision = _bump_revision(db, user_id)
+        db.commit()
+        _publish(db, user_id, {"type": "task.deleted", "id": task_id, "revision": revision})
         return True
     return False
 
+def bulk_task_operations(db: Session, operations, user_id: int, atomic: bool = True):
+    """Apply a batch of create/update/move/delete operations in one transaction.
+
+    Updates and moves with identical changes share one UPDATE, and all
+    deletes share one DELETE, so a batch costs a few statements and a single
+    commit. Each task id may appear in at most one operation. With `atomic`,
+    any failed operation rolls the whole batch back and the others are
+    reported as skipped.
+
+    Returns {"committed": bool, "results": [...]} with one result per
+    operation, in request order.
+    """
+    now = datetime.utcnow()
+    results = []
+    
+    task_ids = {op.id for op in operations if op.op != "create" and op.id is not None}
+    existing = {}
+    if task_ids:
+        existing = {
+            task.id: task
+            for task in db.query(Task).filter(Task.owner_id == user_id, Task.id.in_(task_ids), _in_live_project(user_id))
+        }
+    project_ids = {op.task.project_id for op in operations if op.op == "create" and op.task is not None}
+    owned_projects = set()
+    if project_ids:
+        owned_projects = {
+            project_id
+            for (project_id,) in db.query(Project.id).filter(
+                Project.owner_id == user_id, Project.id.in_(project_ids), Project.deleted_at.is_(None)
+            )
+        }
+    
+    created = []  # (result, Task)
+    updates = defaultdict(list)  # sorted change items -> task ids
+    deleted = []
+    changes = []
+    updated = []  # (task id, before, after) for the change feed
+    rearmed = []  # (task id, remind_at) for the reminder scheduler
+    seen = set()
+    for index, op in enumerate(operations):
+        result = {"index": index, "op": op.op, "status": "ok", "id": op.id}
+        results.append(result)
+        
+        if op.op == "create":
+            if op.task is None:
+                result.update(status="error", detail="task is required")
+            elif op.task.project_id not in owned_projects:
+                result.update(status="error", detail="Project not found")
+            else:
+                created.append((result, Task(**op.task.dict(), owner_id=user_id)))
+            continue
+        
+        if op.id is None:
+            result.update(status="error", detail="id is required")
+            continue
+        if op.id in seen:
+            result.update(status="error", detail="Task appears in more than one operation")
+            continue
+        seen.add(op.id)
+        db_task = existing.get(op.id)
+        if db_task is None:
+            result.update(status="error", detail="Task not found")
+            continue
+        
+        before = _task_snapshot(db_task)
+        if op.op == "delete":
+            deleted.append(op.id)
+            changes.append((before, None))
+            continue
+        
+        if op.op == "move":
+            if op.column not in VALID_COLUMNS:
+                result.update(status="error", detail=f"Invalid column. Must be one of: {VALID_COLUMNS}")
+                continue
+            task_update = {"column": op.column}
+        else:
+            if op.changes is None:
+                result.update(status="error", detail="changes is required")
+                continue
+            # Same rule as update_task: None never overwrites a value
+            task_update = {key: value for key, value in op.changes.dict(exclude_unset=True).items() if value is not None}
+        updates[tuple(sorted(task_update.items()))].append(op.id)
+        after = {
+            **before,
+            "column": task_update.get("column", before["column"]),
+            "has_due_date": before["has_due_date"] or "due_date" in task_update,
+            "project_id": task_update.get("project_id", before["project_id"]),
+            "completed_on": before["completed_on"] if "column" not in task_update
+            else (before["completed_on"] or now.date()) if task_update["column"] == "Done" else None,
+            "estimated_time": task_update.get("estimated_time", before["estimated_time"]),
+            "actual_time": task_update.get("actual_time", before["actual_time"]),
+        }
+        changes.append((before, after))
+        updated.append((op.id, before, after))
+        # Same rule as _rearm_reminder
+        if REMINDER_FIELDS.intersection(task_update) or (after["column"] == "Done") != (before["column"] == "Done"):
+            remind_at = reminders.reminder_time(
+                after["column"],
+                task_update.get("due_date", db_task.due_date),
+                task_update.get("reminder_enabled", db_task.reminder_enabled),
+                task_update.get("reminder_offset", db_task.reminder_offset),
+            )
+            if remind_at != db_task.remind_at:
+                rearmed.append((op.id, remind_at))
+    
+    if atomic and any(result["status"] == "error" for result in results):
+        db.rollback()
+        for result in results:
+            if result["status"] == "ok":
+                result["status"] = "skipped"
+        return {"committed": False, "results": results}
+    
+    revision = _bump_revision(db, user_id)
+    
+    # Insert before the set-based delete so new rows never reuse a deleted id
+    last_ranks = {}
+    for result, db_task in created:
+        if db_task.column not in last_ranks:
+            last_ranks[db_task.column] = _last_rank(db, user_id, db_task.column)
+        db_task.rank = last_ranks[db_task.column] = key_between(last_ranks[db_task.column], None)
+        db_task.remind_at = reminders.reminder_time(
+            db_task.column, db_task.due_date, db_task.reminder_enabled, db_task.reminder_offset
+        )
+        db_task.revision = revision
+        db.add(db_task)
+        changes.append((None, _task_snapshot(db_task)))
+    db.flush()
+    for result, db_task in created:
+        result["id"] = db_task.id
+    
+    for key, ids in updates.items():
+        task_update = dict(key)
+        # Same completed_at rule as update_task
+        values = {**task_update, "updated_at": now, "revision": revision}
+        if task_update.get("column") == "Done":
+            values["completed_at"] = case((Task.completed_at.is_(None), now), else_=Task.completed_at)
+        elif "column" in task_update:
+            values["completed_at"] = None
+        db.query(Task).filter(Task.id.in_(ids)).update(values, synchronize_session=False)
+    if rearmed:
+        db.execute(update(Task), [{"id": task_id, "remind_at": remind_at} for task_id, remind_at in rearmed])
+    
+    if deleted:
+        _add_tombstones(db, user_id, "task", deleted, revision)
+        _delete_tasks(db, deleted)
+    
+    _track_task_changes(db, changes)
+    # Built before the commit expires the created tasks
+    events = (
+        [{"type": "task.created", "id": db_task.id, "revision": revision, "column": db_task.column} for _, db_task in created]
+        + [_task_update_event(task_id, revision, before, after) for task_id, before, after in updated]
+        + [{"type": "task.deleted", "id": task_id, "revision": revision} for task_id in deleted]
+    )
+    rearmed += [(db_task.id, db_task.remind_at) for _, db_task in created if db_task.remind_at is not None]
+    db.commit()
+    _publish(db, user_id, *events)
+    _schedule_reminders(db, rearmed)
+    
+    # One SELECT for every task the batch returns
+    returned_ids = [result["id"] for result in results if result["status"] == "ok" and result["op"] != "delete"]
+    if returned_ids:
+        tasks = {task.id: task for task in db.query(Task).filter(Task.id.in_(returned_ids))}
+        for result in results:
+            if result["status"] == "ok" and result["op"] != "delete":
+                result["task"] = tasks[result["id"]]
+    return {"committed": True, "results": results}
+
 # SubTask CRUD operations
 def get_subtasks(db: Session, task_id: int, user_id: int):
     # Ensure the parent task belongs to the user
     parent_task = get_task(db, task_id, user_id)
     if not parent_task:
         return []
-    return db.query(SubTask).filter(SubTask.parent_task_id == task_id).all()
+    return db.query(SubTask).filter(SubTask.parent_task_id == task_id).order_by(SubTask.rank, SubTask.id).all()
 
 def create_subtask(db: Session, subtask: SubTaskCreate, user_id: int):
     # Ensure the parent task belongs to the user
@@ -137,9 +913,13 @@ def create_subtask(db: Session, subtask: SubTaskCreate, user_id: int):
         return None
     
     db_subtask = SubTask(**subtask.dict())
+    last_rank = db.query(func.max(SubTask.rank)).filter(SubTask.parent_task_id == subtask.parent_task_id).scalar()
+    db_subtask.rank = key_between(last_rank, None)
     db.add(db_subtask)
+    db_subtask.revision = _bump_revision(db, user_id)
     db.commit()
     db.refresh(db_subtask)
+    _publish(db, user_id, {"type": "subtask.created", "id": db_subtask.id, "revision": db_subtask.revision, "task_id": db_subtask.parent_task_id})
     return db_subtask
 
 def update_subtask(db: Session, subtask_id: int, subtask_update: dict, user_id: int):
@@ -153,8 +933,10 @@ def update_subtask(db: Session, subtask_id: int, subtask_update: dict, user_id:
         for key, value in subtask_update.items():
             if value is not None:
                 setattr(db_subtask, key, value)
+        db_subtask.revision = _bump_revision(db, user_id)
         db.commit()
         db.refresh(db_subtask)
+        _publish(db, user_id, {"type": "subtask.updated", "id": db_subtask.id, "revision": db_subtask.revision, "task_id": db_subtask.parent_task_id})
     return db_subtask
 
 def delete_subtask(db: Session, subtask_id: int, user_id: int):
@@ -165,43 +947,218 @@ def delete_subtask(db: Session, subtask_id: int, user_id: int):
         if not parent_task:
             return False
             
+        revision = _bump_revision(db, user_id)
+        task_id = db_subtask.parent_task_id
+        _add_tombstones(db, user_id, "subtask", [subtask_id], revision)
         db.delete(db_subtask)
         db.commit()
+        _publish(db, user_id, {"type": "subtask.deleted", "id": subtask_id, "revision": revision, "task_id": task_id})
         return True
     return False
 
+# Archive of old completed tasks (see archive.py)
+TASK_COLUMN_NAMES = [column.name for column in Task.__table__.columns]
+SUBTASK_COLUMN_NAMES = [column.name for column in SubTask.__table__.columns]
+
+def archive_completed_tasks(db: Session, completed_before: datetime, batch_size: int, user_id: int = None):
+    """Move up to `batch_size` Done tasks completed before `completed_before` into the archive.
+
+    Oldest first, with their subtasks, in one transaction; pass `user_id`
+    to archive one user's tasks only. Archived tasks leave the task
+    counters (the dashboard counts the board) but keep their history in the
+    daily rollup, and are tombstoned for /sync. Returns how many were moved.
+    """
+    query = db.query(Task.id, Task.owner_id, Task.due_date.isnot(None)).filter(
+        Task.column == "Done",
+        Task.completed_at < completed_before,
+        _in_live_project(user_id),
+    )
+    if user_id is not None:
+        query = query.filter(Task.owner_id == user_id)
+    rows = query.order_by(Task.completed_at).limit(batch_size).all()
+    if not rows:
+        return 0
+
+    task_ids = [task_id for task_id, _, _ in rows]
+    now = datetime.utcnow()
+    db.execute(insert(ArchivedTask).from_select(
+        TASK_COLUMN_NAMES + ["archived_at"],
+        select(*(Task.__table__.c[name] for name in TASK_COLUMN_NAMES), literal(now)).where(Task.id.in_(task_ids)),
+    ))
+    db.execute(insert(ArchivedSubTask).from_select(
+        SUBTASK_COLUMN_NAMES,
+        select(*(SubTask.__table__.c[name] for name in SUBTASK_COLUMN_NAMES)).where(SubTask.parent_task_id.in_(task_ids)),
+    ))
+    _delete_tasks(db, task_ids)
+
+    by_owner = defaultdict(list)
+    due_counts = defaultdict(int)
+    for task_id, owner_id, has_due_date in rows:
+        by_owner[owner_id].append(task_id)
+        due_counts[owner_id] += int(has_due_date)
+    events = {}
+    for owner_id, ids in by_owner.items():
+        _adjust_task_counter(db, owner_id, "Done", -len(ids), -due_counts[owner_id])
+        revision = _bump_revision(db, owner_id)
+        _add_tombstones(db, owner_id, "task", ids, revision)
+        events[owner_id] = [{"type": "task.archived", "id": task_id, "revision": revision} for task_id in ids]
+    db.commit()
+    for owner_id, owner_events in events.items():
+        _publish(db, owner_id, *owner_events)
+    return len(task_ids)
+
+def get_archived_tasks(db: Session, user_id: int, limit: int = 50, cursor: str = None, project_id: int = None):
+    """One page of the user's archived tasks, most recently completed first.
+
+    `cursor` is the `next_cursor` of the previous page; returns (tasks,
+    next_cursor), where next_cursor is None on the last page. Raises
+    ValueError for a malformed cursor.
+    """
+    query = db.query(ArchivedTask).filter(ArchivedTask.owner_id == user_id, _in_live_project(user_id, ArchivedTask))
+    if project_id:
+        query = query.filter(ArchivedTask.project_id == project_id)
+    if cursor:
+        completed_at, _, task_id = cursor.partition(",")
+        completed_at, task_id = datetime.fromisoformat(completed_at), int(task_id)
+        query = query.filter(or_(
+            ArchivedTask.completed_at < completed_at,
+            and_(ArchivedTask.completed_at == completed_at, ArchivedTask.id < task_id),
+        ))
+    tasks = query.order_by(ArchivedTask.completed_at.desc(), ArchivedTask.id.desc()).limit(limit).all()
+    next_cursor = f"{tasks[-1].completed_at.isoformat()},{tasks[-1].id}" if len(tasks) == limit else None
+    return tasks, next_cursor
+
+def _unarchive_task(db: Session, task_id: int, user_id: int):
+    """Move an archived task and its subtasks back to the board, in the caller's transaction."""
+    archived = db.query(ArchivedTask).filter(
+        ArchivedTask.id == task_id, ArchivedTask.owner_id == user_id, _in_live_project(user_id, ArchivedTask)
+    ).first()
+    if archived is None:
+        return None
+    db.execute(insert(Task).from_select(
+        TASK_COLUMN_NAMES,
+        select(*(ArchivedTask.__table__.c[name] for name in TASK_COLUMN_NAMES)).where(ArchivedTask.id == task_id),
+    ))
+    db.execute(insert(SubTask).from_select(
+        SUBTASK_COLUMN_NAMES,
+        select(*(ArchivedSubTask.__table__.c[name] for name in SUBTASK_COLUMN_NAMES)).where(ArchivedSubTask.parent_task_id == task_id),
+    ))
+    _delete_tasks(db, [task_id], ArchivedTask, ArchivedSubTask)
+    # For /sync the subtasks are new again (their old revisions predate the
+    # archive's tombstone), and the tombstone no longer applies
+    revision = _bump_revision(db, user_id)
+    db.execute(update(SubTask).where(SubTask.parent_task_id == task_id).values(revision=revision))
+    db.query(Tombstone).filter(
+        Tombstone.owner_id == user_id, Tombstone.entity == "task", Tombstone.entity_id == task_id
+    ).delete(synchronize_session=False)
+    db_task = get_task(db, task_id, user_id)
+    # Back at the bottom of its column, and on the board's counters
+    db_task.rank = key_between(_last_rank(db, user_id, db_task.column), None)
+    _adjust_task_counter(db, user_id, db_task.column, 1, int(db_task.due_date is not None))
+    return db_task
+
+def restore_task(db: Session, task_id: int, user_id: int, column: str = None):
+    """Bring an archived task back to the board, into `column` if given (reopening it)."""
+    db_task = _unarchive_task(db, task_id, user_id)
+    if db_task is None:
+        return None
+    before = _task_snapshot(db_task)
+    if column is not None and column != db_task.column:
+        db_task.column = column
+        if column != "Done":
+            db_task.completed_at = None
+        db_task.updated_at = datetime.utcnow()
+    rearmed = _rearm_reminder(db_task, (), before["column"] == "Done")
+    after = _task_snapshot(db_task)
+    _track_task_changes(db, [(before, after)])
+    db_task.revision = _bump_revision(db, user_id)
+    db.commit()
+    db.refresh(db_task)
+    _publish(db, user_id, {"type": "task.restored", "id": db_task.id, "revision": db_task.revision, "column": db_task.column})
+    if rearmed:
+        _schedule_reminders(db, [(db_task.id, db_task.remind_at)])
+    return db_task
+
+# Reminder delivery (see reminders.py)
+def get_reminder_times(db: Session, before: datetime, since: datetime = None):
+    """(task id, remind_at) of the unsent reminders due before `before`, and at or after `since` if given.
+
+    An index range scan over ix_tasks_remind_at, in firing order.
+    """
+    query = db.query(Task.id, Task.remind_at).filter(Task.remind_at < before)
+    if since is not None:
+        query = query.filter(Task.remind_at >= since)
+    return [(task_id, remind_at) for task_id, remind_at in query.order_by(Task.remind_at)]
+
+def claim_due_reminders(db: Session, task_ids, now: datetime):
+    """Mark the reminders of `task_ids` that are due at `now` as sent, and return them.
+
+    Tasks whose reminder moved or was sent already, or that were deleted,
+    are skipped, so stale scheduler entries are harmless. The claim is a
+    single UPDATE ... RETURNING, so a reminder is only ever claimed once.
+    """
+    rows = db.execute(
+        update(Task)
+        .where(Task.id.in_(task_ids), Task.remind_at <= now, _in_live_project())
+        .values(remind_at=None)
+        .returning(Task.id, Task.owner_id, Task.project_id, Task.title, Task.due_date)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    return [
+        {"id": task_id, "owner_id": owner_id, "project_id": project_id, "title": title, "due_date": due_date}
+        for task_id, owner_id, project_id, title, due_date in rows
+    ]
+
+def retry_reminders(db: Session, task_ids, retry_at: datetime):
+    """Make claimed reminders whose delivery failed due again at `retry_at`; returns the task ids.
+
+    Only reminders still wanted come back: tasks since Done, deleted, given
+    a new reminder time or with their reminder turned off are skipped.
+    """
+    task_ids = db.execute(
+        update(Task)
+        .where(
+            Task.id.in_(task_ids), Task.remind_at.is_(None), Task.column != "Done",
+            Task.reminder_enabled.is_(True), Task.due_date.isnot(None), _in_live_project(),
+        )
+        .values(remind_at=retry_at)
+        .returning(Task.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    db.commit()
+    return task_ids
+
 # Analytics and reporting
 def get_dashboard_stats(db: Session, user_id: int):
     now = datetime.utcnow()
-    today = now.date()
-    week_start = today - timedelta(days=today.weekday())
+    
+    counters = db.query(TaskCounter).filter(TaskCounter.owner_id == user_id).all()
+    by_column = {c.column: c for c in counters}
     
     # Basic counts
-    total_tasks = db.query(Task).filter(Task.owner_id == user_id).count()
-    completed_tasks = db.query(Task).filter(
-        and_(Task.owner_id == user_id, Task.column == 'Done')
-    ).count()
-    pending_tasks = db.query(Task).filter(
-        and_(Task.owner_id == user_id, Task.column != 'Done')
-    ).count()
-    
-    # Overdue tasks
-    overdue_tasks = db.query(Task).filter(
-        and_(
-            Task.owner_id == user_id,
-            Task.column != 'Done',
-            Task.due_date < now
-        )
-    ).count()
+    total_tasks = sum(c.task_count for c in counters)
+    completed_tasks = by_column["Done"].task_count if "Done" in by_column else 0
+    pending_tasks = total_tasks - completed_tasks
     
-    # Today and this week tasks
-    today_tasks = db.query(Task).filter(
-        and_(Task.owner_id == user_id, Task.column == 'Today')
-    ).count()
+    # Overdue tasks depend on the current time, so they can't be a stored
+    # counter; only run the (owner_id, due_date) index scan when a pending
+    # task has a due date at all.
+    overdue_candidates = sum(c.due_count for c in counters if c.column != 'Done')
+    overdue_tasks = 0
+    if overdue_candidates > 0:
+        overdue_tasks = db.query(func.count(Task.id)).filter(
+            and_(
+                Task.owner_id == user_id,
+                Task.due_date < now,
+                Task.column != 'Done',
+                _in_live_project(user_id)
+            )
+        ).scalar()
     
-    this_week_tasks = db.query(Task).filter(
-        and_(Task.owner_id == user_id, Task.column == 'This Week')
-    ).count()
+    # Today and this week tasks
+    today_tasks = by_column["Today"].task_count if "Today" in by_column else 0
+    this_week_tasks = by_column["This Week"].task_count if "This Week" in by_column else 0
     
     # Completion rate
     completion_rate = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
@@ -215,3 +1172,81 @@ def get_dashboard_stats(db: Session, user_id: int):
         "this_week_tasks": this_week_tasks,
         "completion_rate": round(completion_rate, 2)
     }
+
+def _period_start(day: date, granularity: str) -> date:
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    if granularity == "year":
+        return day.replace(month=1, day=1)
+    return day
+
+def _next_period(start: date, granularity: str) -> date:
+    if granularity == "week":
+        return start + timedelta(days=7)
+    if granularity == "month":
+        return start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    if granularity == "year":
+        return start.replace(year=start.year + 1)
+    return start + timedelta(days=1)
+
+def _period_count(date_from: date, date_to: date, granularity: str) -> int:
+    first, last = _period_start(date_from, granularity), _period_start(date_to, granularity)
+    if granularity == "week":
+        return (last - first).days // 7 + 1
+    if granularity == "month":
+        return (last.year - first.year) * 12 + last.month - first.month + 1
+    if granularity == "year":
+        return last.year - first.year + 1
+    return (last - first).days + 1
+
+# Every period is a point in the response, empty or not
+TREND_MAX_PERIODS = 1000
+
+def get_trends(db: Session, user_id: int, date_from: date, date_to: date, granularity: str = "day", project_id: int = None):
+    """Created/completed counts and minutes per period, from the daily rollup.
+
+    Reads at most one rollup row per day and project in the range, never
+    the tasks table. Every period from `date_from` to `date_to` is
+    returned, empty ones as zeros; a week starts on Monday. Raises
+    ValueError for a range of more than TREND_MAX_PERIODS periods.
+    """
+    periods = _period_count(date_from, date_to, granularity)
+    if periods > TREND_MAX_PERIODS:
+        raise ValueError(f"The range covers {periods} periods; at most {TREND_MAX_PERIODS} are returned")
+    query = db.query(
+        DailyUserStat.day,
+        func.sum(DailyUserStat.tasks_created),
+        func.sum(DailyUserStat.tasks_completed),
+        func.sum(DailyUserStat.estimated_minutes),
+        func.sum(DailyUserStat.actual_minutes),
+    ).filter(
+        DailyUserStat.owner_id == user_id,
+        DailyUserStat.day >= date_from,
+        DailyUserStat.day <= date_to,
+    )
+    if project_id is not None:
+        query = query.filter(DailyUserStat.project_id == project_id)
+    
+    totals = {}
+    for day, created, completed, estimated, actual in query.group_by(DailyUserStat.day):
+        bucket = totals.setdefault(_period_start(day, granularity), [0, 0, 0, 0])
+        for index, value in enumerate((created, completed, estimated, actual)):
+            bucket[index] += value or 0
+    
+    points = []
+    start = _period_start(date_from, granularity)
+    for period in range(periods):
+        if period:
+            # Only past a period that is not the last, so the range may end on date.max
+            start = _next_period(start, granularity)
+        created, completed, estimated, actual = totals.get(start, (0, 0, 0, 0))
+        points.append({
+            "period_start": start,
+            "tasks_created": created,
+            "tasks_completed": completed,
+            "estimated_minutes": estimated,
+            "actual_minutes": actual,
+        })
+    return {"from": date_from, "to": date_to, "granularity": granularity, "points": points}
@@ -1,16 +1,96 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from config import settings
+from metrics import instrument_engine
+from slow_queries import install_slow_query_log
 
-engine = create_engine(settings.database_url, connect_args={"check_same_thread": False})
+def _apply_sqlite_pragmas(engine, profile):
+    pragmas = [
+        f"PRAGMA journal_mode={profile.sqlite_journal_mode}",
+        f"PRAGMA synchronous={profile.sqlite_synchronous}",
+        f"PRAGMA busy_timeout={int(profile.sqlite_busy_timeout_ms)}",
+        f"PRAGMA mmap_size={int(profile.sqlite_mmap_size)}",
+        f"PRAGMA cache_size={int(profile.sqlite_cache_size)}",
+        f"PRAGMA foreign_keys={'ON' if profile.sqlite_foreign_keys else 'OFF'}",
+    ]
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+def _engine_options(url: str, profile):
+    if url.startswith("sqlite"):
+        return {"connect_args": {"check_same_thread": False}} if "aiosqlite" not in url else {}
+    return {
+        "pool_size": profile.db_pool_size,
+        "max_overflow": profile.db_max_overflow,
+        "pool_pre_ping": profile.db_pool_pre_ping,
+        "pool_recycle": profile.db_pool_recycle,
+    }
+
+def _instrument(engine, profile):
+    instrument_engine(engine)
+    if profile.slow_query_log:
+        install_slow_query_log(
+            engine,
+            threshold_ms=profile.slow_query_threshold_ms,
+            path=profile.slow_query_log_path,
+            max_bytes=profile.slow_query_log_max_bytes,
+            backups=profile.slow_query_log_backups,
+        )
+    return engine
+
+def create_db_engine(url: str = None, profile=settings):
+    """Engine for `url` tuned by the `profile` settings.
+
+    SQLite connections get the profile's pragmas as they are opened; other
+    databases get a sized, pre-pinged, recycled connection pool. Queries and
+    pool checkouts are counted for metrics.py, and slow statements logged
+    when the profile enables the slow-query log.
+    """
+    url = url or profile.database_url
+    engine = create_engine(url, **_engine_options(url, profile))
+    if url.startswith("sqlite"):
+        _apply_sqlite_pragmas(engine, profile)
+    return _instrument(engine, profile)
+
+def create_async_db_engine(url: str = None, profile=settings):
+    """The async counterpart of create_db_engine."""
+    from sqlalchemy.ext.asyncio import create_async_engine
+    
+    url = url or profile.get_async_database_url()
+    engine = create_async_engine(url, **_engine_options(url, profile))
+    if url.startswith("sqlite"):
+        _apply_sqlite_pragmas(engine.sync_engine, profile)
+    _instrument(engine.sync_engine, profile)
+    return engine
+
+engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# The sync engine also serves migrations and auth in async mode
+async_engine = None
+AsyncSessionLocal = None
+if settings.async_database:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    
+    async_engine = create_async_db_engine()
+    # Routers read attributes after commit, which must not lazy-load in async code
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
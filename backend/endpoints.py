@@ -0,0 +1,82 @@
+"""Data endpoints written once, served by the sync or the async routers.
+
+An Endpoints collects one resource's routes as plain functions over a
+sync Session: the validation, the crud calls and the HTTP errors. Each
+takes `db` and `current_user` first, then its FastAPI parameters as
+usual. sync_router() serves them as def endpoints, run in the threadpool
+with writes going through run_write (and group commit). async_router()
+serves them as async def endpoints over an AsyncSession, running each
+through run_sync so its database I/O is awaited on the event loop; their
+writes commit directly, as the loop must not wait for the writer thread.
+Background tasks they add are sync functions, run in the threadpool
+after the response in both modes.
+"""
+import functools
+import inspect
+from fastapi import APIRouter, Depends
+from auth import get_current_active_user, get_current_active_user_async
+from database import get_db, get_async_db
+
+class Endpoints:
+    def __init__(self, **router_options):
+        self.router_options = router_options
+        self._routes = []
+
+    def route(self, method: str, path: str, **options):
+        def decorator(fn):
+            self._routes.append((method, path, options, fn))
+            return fn
+        return decorator
+
+    def get(self, path: str, **options):
+        return self.route("GET", path, **options)
+
+    def post(self, path: str, **options):
+        return self.route("POST", path, **options)
+
+    def put(self, path: str, **options):
+        return self.route("PUT", path, **options)
+
+    def delete(self, path: str, **options):
+        return self.route("DELETE", path, **options)
+
+    def sync_router(self):
+        return self._router(_sync_endpoint, get_db, get_current_active_user)
+
+    def async_router(self):
+        return self._router(_async_endpoint, get_async_db, get_current_active_user_async)
+
+    def _router(self, adapt, get_session, get_user):
+        router = APIRouter(**self.router_options)
+        for method, path, options, fn in self._routes:
+            endpoint = adapt(fn)
+            endpoint.__signature__ = _signature(fn, get_session, get_user)
+            router.add_api_route(path, endpoint, methods=[method], **options)
+        return router
+
+def _signature(fn, get_session, get_user):
+    # FastAPI reads the parameters from the signature: the handler's own,
+    # then the user and session dependencies of this mode
+    db, current_user, *params = inspect.signature(fn).parameters.values()
+    return inspect.Signature([
+        parameter.replace(kind=inspect.Parameter.KEYWORD_ONLY)
+        for parameter in (
+            *params,
+            current_user.replace(default=Depends(get_user)),
+            db.replace(default=Depends(get_session)),
+        )
+    ])
+
+def _sync_endpoint(fn):
+    @functools.wraps(fn)
+    def endpoint(*, db, current_user, **params):
+        return fn(db, current_user, **params)
+    return endpoint
+
+def _async_endpoint(fn):
+    @functools.wraps(fn)
+    async def endpoint(*, db, current_user, **params):
+        # Read by run_write
+        db.info["async"] = True
+        return await db.run_sync(fn, current_user, **params)
+    return endpoint
@@ -0,0 +1,75 @@
+"""In-process pub/sub for per-user change events.
+
+crud publishes compact events after each write commits; every open change
+stream holds a Subscription with a bounded queue on its event loop. An
+idle subscriber is one parked coroutine and an empty queue. A subscriber
+that falls behind by more than `change_feed_buffer` events has its backlog
+dropped and receives a single {"type": "resync"} event instead, telling
+it to catch up through GET /sync.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+from config import settings
+
+class Subscription:
+    def __init__(self, user_id: int, loop, maxsize: int):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def _push(self, event):
+        # Runs on the subscriber's loop
+        if self.queue.full():
+            self.dropped += self.queue.qsize()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync"})
+            return
+        self.queue.put_nowait(event)
+
+    async def get(self):
+        return await self.queue.get()
+
+class ChangeFeed:
+    def __init__(self, buffer_size: int):
+        self.buffer_size = buffer_size
+        self._subscriptions = defaultdict(set)  # user id -> {Subscription}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id: int) -> Subscription:
+        """Subscribe the running event loop to `user_id`'s changes."""
+        subscription = Subscription(user_id, asyncio.get_running_loop(), max(self.buffer_size, 1))
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def publish(self, user_id: int, events):
+        """Hand events to every subscriber of `user_id`; safe from any thread."""
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            for event in events:
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription._push, event)
+                except RuntimeError:
+                    # The subscriber's loop has closed; it unsubscribes on its way out
+                    break
+
+    def stats(self):
+        with self._lock:
+            return {
+                "users": len(self._subscriptions),
+                "connections": sum(len(subscriptions) for subscriptions in self._subscriptions.values()),
+            }
+
+change_feed = ChangeFeed(buffer_size=settings.change_feed_buffer)
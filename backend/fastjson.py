@@ -0,0 +1,37 @@
+"""Fast JSON for large list responses.
+
+By default a list endpoint loads ORM objects, FastAPI validates each one
+into its response_model and encodes the result with the standard json
+module. For list endpoints that dominates request CPU. Here crud reads
+plain column tuples, zips them into dicts keyed by the response schema's
+field names and orjson encodes them. Endpoints return the Response
+directly, which skips FastAPI's validation. Their response_model stays
+in place, so the OpenAPI contract is unchanged.
+
+The dict keys come from the schema and the values are the same Python
+values the schema would have accepted. The JSON is therefore the same
+document the default path produces.
+"""
+from typing import Dict, List, Optional
+import orjson
+from fastapi import Response
+
+def schema_columns(schema, model, exclude=()):
+    """(field name, model column) for each schema field the model has, in schema order."""
+    return [
+        (name, getattr(model, name))
+        for name in schema.model_fields
+        if name not in exclude and hasattr(model, name)
+    ]
+
+def row_dicts(names, rows) -> List[dict]:
+    """Column tuples as dicts keyed by `names`."""
+    return [dict(zip(names, row)) for row in rows]
+
+def json_response(content, headers: Optional[Dict[str, str]] = None, status_code: int = 200) -> Response:
+    return Response(
+        content=orjson.dumps(content),
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json",
+    )
@@ -0,0 +1,88 @@
+"""Password hashing on a dedicated, size-limited process pool.
+
+bcrypt is deliberately slow. Run inline, a burst of logins occupies every
+request thread; here each call waits on a small process pool instead, and
+once `password_hash_queue_limit` calls are in flight further ones fail
+fast with PasswordHashingBusy rather than queueing behind them.
+"""
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from passlib.context import CryptContext
+from config import settings
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+class PasswordHashingBusy(Exception):
+    """Too many hash/verify calls are already queued."""
+
+# Run in the worker processes
+def _hash(password):
+    return pwd_context.hash(password)
+
+def _verify(plain_password, hashed_password):
+    return pwd_context.verify(plain_password, hashed_password)
+
+class PasswordPool:
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._total_seconds = 0.0
+        self._max_seconds = 0.0
+
+    def _run(self, fn, *args):
+        with self._lock:
+            if self._in_flight >= self.queue_limit:
+                self._rejected += 1
+                raise PasswordHashingBusy()
+            self._in_flight += 1
+            if self.workers > 0 and self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        start = time.perf_counter()
+        try:
+            if self.workers > 0:
+                return self._executor.submit(fn, *args).result()
+            # No pool configured: hash in the calling thread
+            return fn(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._in_flight -= 1
+                self._completed += 1
+                self._total_seconds += elapsed
+                self._max_seconds = max(self._max_seconds, elapsed)
+
+    def hash(self, password: str) -> str:
+        return self._run(_hash, password)
+
+    def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return self._run(_verify, plain_password, hashed_password)
+
+    def stats(self):
+        """Queue length and latency (queue wait plus hashing) so far."""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "avg_seconds": self._total_seconds / self._completed if self._completed else 0.0,
+                "max_seconds": self._max_seconds,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+password_pool = PasswordPool(
+    workers=settings.password_hash_workers,
+    queue_limit=settings.password_hash_queue_limit,
+)
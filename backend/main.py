@@ -1,12 +1,26 @@
+import threading
 from fastapi import FastAPI, Depends
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from database import engine, get_db
-from models import Base
-from routers import auth, projects, tasks, subtasks, dashboard
+from migrations import upgrade_schema
+from hashing import password_pool
+from write_queue import group_commit
+from archive import archive_job
+from reminders import reminder_scheduler
+from compression import CompressionMiddleware, compression_stats
+from metrics import MetricsMiddleware, registry
+from config import settings
+from routers import auth, changes
+from routers.projects import purge_deleted_projects
+if settings.async_database:
+    from async_routers import projects, tasks, subtasks, dashboard, sync
+else:
+    from routers import projects, tasks, subtasks, dashboard, sync
 
 # Create database tables
-Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
 
 app = FastAPI(
     title="Blitzit API",
@@ -21,22 +35,85 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Pagination cursors, conditional GET validators and timings
+    expose_headers=["X-Next-Cursor", "ETag", "Server-Timing"],
 )
 
+if settings.compression:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression_minimum_size,
+        gzip_level=settings.compression_gzip_level,
+        brotli_quality=settings.compression_brotli_quality,
+        zstd_level=settings.compression_zstd_level,
+    )
+
+# Outermost, so its timings cover compression too
+if settings.metrics:
+    app.add_middleware(MetricsMiddleware, server_timing=settings.server_timing)
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(projects.router)
 app.include_router(tasks.router)
 app.include_router(subtasks.router)
 app.include_router(dashboard.router)
+app.include_router(sync.router)
+app.include_router(changes.router)
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to Blitzit API"}
 
+@app.on_event("startup")
+def resume_project_purges():
+    # Projects marked deleted before a restart; purged off the startup path
+    threading.Thread(target=purge_deleted_projects, name="project-purge", daemon=True).start()
+
+@app.on_event("startup")
+def start_archive_job():
+    archive_job.start()
+
+@app.on_event("shutdown")
+def shutdown_archive_job():
+    archive_job.shutdown()
+
+@app.on_event("startup")
+def start_reminder_scheduler():
+    if settings.reminders:
+        reminder_scheduler.start()
+
+@app.on_event("shutdown")
+def shutdown_reminder_scheduler():
+    reminder_scheduler.shutdown()
+
+@app.on_event("shutdown")
+def shutdown_password_pool():
+    password_pool.shutdown()
+
+@app.on_event("shutdown")
+def shutdown_group_commit():
+    if group_commit is not None:
+        group_commit.shutdown()
+
 @app.get("/health")
 def health_check():
-    return {"status": "healthy"}
+    health = {"status": "healthy", "password_hashing": password_pool.stats()}
+    if group_commit is not None:
+        health["group_commit"] = group_commit.stats()
+    if settings.archive_after_days > 0:
+        health["archive"] = archive_job.stats()
+    if settings.reminders:
+        health["reminders"] = reminder_scheduler.stats()
+    if settings.compression:
+        health["compression"] = compression_stats.snapshot()
+    return health
+
+if settings.metrics:
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        """Prometheus scrape target."""
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,262 @@
+"""Request and database metrics, exposed in the Prometheus text format.
+
+MetricsMiddleware times every HTTP request by method and route template
+and counts responses by status. It also tracks how many requests are in
+flight. Engines passed to instrument_engine() count each SQL statement
+and its time against the request that ran it, through a context
+variable. Sync endpoints run in the threadpool with a copy of that
+context, so their queries are counted too. They also time every pool
+checkout, including any wait for a free connection.
+
+Each response gets a Server-Timing header with the app time, the query
+count and time, and the pool wait. A request whose query count jumps
+(an N+1) or whose db time dominates is visible in the browser's network
+panel. The same figures are aggregated at GET /metrics.
+"""
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from sqlalchemy import event
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+POOL_WAIT_BUCKETS = (0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+INF_LABEL = 'le="+Inf"'
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(labels[name] for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            lines += self._samples()
+        return lines
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values = defaultdict(float)
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] += amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self):
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in self._values.items()]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DURATION_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return series[-1] if series else 0
+
+    def _samples(self):
+        lines = []
+        for key, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = 'le="%s"' % _number(float(bound))
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, INF_LABEL)} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(series[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs) -> Counter:
+        return self.register(Counter(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs) -> Gauge:
+        return self.register(Gauge(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        return self.register(Histogram(*args, **kwargs))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+requests_total = registry.counter("http_requests_total", "HTTP responses by method, route and status.", ("method", "route", "status"))
+request_seconds = registry.histogram("http_request_duration_seconds", "HTTP request latency.", ("method", "route"))
+requests_in_flight = registry.gauge("http_requests_in_flight", "HTTP requests being served.")
+db_queries = registry.histogram("db_queries_per_request", "SQL statements run per HTTP request.", ("method", "route"), QUERY_COUNT_BUCKETS)
+db_seconds = registry.counter("db_query_seconds_total", "Time spent in SQL statements, by route.", ("method", "route"))
+pool_wait_seconds = registry.histogram("db_pool_checkout_seconds", "Time to check a connection out of the pool.", buckets=POOL_WAIT_BUCKETS)
+
+# Request-scoped figures, for Server-Timing
+class RequestStats:
+    __slots__ = ("scope", "queries", "db_seconds", "pool_wait_seconds")
+
+    def __init__(self, scope=None):
+        self.scope = scope
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+
+current_request = ContextVar("current_request", default=None)
+
+_route_paths = {}  # endpoint -> path template
+
+def route_label(scope) -> str:
+    """The matched route's path template, e.g. "/tasks/{task_id}"."""
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    if endpoint not in _route_paths:
+        for route in getattr(scope.get("app"), "routes", ()):
+            if getattr(route, "endpoint", None) is endpoint:
+                _route_paths[endpoint] = route.path
+                break
+        else:
+            return "unmatched"
+    return _route_paths[endpoint]
+
+def _time_pool_checkouts(pool):
+    connect = pool.connect
+
+    def timed_connect():
+        start = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            elapsed = time.perf_counter() - start
+            pool_wait_seconds.observe(elapsed)
+            stats = current_request.get()
+            if stats is not None:
+                stats.pool_wait_seconds += elapsed
+
+    pool.connect = timed_connect
+
+def instrument_engine(engine):
+    """Count statements, statement time and pool checkout time for `engine`."""
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_query(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def end_query(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        stats = current_request.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def failed_query(context):
+        starts = context.connection.info.get("query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+    @event.listens_for(engine, "engine_disposed")
+    def new_pool(engine):
+        _time_pool_checkouts(engine.pool)
+
+    _time_pool_checkouts(engine.pool)
+    return engine
+
+class MetricsMiddleware:
+    def __init__(self, app, server_timing: bool = True):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    app_ms = (time.perf_counter() - start) * 1000
+                    timing = (
+                        f"app;dur={app_ms:.2f}, "
+                        f'db;dur={stats.db_seconds * 1000:.2f};desc="{stats.queries} queries", '
+                        f"pool;dur={stats.pool_wait_seconds * 1000:.2f}"
+                    )
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", timing.encode())]}
+            await send(message)
+
+        requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            requests_in_flight.dec()
+            current_request.reset(token)
+            labels = {"method": scope["method"], "route": route_label(scope)}
+            request_seconds.observe(time.perf_counter() - start, **labels)
+            requests_total.inc(**labels, status=status)
+            db_queries.observe(stats.queries, **labels)
+            db_seconds.inc(stats.db_seconds, **labels)
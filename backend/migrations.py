@@ -0,0 +1,325 @@
+"""Bring databases created by an earlier version up to the current models.
+
+Base.metadata.create_all only creates missing tables, so anything added to
+an existing table is applied here instead, at every startup:
+
+- columns missing from existing tables are added, with their server
+  default filling existing rows
+- foreign keys created before the models declared ON DELETE CASCADE are
+  recreated with it, after deleting the orphans earlier deletes left
+  (SQLite cannot alter a constraint, so those tables are rebuilt)
+- SQLite tables the models declare AUTOINCREMENT are rebuilt with it, and
+  their sequence starts past every id they handed out before
+- indexes missing from existing tables are created (a no-op once they exist)
+- Postgres rank columns created with the database's collation get "C"
+- rank columns that were just added are filled in, keeping id order
+- newly created task_counters and daily_user_stats are filled in from
+  existing tasks
+- a newly added remind_at is set for reminders still to come
+- the task search index and its triggers are installed (see search.py)
+"""
+from datetime import date, datetime
+from collections import defaultdict
+from sqlalchemy import inspect, text, select, update, insert, bindparam, func, case, or_
+from sqlalchemy.schema import CreateColumn, CreateTable
+from models import Base, Project, Task, SubTask, ArchivedTask, ArchivedSubTask, TaskCounter, DailyUserStat, Tombstone
+from reminders import reminder_time
+from ranks import evenly_spaced_keys
+from search import install_search_index
+
+def add_missing_columns(engine):
+    """Add columns the models have but the tables lack; returns their "table.column" names."""
+    inspector = inspect(engine)
+    added = set()
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                table_name = engine.dialect.identifier_preparer.format_table(table)
+                column_ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_ddl}"))
+                added.add(f"{table.name}.{column.name}")
+    return added
+
+def backfill_ranks(engine, model, group_by):
+    """Give every row an evenly spaced rank within its group, in id order."""
+    with engine.begin() as conn:
+        rows = conn.execute(select(model.id, *group_by).order_by(*group_by, model.id)).all()
+        groups = {}
+        for row in rows:
+            groups.setdefault(tuple(row[1:]), []).append(row[0])
+        params = [
+            {"row_id": row_id, "new_rank": rank}
+            for ids in groups.values()
+            for row_id, rank in zip(ids, evenly_spaced_keys(len(ids)))
+        ]
+        if params:
+            conn.execute(
+                update(model.__table__)
+                .where(model.__table__.c.id == bindparam("row_id"))
+                .values(rank=bindparam("new_rank")),
+                params,
+            )
+
+def backfill_task_counters(engine):
+    """Count each user's tasks per column, as crud.rebuild_task_counters does."""
+    deleted = select(Project.id).where(Project.deleted_at.isnot(None))
+    with engine.begin() as conn:
+        rows = conn.execute(
+            select(Task.owner_id, Task.column, func.count(Task.id), func.sum(case((Task.due_date.isnot(None), 1), else_=0)))
+            .where(Task.owner_id.isnot(None), or_(Task.project_id.is_(None), Task.project_id.notin_(deleted)))
+            .group_by(Task.owner_id, Task.column)
+        ).all()
+        if rows:
+            conn.execute(insert(TaskCounter), [
+                {"owner_id": owner_id, "column": column, "task_count": task_count, "due_count": due_count or 0}
+                for owner_id, column, task_count, due_count in rows
+            ])
+
+def backfill_daily_stats(engine):
+    """Fill the daily rollup from the tasks table (tasks deleted earlier are gone)."""
+    stats = defaultdict(lambda: [0, 0, 0, 0])
+    with engine.begin() as conn:
+        created_on = func.date(Task.created_at)
+        rows = conn.execute(
+            select(Task.owner_id, created_on, Task.project_id, func.count(Task.id))
+            .where(Task.owner_id.isnot(None), Task.created_at.isnot(None))
+            .group_by(Task.owner_id, created_on, Task.project_id)
+        )
+        for owner_id, day, project_id, count in rows:
+            stats[(owner_id, date.fromisoformat(str(day)), project_id or 0)][0] += count
+        completed_on = func.date(Task.completed_at)
+        rows = conn.execute(
+            select(
+                Task.owner_id, completed_on, Task.project_id, func.count(Task.id),
+                func.sum(func.coalesce(Task.estimated_time, 0)), func.sum(func.coalesce(Task.actual_time, 0)),
+            )
+            .where(Task.owner_id.isnot(None), Task.completed_at.isnot(None))
+            .group_by(Task.owner_id, completed_on, Task.project_id)
+        )
+        for owner_id, day, project_id, count, estimated, actual in rows:
+            stat = stats[(owner_id, date.fromisoformat(str(day)), project_id or 0)]
+            stat[1:] = [stat[1] + count, stat[2] + estimated, stat[3] + actual]
+        if stats:
+            conn.execute(insert(DailyUserStat), [
+                {
+                    "owner_id": owner_id, "day": day, "project_id": project_id,
+                    "tasks_created": created, "tasks_completed": completed,
+                    "estimated_minutes": estimated, "actual_minutes": actual,
+                }
+                for (owner_id, day, project_id), (created, completed, estimated, actual) in stats.items()
+            ])
+
+def backfill_reminders(engine):
+    """Set remind_at for enabled reminders that have yet to fire; earlier ones are not sent late."""
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        # remind_at is never after the due date, so tasks already due are skipped
+        rows = conn.execute(
+            select(Task.id, Task.column, Task.due_date, Task.reminder_enabled, Task.reminder_offset)
+            .where(Task.reminder_enabled.is_(True), Task.due_date > now)
+        ).all()
+        params = []
+        for row in rows:
+            remind_at = reminder_time(row.column, row.due_date, row.reminder_enabled, row.reminder_offset)
+            if remind_at is not None and remind_at > now:
+                params.append({"row_id": row.id, "new_remind_at": remind_at})
+        if params:
+            conn.execute(
+                update(Task.__table__)
+                .where(Task.__table__.c.id == bindparam("row_id"))
+                .values(remind_at=bindparam("new_remind_at")),
+                params,
+            )
+
+def _missing_cascades(engine):
+    """(table, foreign key) pairs the models declare with ON DELETE but the database lacks it."""
+    inspector = inspect(engine)
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        actual = {
+            (tuple(fk["constrained_columns"]), fk["referred_table"]): (fk.get("options") or {}).get("ondelete")
+            for fk in inspector.get_foreign_keys(table.name)
+        }
+        for fk in table.foreign_keys:
+            if fk.ondelete is None:
+                continue
+            ondelete = actual.get(((fk.parent.name,), fk.column.table.name))
+            if (ondelete or "").upper() != fk.ondelete.upper():
+                missing.append((table, fk))
+    return missing
+
+def _delete_orphans(conn, preparer, table, fk):
+    """Rows whose parent is gone, which enforcing the foreign key would reject."""
+    conn.exec_driver_sql(
+        f"DELETE FROM {preparer.format_table(table)} WHERE {preparer.quote(fk.parent.name)} IS NOT NULL "
+        f"AND {preparer.quote(fk.parent.name)} NOT IN "
+        f"(SELECT {preparer.quote(fk.column.name)} FROM {preparer.format_table(fk.column.table)})"
+    )
+
+def _rebuild_sqlite_table(conn, preparer, table):
+    """Recreate `table` from the model and copy its rows over (SQLite's documented table rebuild)."""
+    name = preparer.format_table(table)
+    new_name = preparer.quote(f"_new_{table.name}")
+    ddl = str(CreateTable(table).compile(dialect=conn.dialect)).replace(f"CREATE TABLE {name}", f"CREATE TABLE {new_name}", 1)
+    columns = ", ".join(preparer.quote(column.name) for column in table.columns)
+    conn.exec_driver_sql(ddl)
+    conn.exec_driver_sql(f"INSERT INTO {new_name} ({columns}) SELECT {columns} FROM {name}")
+    seq = None
+    if table.dialect_options["sqlite"]["autoincrement"]:
+        # The sequence goes with the old table; the copy's only covers the rows copied
+        seq = conn.execute(text("SELECT seq FROM sqlite_sequence WHERE name = :name"), {"name": table.name}).scalar()
+    # Takes the table's indexes and triggers with it; create_missing_indexes
+    # and install_search_index put them back
+    conn.exec_driver_sql(f"DROP TABLE {name}")
+    conn.exec_driver_sql(f"ALTER TABLE {new_name} RENAME TO {name}")
+    if seq is not None:
+        conn.execute(
+            text("UPDATE sqlite_sequence SET seq = max(seq, :seq) WHERE name = :name"), {"name": table.name, "seq": seq}
+        )
+
+def _rebuild_sqlite_tables(conn, tables, prepare=None):
+    """Rebuild `tables` in one transaction with foreign keys off, after `prepare(conn)`."""
+    preparer = conn.dialect.identifier_preparer
+    enforced = conn.exec_driver_sql("PRAGMA foreign_keys").scalar()
+    # Only takes effect outside a transaction
+    conn.exec_driver_sql("PRAGMA foreign_keys=OFF")
+    conn.commit()
+    try:
+        with conn.begin():
+            if prepare is not None:
+                prepare(conn)
+            for table in sorted(tables, key=Base.metadata.sorted_tables.index):
+                _rebuild_sqlite_table(conn, preparer, table)
+    finally:
+        conn.exec_driver_sql(f"PRAGMA foreign_keys={enforced}")
+        conn.commit()
+
+def add_cascading_foreign_keys(engine):
+    """Give existing foreign keys the ON DELETE rules of the models; returns the tables changed."""
+    missing = _missing_cascades(engine)
+    if not missing:
+        return set()
+    preparer = engine.dialect.identifier_preparer
+    tables = sorted({table for table, _ in missing}, key=Base.metadata.sorted_tables.index)
+    with engine.connect() as conn:
+        if engine.dialect.name == "sqlite":
+            def delete_orphans(conn):
+                for table, fk in missing:
+                    _delete_orphans(conn, preparer, table, fk)
+            _rebuild_sqlite_tables(conn, tables, delete_orphans)
+        else:
+            inspector = inspect(conn)
+            with conn.begin():
+                for table, fk in missing:
+                    _delete_orphans(conn, preparer, table, fk)
+                    for existing in inspector.get_foreign_keys(table.name):
+                        if existing["constrained_columns"] == [fk.parent.name] and existing["name"]:
+                            conn.exec_driver_sql(
+                                f"ALTER TABLE {preparer.format_table(table)} DROP CONSTRAINT {preparer.quote(existing['name'])}"
+                            )
+                    conn.exec_driver_sql(
+                        f"ALTER TABLE {preparer.format_table(table)} ADD FOREIGN KEY ({preparer.quote(fk.parent.name)}) "
+                        f"REFERENCES {preparer.format_table(fk.column.table)} ({preparer.quote(fk.column.name)}) "
+                        f"ON DELETE {fk.ondelete}"
+                    )
+    return {table.name for table in tables}
+
+# Where else a table's ids live on once its rows are gone: (tombstone entity, archive model)
+RETIRED_IDS = {
+    Project.__table__: ("project", None),
+    Task.__table__: ("task", ArchivedTask),
+    SubTask.__table__: ("subtask", ArchivedSubTask),
+}
+
+def _highest_id_used(conn, table):
+    entity, archive = RETIRED_IDS.get(table, (None, None))
+    candidates = [select(func.max(table.c.id)).scalar_subquery()]
+    if entity is not None:
+        candidates.append(select(func.max(Tombstone.entity_id)).where(Tombstone.entity == entity).scalar_subquery())
+    if archive is not None:
+        candidates.append(select(func.max(archive.id)).scalar_subquery())
+    return max((conn.execute(select(candidate)).scalar() or 0) for candidate in candidates)
+
+def add_sqlite_autoincrement(engine):
+    """Rebuild SQLite tables the models declare AUTOINCREMENT but that lack it; returns their names.
+
+    Without it SQLite hands out max(id) + 1, so deleting the newest row
+    lets the next insert take its id. The sequence starts past the highest
+    id still named anywhere: live rows, tombstones and the archive.
+    """
+    if engine.dialect.name != "sqlite":
+        return set()
+    with engine.connect() as conn:
+        tables = []
+        for table in Base.metadata.sorted_tables:
+            if not table.dialect_options["sqlite"]["autoincrement"]:
+                continue
+            sql = conn.execute(
+                text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table.name}
+            ).scalar()
+            if sql is not None and "AUTOINCREMENT" not in sql.upper():
+                tables.append(table)
+        if not tables:
+            return set()
+        highest = {table.name: _highest_id_used(conn, table) for table in tables}
+        conn.commit()
+        # The rebuilt tables get the models' ON DELETE rules too, which their orphans would break
+        missing = [(table, fk) for table, fk in _missing_cascades(engine) if table in tables]
+
+        def delete_orphans(conn):
+            for table, fk in missing:
+                _delete_orphans(conn, engine.dialect.identifier_preparer, table, fk)
+        _rebuild_sqlite_tables(conn, tables, delete_orphans)
+        with conn.begin():
+            for name, seq in highest.items():
+                conn.execute(text("DELETE FROM sqlite_sequence WHERE name = :name"), {"name": name})
+                conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"), {"name": name, "seq": seq})
+    return set(highest)
+
+def set_rank_collation(engine):
+    """Give Postgres rank columns the "C" collation the models declare; returns the tables changed."""
+    if engine.dialect.name != "postgresql":
+        return set()
+    changed = set()
+    with engine.begin() as conn:
+        for model in (Task, SubTask):
+            collation = conn.execute(text(
+                "SELECT collation_name FROM information_schema.columns "
+                "WHERE table_schema = current_schema() AND table_name = :table AND column_name = 'rank'"
+            ), {"table": model.__tablename__}).scalar()
+            if collation != "C":
+                conn.execute(text(f'ALTER TABLE {model.__tablename__} ALTER COLUMN rank TYPE VARCHAR COLLATE "C"'))
+                changed.add(model.__tablename__)
+    return changed
+
+def create_missing_indexes(engine):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+def upgrade_schema(engine):
+    """Create missing tables, columns, foreign key rules, AUTOINCREMENT, collations and indexes, and the search index."""
+    inspector = inspect(engine)
+    new_counters = not inspector.has_table(TaskCounter.__tablename__)
+    new_rollup = not inspector.has_table(DailyUserStat.__tablename__)
+    Base.metadata.create_all(bind=engine)
+    added = add_missing_columns(engine)
+    # First, so a rebuild for the cascades doesn't add AUTOINCREMENT without the retired ids
+    add_sqlite_autoincrement(engine)
+    add_cascading_foreign_keys(engine)
+    set_rank_collation(engine)
+    create_missing_indexes(engine)
+    if "tasks.rank" in added:
+        backfill_ranks(engine, Task, [Task.owner_id, Task.column])
+    if "subtasks.rank" in added:
+        backfill_ranks(engine, SubTask, [SubTask.parent_task_id])
+    if new_counters:
+        backfill_task_counters(engine)
+    if new_rollup:
+        backfill_daily_stats(engine)
+    if "tasks.remind_at" in added:
+        backfill_reminders(engine)
+    install_search_index(engine)
@@ -1,10 +1,14 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, Text, Boolean, Date, DateTime, ForeignKey, Float, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
 Base = declarative_base()
 
+# Rank keys (see ranks.py) compare byte by byte; Postgres would otherwise
+# sort them by the database locale, which puts "a" before "Z"
+RankKey = String().with_variant(String(collation="C"), "postgresql")
+
 class User(Base):
     __tablename__ = "users"
     
@@ -30,10 +34,19 @@ class Project(Base):
     owner_id = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    revision = Column(Integer, default=0, server_default="0", nullable=False)  # owner's revision at the last write
+    deleted_at = Column(DateTime, index=True)  # set while a large project's tasks are purged (hidden from reads)
     
     # Relationships
     owner = relationship("User", back_populates="projects")
-    tasks = relationship("Task", back_populates="project")
+    # The database deletes the tasks (ON DELETE CASCADE); they are never loaded to be deleted
+    tasks = relationship("Task", back_populates="project", cascade="all, delete", passive_deletes=True)
+    
+    __table_args__ = (
+        Index("ix_projects_owner_revision", "owner_id", "revision"),
+        # Never hand out a deleted row's id again, so a tombstone can't name a new row
+        {"sqlite_autoincrement": True},
+    )
 
 class Task(Base):
     __tablename__ = "tasks"
@@ -49,22 +62,45 @@ class Task(Base):
     due_date = Column(DateTime)
     reminder_enabled = Column(Boolean, default=False)
     reminder_offset = Column(Integer, default=0)  # minutes before due date
+    remind_at = Column(DateTime)  # when the reminder fires (see reminders.py); NULL once sent, or without one
     is_urgent = Column(Boolean, default=False)
     is_important = Column(Boolean, default=False)
+    rank = Column(RankKey)  # fractional rank key (see ranks.py): order within the column
     
     # Foreign Keys
-    project_id = Column(Integer, ForeignKey("projects.id"))
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"))
     owner_id = Column(Integer, ForeignKey("users.id"))
     
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     completed_at = Column(DateTime)
+    revision = Column(Integer, default=0, server_default="0", nullable=False)  # owner's revision at the last write
     
     # Relationships
     project = relationship("Project", back_populates="tasks")
     owner = relationship("User", back_populates="tasks")
-    subtasks = relationship("SubTask", back_populates="parent_task")
+    subtasks = relationship(
+        "SubTask", back_populates="parent_task", order_by="SubTask.rank", cascade="all, delete", passive_deletes=True
+    )
+    
+    # Composite indexes so per-user board pages and filters are index range scans
+    __table_args__ = (
+        Index("ix_tasks_owner_id_id", "owner_id", "id"),
+        Index("ix_tasks_owner_column_id", "owner_id", "column", "id"),
+        Index("ix_tasks_owner_column_rank", "owner_id", "column", "rank"),
+        Index("ix_tasks_owner_project_id", "owner_id", "project_id", "id"),
+        Index("ix_tasks_owner_due_date", "owner_id", "due_date"),
+        Index("ix_tasks_owner_revision", "owner_id", "revision"),
+        # The archive job's oldest-completed-first scan over every user
+        Index("ix_tasks_column_completed", "column", "completed_at"),
+        # Child key of the ON DELETE CASCADE from projects
+        Index("ix_tasks_project_id", "project_id"),
+        # The reminder scheduler loads the next window of fire times from here
+        Index("ix_tasks_remind_at", "remind_at"),
+        # Ids are never reused, by new tasks after a delete or while a task is archived
+        {"sqlite_autoincrement": True},
+    )
 
 class SubTask(Base):
     __tablename__ = "subtasks"
@@ -72,8 +108,106 @@ class SubTask(Base):
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
     is_completed = Column(Boolean, default=False)
-    parent_task_id = Column(Integer, ForeignKey("tasks.id"))
+    parent_task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"))
+    rank = Column(RankKey)  # fractional rank key (see ranks.py): order within the parent task
     created_at = Column(DateTime, default=datetime.utcnow)
+    revision = Column(Integer, default=0, server_default="0", nullable=False, index=True)  # owner's revision at the last write
     
     # Relationships
     parent_task = relationship("Task", back_populates="subtasks")
+    
+    __table_args__ = (
+        Index("ix_subtasks_parent_rank", "parent_task_id", "rank"),
+        {"sqlite_autoincrement": True},
+    )
+
+class ArchivedTask(Base):
+    __tablename__ = "archived_tasks"
+    
+    # Done tasks moved out of tasks once they are old enough (see archive.py).
+    # Same columns and ids as tasks, so a restore puts the row back as it was
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    title = Column(String)
+    notes = Column(Text)
+    column = Column(String)
+    estimated_time = Column(Integer, default=0)
+    actual_time = Column(Integer, default=0)
+    task_type = Column(String)
+    task_priority = Column(String)
+    due_date = Column(DateTime)
+    reminder_enabled = Column(Boolean, default=False)
+    reminder_offset = Column(Integer, default=0)
+    remind_at = Column(DateTime)
+    is_urgent = Column(Boolean, default=False)
+    is_important = Column(Boolean, default=False)
+    rank = Column(String)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"))
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    completed_at = Column(DateTime)
+    revision = Column(Integer, default=0, server_default="0", nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+    
+    # A user's archive, most recently completed first
+    __table_args__ = (
+        Index("ix_archived_tasks_owner_completed", "owner_id", "completed_at", "id"),
+        Index("ix_archived_tasks_owner_project", "owner_id", "project_id"),
+    )
+
+class ArchivedSubTask(Base):
+    __tablename__ = "archived_subtasks"
+    
+    # The subtasks of archived tasks, with the columns and ids of subtasks
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    title = Column(String)
+    is_completed = Column(Boolean, default=False)
+    parent_task_id = Column(Integer, ForeignKey("archived_tasks.id", ondelete="CASCADE"), index=True)
+    rank = Column(String)
+    created_at = Column(DateTime)
+    revision = Column(Integer, default=0, server_default="0", nullable=False)
+
+class TaskCounter(Base):
+    __tablename__ = "task_counters"
+    
+    # Per-user, per-column task counts maintained by the crud write paths
+    owner_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    column = Column(String, primary_key=True)
+    task_count = Column(Integer, default=0, nullable=False)
+    due_count = Column(Integer, default=0, nullable=False)  # tasks with a due date (overdue candidates)
+
+class DailyUserStat(Base):
+    __tablename__ = "daily_user_stats"
+    
+    # Per-user, per-day, per-project activity rollup maintained by the crud
+    # write paths; the primary key order makes a user's date range one
+    # index range scan
+    owner_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    project_id = Column(Integer, primary_key=True)  # 0 for tasks without a project; kept after the project is deleted
+    tasks_created = Column(Integer, default=0, nullable=False)
+    tasks_completed = Column(Integer, default=0, nullable=False)
+    estimated_minutes = Column(Integer, default=0, nullable=False)  # of the tasks completed that day
+    actual_minutes = Column(Integer, default=0, nullable=False)  # of the tasks completed that day
+
+class UserRevision(Base):
+    __tablename__ = "user_revisions"
+    
+    # Bumped by every crud write to the user's projects, tasks and subtasks
+    owner_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    revision = Column(Integer, default=0, nullable=False)
+
+class Tombstone(Base):
+    __tablename__ = "tombstones"
+    
+    # One row per deleted project, task or subtask, so /sync can report deletions
+    id = Column(Integer, primary_key=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    entity = Column(String, nullable=False)  # project, task, subtask
+    entity_id = Column(Integer, nullable=False)
+    revision = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_tombstones_owner_revision", "owner_id", "revision"),
+    )
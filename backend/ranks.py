@@ -0,0 +1,72 @@
+"""Fractional rank keys for ordering tasks and subtasks.
+
+A rank is a base-62 string read as the digits of a fraction in [0, 1), so
+ranks compare correctly as plain strings (and in a database index). There
+is always another key between two distinct keys, so moving an item only
+rewrites its own rank. Keys never end in the zero digit, which is what
+guarantees that room.
+
+Appending counts up instead of halving the room left: the keys after the
+first are "z" * p followed by p + 1 digits, so n appends need keys of
+about 2 * log62(n) digits. Repeated inserts at any other spot lengthen
+keys by about one character per six inserts; evenly_spaced_keys()
+reissues short keys for a whole list when they grow too long.
+"""
+from typing import List, Optional
+
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+BASE = len(DIGITS)
+_INDEX = {digit: index for index, digit in enumerate(DIGITS)}
+
+def _digits(value: int, width: int) -> str:
+    digits = []
+    for _ in range(width):
+        value, digit = divmod(value, BASE)
+        digits.append(DIGITS[digit])
+    return "".join(reversed(digits))
+
+def _after(a: str) -> str:
+    # A key after a (no trailing zero digit); see the module docstring
+    if not a:
+        return DIGITS[BASE // 2]
+    p = len(a) - len(a.lstrip("z"))
+    value = 0
+    for digit in a[p:2 * p + 1].ljust(p + 1, "0"):
+        value = value * BASE + _INDEX[digit]
+    value += 1
+    if value >= (BASE - 1) * BASE ** p:
+        # The p + 1 digits would start with z: on to the next length
+        return "z" * (p + 1) + DIGITS[1]
+    return "z" * p + _digits(value, p + 1).rstrip("0")
+
+def _midpoint(a: str, b: Optional[str]) -> str:
+    # a < b (b None meaning 1.0); neither has a trailing zero digit
+    if b is None:
+        return _after(a)
+    n = 0
+    while n < len(b) and (a[n] if n < len(a) else "0") == b[n]:
+        n += 1
+    if n > 0:
+        return b[:n] + _midpoint(a[n:], b[n:])
+    digit_a = _INDEX[a[0]] if a else 0
+    digit_b = _INDEX[b[0]]
+    if digit_b - digit_a > 1:
+        return DIGITS[(digit_a + digit_b + 1) // 2]
+    # Adjacent digits: go one level deeper
+    if len(b) > 1:
+        return b[:1]
+    return DIGITS[digit_a] + _midpoint(a[1:], None)
+
+def key_between(before: Optional[str], after: Optional[str]) -> str:
+    """A key that sorts after `before` and before `after`; None is an open end."""
+    if before is not None and after is not None and before >= after:
+        raise ValueError(f"{before!r} does not sort before {after!r}")
+    return _midpoint(before or "", after)
+
+def evenly_spaced_keys(count: int) -> List[str]:
+    """`count` ascending keys of the shortest width that spaces them apart."""
+    width = 1
+    while BASE ** width <= count:
+        width += 1
+    step = BASE ** width // (count + 1)
+    return [_digits(position * step, width).rstrip("0") for position in range(1, count + 1)]
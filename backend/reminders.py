@@ -0,0 +1,231 @@
+"""Server-side task reminders, fired by one scheduler thread.
+
+A task's reminder fires reminder_offset minutes before its due date.
+crud stores that time in tasks.remind_at, kept up to date by every write,
+and clears it once the reminder is sent (or the task is Done). So the
+database always knows which reminders are pending, across restarts.
+
+ReminderScheduler keeps a min-heap of (remind_at, task id) and sleeps
+until the earliest one. It only holds the next reminder_window_minutes of
+reminders: at the end of each window it loads the next one from the
+ix_tasks_remind_at index, a range scan of just those rows. Memory and
+work follow the reminders actually coming up, however many tasks there
+are, and nothing scans the tasks table. crud hands it every committed
+change to a remind_at (create_task, update_task and the other writes).
+Superseded heap entries are not removed; they are skipped when popped.
+
+Due reminders are claimed with crud.claim_due_reminders, which rechecks
+them against the database, and handed to the sink after the claim
+commits (so a reminder is claimed once). If the sink fails, they are put
+back with crud.retry_reminders, due again retry_seconds later:
+
+- "change_feed": a {"type": "task.reminder", ...} event on the owner's
+  change stream (see events.py)
+- "webhook": a POST of {"reminders": [...]} to reminder_webhook_url
+
+Any object with a deliver(reminders) method can be passed as the sink.
+"""
+import heapq
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+import httpx
+import crud
+from config import settings
+from database import SessionLocal
+from events import change_feed
+
+logger = logging.getLogger("blitzit.reminders")
+
+def reminder_time(column: str, due_date: datetime, reminder_enabled: bool, reminder_offset: int):
+    """When a task's reminder fires: `reminder_offset` minutes before it is due, never once Done."""
+    if not reminder_enabled or due_date is None or column == "Done":
+        return None
+    if due_date.tzinfo is not None:
+        due_date = due_date.astimezone(timezone.utc).replace(tzinfo=None)
+    return due_date - timedelta(minutes=reminder_offset or 0)
+
+def _reminder_json(reminder):
+    return {
+        **reminder,
+        "due_date": reminder["due_date"].isoformat() if reminder["due_date"] else None,
+        "remind_at": reminder["remind_at"].isoformat(),
+    }
+
+class ChangeFeedSink:
+    """Send each reminder to its owner's open change streams."""
+
+    def deliver(self, reminders):
+        by_owner = defaultdict(list)
+        for reminder in reminders:
+            by_owner[reminder["owner_id"]].append({"type": "task.reminder", **_reminder_json(reminder)})
+        for owner_id, events in by_owner.items():
+            change_feed.publish(owner_id, events)
+
+class WebhookSink:
+    """POST each batch of due reminders to a URL as JSON."""
+
+    def __init__(self, url: str, timeout: float):
+        self.url = url
+        self.timeout = timeout
+
+    def deliver(self, reminders):
+        response = httpx.post(
+            self.url, json={"reminders": [_reminder_json(reminder) for reminder in reminders]}, timeout=self.timeout
+        )
+        response.raise_for_status()
+
+class ReminderScheduler:
+    def __init__(self, sink, window_minutes: float, retry_seconds: float = 30.0):
+        self.sink = sink
+        self.window = timedelta(minutes=window_minutes)
+        self.retry = timedelta(seconds=retry_seconds)
+        self._heap = []  # (remind_at, task id), only for remind_at < _loaded_until
+        self._pending = {}  # task id -> its current remind_at in the heap
+        self._loaded_until = None  # None until the first window is loaded
+        self._next_wake = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._loaded = 0
+        self._delivered = 0
+        self._failed = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="reminders", daemon=True)
+                self._thread.start()
+
+    def schedule_many(self, changes):
+        """Record committed (task id, remind_at) changes; remind_at None cancels.
+
+        Reminders beyond the loaded window are left to the window that
+        covers them, which reads them from the database.
+        """
+        with self._lock:
+            if self._loaded_until is None:
+                return
+            earliest = None
+            for task_id, remind_at in changes:
+                if remind_at is None or remind_at >= self._loaded_until:
+                    self._pending.pop(task_id, None)
+                    continue
+                self._push([(task_id, remind_at)])
+                earliest = remind_at if earliest is None else min(earliest, remind_at)
+            wake = earliest is not None and (self._next_wake is None or earliest < self._next_wake)
+        if wake:
+            self._wake.set()
+
+    def _load_window(self, now: datetime):
+        # Extend the window before reading it: a write committed after the
+        # read is then scheduled through schedule_many instead of missed
+        with self._lock:
+            since, self._loaded_until = self._loaded_until, max(self._loaded_until or now, now) + self.window
+            until = self._loaded_until
+        db = SessionLocal()
+        try:
+            # The first window also picks up reminders that fell due while stopped
+            rows = crud.get_reminder_times(db, before=until, since=since)
+        finally:
+            db.close()
+        with self._lock:
+            self._push(rows)
+            self._loaded += len(rows)
+
+    def _push(self, entries):
+        # Callers hold the lock
+        for task_id, remind_at in entries:
+            self._pending[task_id] = remind_at
+            heapq.heappush(self._heap, (remind_at, task_id))
+
+    def poll(self, now: datetime):
+        """Send the reminders due at `now`; returns when the next one is due (or the window ends)."""
+        if self._loaded_until is None or now >= self._loaded_until:
+            self._load_window(now)
+        due = {}
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                remind_at, task_id = heapq.heappop(self._heap)
+                if self._pending.get(task_id) == remind_at:
+                    del self._pending[task_id]
+                    due[task_id] = remind_at
+        if due:
+            self._deliver(due, now)
+        with self._lock:
+            # Drop superseded entries on top, so they don't wake us
+            while self._heap and self._pending.get(self._heap[0][1]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            self._next_wake = min(self._heap[0][0], self._loaded_until) if self._heap else self._loaded_until
+            return self._next_wake
+
+    def _deliver(self, due, now: datetime):
+        db = SessionLocal()
+        try:
+            claimed = crud.claim_due_reminders(db, list(due), now)
+        except Exception:
+            # Still pending in the database; try them again shortly
+            with self._lock:
+                self._push([(task_id, now + self.retry) for task_id in due])
+            raise
+        finally:
+            db.close()
+        if not claimed:
+            return
+        reminders = [{**reminder, "remind_at": due[reminder["id"]]} for reminder in claimed]
+        try:
+            self.sink.deliver(reminders)
+        except Exception:
+            logger.exception("Delivering %d reminders failed; retrying them", len(reminders))
+            retry_at = now + self.retry
+            db = SessionLocal()
+            try:
+                retried = crud.retry_reminders(db, [reminder["id"] for reminder in reminders], retry_at)
+            finally:
+                db.close()
+            with self._lock:
+                self._failed += len(reminders)
+                self._push([(task_id, retry_at) for task_id in retried])
+            return
+        with self._lock:
+            self._delivered += len(reminders)
+
+    def _run(self):
+        while not self._stop.is_set():
+            # Cleared before polling, so a reminder scheduled meanwhile still wakes us
+            self._wake.clear()
+            try:
+                wake = self.poll(datetime.utcnow())
+            except Exception:
+                logger.exception("Sending reminders failed")
+                wake = datetime.utcnow() + self.retry
+            self._wake.wait(max((wake - datetime.utcnow()).total_seconds(), 0))
+
+    def shutdown(self):
+        self._stop.set()
+        self._wake.set()
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout=5)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "scheduled": len(self._pending),
+                "loaded": self._loaded,
+                "delivered": self._delivered,
+                "failed": self._failed,
+                "next": self._heap[0][0].isoformat() if self._heap else None,
+                "window_end": self._loaded_until.isoformat() if self._loaded_until else None,
+            }
+
+def _make_sink():
+    if settings.reminder_sink == "webhook":
+        return WebhookSink(settings.reminder_webhook_url, settings.reminder_webhook_timeout_seconds)
+    return ChangeFeedSink()
+
+reminder_scheduler = ReminderScheduler(_make_sink(), window_minutes=settings.reminder_window_minutes)
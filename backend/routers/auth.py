@@ -5,11 +5,19 @@ from datetime import timedelta
 from database import get_db
 from config import settings
 import crud
+from hashing import PasswordHashingBusy
 from schemas import User, UserCreate, Token
 from auth import create_access_token, get_current_active_user
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
+def _hashing_busy():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many sign-ins in progress, try again shortly",
+        headers={"Retry-After": "1"},
+    )
+
 @router.post("/register", response_model=User)
 def register(user: UserCreate, db: Session = Depends(get_db)):
     db_user = crud.get_user_by_email(db, email=user.email)
@@ -26,11 +34,17 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
             detail="Username already registered"
         )
     
-    return crud.create_user(db=db, user=user)
+    try:
+        return crud.create_user(db=db, user=user)
+    except PasswordHashingBusy:
+        raise _hashing_busy()
 
 @router.post("/token", response_model=Token)
 def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = crud.authenticate_user(db, form_data.username, form_data.password)
+    try:
+        user = crud.authenticate_user(db, form_data.username, form_data.password)
+    except PasswordHashingBusy:
+        raise _hashing_busy()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -44,5 +58,6 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=User)
-def read_users_me(current_user: User = Depends(get_current_active_user)):
-    return current_user
+def read_users_me(current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
+    # The auth dependency only carries a cached principal; load the full profile
+    return crud.get_user(db, user_id=current_user.id)
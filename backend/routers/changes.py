@@ -0,0 +1,51 @@
+import asyncio
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from starlette.concurrency import run_in_threadpool
+from database import SessionLocal
+from auth import get_current_user
+from events import change_feed
+
+router = APIRouter(prefix="/changes", tags=["changes"])
+
+def _authenticate(token: str):
+    db = SessionLocal()
+    try:
+        user = get_current_user(token=token, db=db)
+    except HTTPException:
+        return None
+    finally:
+        db.close()
+    return user if user.is_active else None
+
+@router.websocket("/ws")
+async def change_stream(websocket: WebSocket, token: str = Query(...)):
+    """Push the user's change events as JSON messages.
+
+    Browsers cannot set headers on a WebSocket, so the access token is
+    passed as ?token=. Events look like
+    {"type": "task.moved", "id": 3, "revision": 42, "column": "Today"};
+    {"type": "resync"} means events were dropped and the client should
+    catch up through GET /sync.
+    """
+    user = await run_in_threadpool(_authenticate, token)
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    await websocket.accept()
+    subscription = change_feed.subscribe(user.id)
+    
+    async def pump():
+        while True:
+            await websocket.send_json(await subscription.get())
+    
+    sender = asyncio.ensure_future(pump())
+    try:
+        # Clients don't send anything; receiving is how a disconnect is noticed
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        change_feed.unsubscribe(subscription)
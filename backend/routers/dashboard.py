@@ -1,15 +1,52 @@
-from fastapi import APIRouter, Depends
+from fastapi import HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
-from database import get_db
+from datetime import date, datetime, timedelta
+from typing import Literal, Optional
 import crud
-from schemas import User, DashboardStats
-from auth import get_current_active_user
+from schemas import User, DashboardStats, Trends
+from endpoints import Endpoints
+from conditional import revision_etag, not_modified
 
-router = APIRouter(prefix="/dashboard", tags=["dashboard"])
+endpoints = Endpoints(prefix="/dashboard", tags=["dashboard"])
 
-@router.get("/stats", response_model=DashboardStats)
+@endpoints.get("/stats", response_model=DashboardStats)
 def get_dashboard_stats(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session,
+    current_user: User,
+    request: Request,
+    response: Response
 ):
+    # Overdue counts change with the clock, not just with writes, so the
+    # ETag also rolls over every minute
+    minute = datetime.utcnow().strftime("%Y%m%d%H%M")
+    cached = not_modified(request, response, revision_etag(db, current_user.id, minute))
+    if cached is not None:
+        return cached
     return crud.get_dashboard_stats(db, user_id=current_user.id)
+
+@endpoints.get("/trends", response_model=Trends)
+def get_trends(
+    db: Session,
+    current_user: User,
+    request: Request,
+    response: Response,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    granularity: Literal["day", "week", "month", "year"] = "day",
+    project_id: Optional[int] = None
+):
+    # The default range ends today, so the ETag rolls over daily
+    today = datetime.utcnow().date()
+    date_to = date_to or today
+    date_from = date_from or date_to - timedelta(days=29)
+    if date_from > date_to:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="from must not be after to")
+    cached = not_modified(request, response, revision_etag(db, current_user.id, today.isoformat()))
+    if cached is not None:
+        return cached
+    try:
+        return crud.get_trends(db, current_user.id, date_from, date_to, granularity, project_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+router = endpoints.sync_router()
@@ -1,48 +1,58 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import time
+from fastapi import BackgroundTasks, HTTPException, status, Request, Response
 from sqlalchemy.orm import Session
 from typing import List
-from database import get_db
+from database import SessionLocal
 import crud
+from config import settings
+from write_queue import run_write
 from schemas import Project, ProjectCreate, ProjectUpdate, User
-from auth import get_current_active_user
+from endpoints import Endpoints
+from fastjson import json_response
+from conditional import revision_etag, not_modified
 
-router = APIRouter(prefix="/projects", tags=["projects"])
+endpoints = Endpoints(prefix="/projects", tags=["projects"])
 
-@router.get("/", response_model=List[Project])
+@endpoints.get("/", response_model=List[Project])
 def read_projects(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session,
+    current_user: User,
+    request: Request,
+    response: Response
 ):
-    return crud.get_projects(db, user_id=current_user.id)
+    cached = not_modified(request, response, revision_etag(db, current_user.id))
+    if cached is not None:
+        return cached
+    return json_response(crud.get_project_rows(db, user_id=current_user.id), headers=dict(response.headers))
 
-@router.post("/", response_model=Project)
+@endpoints.post("/", response_model=Project)
 def create_project(
-    project: ProjectCreate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session,
+    current_user: User,
+    project: ProjectCreate
 ):
-    return crud.create_project(db=db, project=project, user_id=current_user.id)
+    return run_write(db, crud.create_project, project=project, user_id=current_user.id)
 
-@router.get("/{project_id}", response_model=Project)
+@endpoints.get("/{project_id}", response_model=Project)
 def read_project(
-    project_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session,
+    current_user: User,
+    project_id: int
 ):
     db_project = crud.get_project(db, project_id=project_id, user_id=current_user.id)
     if db_project is None:
         raise HTTPException(status_code=404, detail="Project not found")
     return db_project
 
-@router.put("/{project_id}", response_model=Project)
+@endpoints.put("/{project_id}", response_model=Project)
 def update_project(
+    db: Session,
+    current_user: User,
     project_id: int,
-    project_update: ProjectUpdate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    project_update: ProjectUpdate
 ):
-    db_project = crud.update_project(
-        db, project_id=project_id, 
+    db_project = run_write(
+        db, crud.update_project, project_id=project_id, 
         project_update=project_update.dict(exclude_unset=True),
         user_id=current_user.id
     )
@@ -50,13 +60,42 @@ def update_project(
         raise HTTPException(status_code=404, detail="Project not found")
     return db_project
 
-@router.delete("/{project_id}")
+def purge_project(project_id: int):
+    """Delete a deleted project's rows batch by batch, each its own short write."""
+    db = SessionLocal()
+    try:
+        while run_write(db, crud.purge_deleted_project, project_id=project_id,
+                        batch_size=settings.project_purge_batch_size):
+            time.sleep(settings.project_purge_pause_ms / 1000)
+    finally:
+        db.close()
+
+def purge_deleted_projects():
+    """Finish the purges a restart interrupted."""
+    db = SessionLocal()
+    try:
+        project_ids = crud.get_deleted_project_ids(db)
+    finally:
+        db.close()
+    for project_id in project_ids:
+        purge_project(project_id)
+
+@endpoints.delete("/{project_id}")
 def delete_project(
+    db: Session,
+    current_user: User,
     project_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    background_tasks: BackgroundTasks
 ):
-    success = crud.delete_project(db, project_id=project_id, user_id=current_user.id)
+    """Delete a project with its tasks and subtasks.
+
+    A large project disappears at once and its rows are purged after the
+    response is sent.
+    """
+    success = run_write(db, crud.delete_project, project_id=project_id, user_id=current_user.id)
     if not success:
         raise HTTPException(status_code=404, detail="Project not found")
+    background_tasks.add_task(purge_project, project_id)
     return {"message": "Project deleted successfully"}
+
+router = endpoints.sync_router()
@@ -1,41 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import HTTPException
 from sqlalchemy.orm import Session
 from typing import List
-from database import get_db
 import crud
+from write_queue import run_write
 from schemas import SubTask, SubTaskCreate, SubTaskUpdate, User
-from auth import get_current_active_user
+from endpoints import Endpoints
 
-router = APIRouter(prefix="/subtasks", tags=["subtasks"])
+endpoints = Endpoints(prefix="/subtasks", tags=["subtasks"])
 
-@router.get("/task/{task_id}", response_model=List[SubTask])
+@endpoints.get("/task/{task_id}", response_model=List[SubTask])
 def read_subtasks(
-    task_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session,
+    current_user: User,
+    task_id: int
 ):
     return crud.get_subtasks(db, task_id=task_id, user_id=current_user.id)
 
-@router.post("/", response_model=SubTask)
+@endpoints.post("/", response_model=SubTask)
 def create_subtask(
-    subtask: SubTaskCreate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session,
+    current_user: User,
+    subtask: SubTaskCreate
 ):
-    db_subtask = crud.create_subtask(db=db, subtask=subtask, user_id=current_user.id)
+    db_subtask = run_write(db, crud.create_subtask, subtask=subtask, user_id=current_user.id)
     if db_subtask is None:
         raise HTTPException(status_code=404, detail="Parent task not found")
     return db_subtask
 
-@router.put("/{subtask_id}", response_model=SubTask)
+@endpoints.put("/{subtask_id}", response_model=SubTask)
 def update_subtask(
+    db: Session,
+    current_user: User,
     subtask_id: int,
-    subtask_update: SubTaskUpdate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    subtask_update: SubTaskUpdate
 ):
-    db_subtask = crud.update_subtask(
-        db, subtask_id=subtask_id, 
+    db_subtask = run_write(
+        db, crud.update_subtask, subtask_id=subtask_id, 
         subtask_update=subtask_update.dict(exclude_unset=True),
         user_id=current_user.id
     )
@@ -43,13 +43,15 @@ def update_subtask(
         raise HTTPException(status_code=404, detail="Subtask not found")
     return db_subtask
 
-@router.delete("/{subtask_id}")
+@endpoints.delete("/{subtask_id}")
 def delete_subtask(
-    subtask_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session,
+    current_user: User,
+    subtask_id: int
 ):
-    success = crud.delete_subtask(db, subtask_id=subtask_id, user_id=current_user.id)
+    success = run_write(db, crud.delete_subtask, subtask_id=subtask_id, user_id=current_user.id)
     if not success:
         raise HTTPException(status_code=404, detail="Subtask not found")
     return {"message": "Subtask deleted successfully"}
+
+router = endpoints.sync_router()
@@ -0,0 +1,21 @@
+from fastapi import Query
+from sqlalchemy.orm import Session
+import crud
+from schemas import User, SyncResponse
+from endpoints import Endpoints
+
+endpoints = Endpoints(prefix="/sync", tags=["sync"])
+
+@endpoints.get("/", response_model=SyncResponse)
+def sync(
+    db: Session,
+    current_user: User,
+    since: int = Query(0, ge=0, description="Revision returned by the previous sync; 0 for everything")
+):
+    """Projects, tasks and subtasks changed or deleted after `since`.
+
+    Store the returned revision and send it as `since` next time.
+    """
+    return crud.get_changes(db, user_id=current_user.id, since=since)
+
+router = endpoints.sync_router()
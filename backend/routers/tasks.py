@@ -1,62 +1,198 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import BackgroundTasks, HTTPException, status, Query, Request, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from database import get_db
+from datetime import datetime
+from database import SessionLocal
+from config import settings
 import crud
-from schemas import Task, TaskCreate, TaskUpdate, User, TaskWithSubtasks
-from auth import get_current_active_user
+from write_queue import run_write
+from schemas import Task, ArchivedTask, TaskCreate, TaskUpdate, User, TaskWithSubtasks, TaskListItem, TaskSearchResult, TaskPosition, BulkTaskRequest, BulkTaskResponse
+from endpoints import Endpoints
+from fastjson import json_response
+from conditional import revision_etag, not_modified
 
-router = APIRouter(prefix="/tasks", tags=["tasks"])
+endpoints = Endpoints(prefix="/tasks", tags=["tasks"])
 
-@router.get("/", response_model=List[Task])
+INCLUDE_OPTIONS = ["subtasks", "subtask_counts"]
+
+@endpoints.get("/", response_model=List[TaskListItem])
 def read_tasks(
+    db: Session,
+    current_user: User,
+    request: Request,
+    response: Response,
     project_id: Optional[int] = Query(None),
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    column: Optional[str] = Query(None),
+    due_before: Optional[datetime] = Query(None),
+    due_after: Optional[datetime] = Query(None),
+    task_priority: Optional[str] = Query(None),
+    is_urgent: Optional[bool] = Query(None),
+    is_important: Optional[bool] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[int] = Query(None, description="Id of the last task from the previous page"),
+    include: Optional[str] = Query(None, description="Comma-separated: subtasks, subtask_counts")
 ):
-    return crud.get_tasks(db, user_id=current_user.id, project_id=project_id)
+    """List tasks, optionally filtered and paginated by keyset cursor.
+
+    When a full page is returned, the cursor for the next page is sent in
+    the X-Next-Cursor header. include=subtasks embeds each task's subtasks
+    (and their counts); include=subtask_counts adds only the counts.
+    Answers If-None-Match with 304 while the user's revision is unchanged.
+    """
+    includes = {item.strip() for item in include.split(",") if item.strip()} if include else set()
+    if not includes <= set(INCLUDE_OPTIONS):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid include. Must be any of: {INCLUDE_OPTIONS}"
+        )
+    
+    cached = not_modified(request, response, revision_etag(db, current_user.id))
+    if cached is not None:
+        return cached
+    
+    tasks = crud.get_task_rows(
+        db, user_id=current_user.id, project_id=project_id,
+        column=column, due_before=due_before, due_after=due_after,
+        task_priority=task_priority, is_urgent=is_urgent, is_important=is_important,
+        limit=limit, cursor=cursor,
+        include_subtasks="subtasks" in includes,
+        include_subtask_counts="subtask_counts" in includes
+    )
+    if limit is not None and len(tasks) == limit:
+        response.headers["X-Next-Cursor"] = str(tasks[-1]["id"])
+    return json_response(tasks, headers=dict(response.headers))
 
-@router.post("/", response_model=Task)
+@endpoints.get("/search", response_model=List[TaskSearchResult])
+def search_tasks(
+    db: Session,
+    current_user: User,
+    request: Request,
+    response: Response,
+    q: str = Query(..., min_length=1, description="Words to match in titles and notes; end a word with * to match it as a prefix"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page")
+):
+    """Full-text search over the user's task titles and notes, best match first.
+
+    When a full page is returned, the cursor for the next page is sent in
+    the X-Next-Cursor header.
+    """
+    cached = not_modified(request, response, revision_etag(db, current_user.id))
+    if cached is not None:
+        return cached
+    
+    try:
+        tasks, next_cursor = crud.search_tasks(db, user_id=current_user.id, query=q, limit=limit, cursor=cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return tasks
+
+@endpoints.get("/archive", response_model=List[ArchivedTask])
+def read_archived_tasks(
+    db: Session,
+    current_user: User,
+    request: Request,
+    response: Response,
+    project_id: Optional[int] = Query(None),
+    limit: int = Query(50, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page")
+):
+    """Archived tasks, most recently completed first.
+
+    Done tasks are archived once they are archive_after_days old. When a
+    full page is returned, the cursor for the next page is sent in the
+    X-Next-Cursor header.
+    """
+    cached = not_modified(request, response, revision_etag(db, current_user.id))
+    if cached is not None:
+        return cached
+    
+    try:
+        tasks, next_cursor = crud.get_archived_tasks(
+            db, user_id=current_user.id, limit=limit, cursor=cursor, project_id=project_id
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return tasks
+
+@endpoints.post("/archive/{task_id}/restore", response_model=Task)
+def restore_task(
+    db: Session,
+    current_user: User,
+    task_id: int,
+    column: Optional[str] = Query(None, description="Reopen the task into this column; it stays Done without one")
+):
+    """Bring an archived task and its subtasks back to the board.
+
+    Moving an archived task out of Done with PUT /tasks/{id} or
+    /tasks/{id}/move restores it too.
+    """
+    if column is not None and column not in crud.VALID_COLUMNS:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Invalid column. Must be one of: {crud.VALID_COLUMNS}"
+        )
+    db_task = run_write(db, crud.restore_task, task_id=task_id, user_id=current_user.id, column=column)
+    if db_task is None:
+        raise HTTPException(status_code=404, detail="Archived task not found")
+    return db_task
+
+@endpoints.post("/", response_model=Task)
 def create_task(
-    task: TaskCreate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session,
+    current_user: User,
+    task: TaskCreate
 ):
     # Verify the project belongs to the user
     db_project = crud.get_project(db, project_id=task.project_id, user_id=current_user.id)
     if db_project is None:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    return crud.create_task(db=db, task=task, user_id=current_user.id)
+    return run_write(db, crud.create_task, task=task, user_id=current_user.id)
+
+@endpoints.post("/bulk", response_model=BulkTaskResponse)
+def bulk_tasks(
+    db: Session,
+    current_user: User,
+    request: BulkTaskRequest,
+    response: Response
+):
+    """Create, update, move and delete many tasks in one transaction.
 
-@router.get("/{task_id}", response_model=TaskWithSubtasks)
+    Returns one result per operation, in request order. When an atomic
+    batch has a failed operation nothing is applied and the response is 409.
+    """
+    result = run_write(
+        db, crud.bulk_task_operations, operations=request.operations, user_id=current_user.id, atomic=request.atomic
+    )
+    if not result["committed"]:
+        response.status_code = status.HTTP_409_CONFLICT
+    return result
+
+@endpoints.get("/{task_id}", response_model=TaskWithSubtasks)
 def read_task(
-    task_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session,
+    current_user: User,
+    task_id: int
 ):
-    db_task = crud.get_task(db, task_id=task_id, user_id=current_user.id)
+    db_task = crud.get_task_with_subtasks(db, task_id=task_id, user_id=current_user.id)
     if db_task is None:
         raise HTTPException(status_code=404, detail="Task not found")
-    
-    # Get subtasks
-    subtasks = crud.get_subtasks(db, task_id=task_id, user_id=current_user.id)
-    
-    # Convert to TaskWithSubtasks
-    task_dict = db_task.__dict__.copy()
-    task_dict['subtasks'] = subtasks
-    
-    return task_dict
+    return db_task
 
-@router.put("/{task_id}", response_model=Task)
+@endpoints.put("/{task_id}", response_model=Task)
 def update_task(
+    db: Session,
+    current_user: User,
     task_id: int,
-    task_update: TaskUpdate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    task_update: TaskUpdate
 ):
-    db_task = crud.update_task(
-        db, task_id=task_id, 
+    db_task = run_write(
+        db, crud.update_task, task_id=task_id, 
         task_update=task_update.dict(exclude_unset=True),
         user_id=current_user.id
     )
@@ -64,34 +200,33 @@ def update_task(
         raise HTTPException(status_code=404, detail="Task not found")
     return db_task
 
-@router.delete("/{task_id}")
+@endpoints.delete("/{task_id}")
 def delete_task(
-    task_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session,
+    current_user: User,
+    task_id: int
 ):
-    success = crud.delete_task(db, task_id=task_id, user_id=current_user.id)
+    success = run_write(db, crud.delete_task, task_id=task_id, user_id=current_user.id)
     if not success:
         raise HTTPException(status_code=404, detail="Task not found")
     return {"message": "Task deleted successfully"}
 
-@router.put("/{task_id}/move")
+@endpoints.put("/{task_id}/move")
 def move_task(
+    db: Session,
+    current_user: User,
     task_id: int,
-    column: str,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    column: str
 ):
     """Move a task to a different column (Backlog, This Week, Today, Done)"""
-    valid_columns = ["Backlog", "This Week", "Today", "Done"]
-    if column not in valid_columns:
+    if column not in crud.VALID_COLUMNS:
         raise HTTPException(
             status_code=400, 
-            detail=f"Invalid column. Must be one of: {valid_columns}"
+            detail=f"Invalid column. Must be one of: {crud.VALID_COLUMNS}"
         )
     
-    db_task = crud.update_task(
-        db, task_id=task_id, 
+    db_task = run_write(
+        db, crud.update_task, task_id=task_id, 
         task_update={"column": column},
         user_id=current_user.id
     )
@@ -99,13 +234,51 @@ def move_task(
         raise HTTPException(status_code=404, detail="Task not found")
     return db_task
 
-@router.put("/{task_id}/matrix")
+def _rebalance_column(user_id: int, column: str):
+    db = SessionLocal()
+    try:
+        run_write(db, crud.rebalance_ranks, user_id=user_id, column=column)
+    finally:
+        db.close()
+
+@endpoints.put("/{task_id}/position", response_model=Task)
+def position_task(
+    db: Session,
+    current_user: User,
+    task_id: int,
+    position: TaskPosition,
+    background_tasks: BackgroundTasks
+):
+    """Place a task between two neighbours, optionally in another column.
+
+    Only the moved task is written. When its new rank grows past
+    rank_max_length the column is rebalanced after the response is sent.
+    """
+    if position.column is not None and position.column not in crud.VALID_COLUMNS:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Invalid column. Must be one of: {crud.VALID_COLUMNS}"
+        )
+    try:
+        db_task = run_write(
+            db, crud.position_task, task_id=task_id, user_id=current_user.id,
+            after_id=position.after_id, before_id=position.before_id, column=position.column
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    if db_task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if len(db_task.rank) > settings.rank_max_length:
+        background_tasks.add_task(_rebalance_column, current_user.id, db_task.column)
+    return db_task
+
+@endpoints.put("/{task_id}/matrix")
 def update_task_matrix(
+    db: Session,
+    current_user: User,
     task_id: int,
     is_urgent: bool,
-    is_important: bool,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    is_important: bool
 ):
     """Update task's position in Eisenhower Matrix"""
     # Determine column based on urgency
@@ -114,8 +287,8 @@ def update_task_matrix(
     # Determine priority based on importance
     priority = "High" if is_important else "Medium"
     
-    db_task = crud.update_task(
-        db, task_id=task_id, 
+    db_task = run_write(
+        db, crud.update_task, task_id=task_id, 
         task_update={
             "is_urgent": is_urgent,
             "is_important": is_important,
@@ -127,3 +300,5 @@ def update_task_matrix(
     if db_task is None:
         raise HTTPException(status_code=404, detail="Task not found")
     return db_task
+
+router = endpoints.sync_router()
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr
-from datetime import datetime
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field
+from datetime import date, datetime
+from typing import Optional, List, Literal
 
 # User schemas
 class UserBase(BaseModel):
@@ -83,6 +83,7 @@ class Task(TaskBase):
     id: int
     project_id: int
     owner_id: int
+    rank: Optional[str] = None  # sort key within the column
     created_at: datetime
     updated_at: datetime
     completed_at: Optional[datetime] = None
@@ -90,6 +91,38 @@ class Task(TaskBase):
     class Config:
         from_attributes = True
 
+class ArchivedTask(Task):
+    archived_at: datetime
+
+class TaskPosition(BaseModel):
+    after_id: Optional[int] = None  # the task this one now follows, if any
+    before_id: Optional[int] = None  # the task this one now precedes, if any
+    column: Optional[str] = None  # defaults to the task's current column
+
+# Bulk task schemas
+class BulkTaskOperation(BaseModel):
+    op: Literal["create", "update", "move", "delete"]
+    id: Optional[int] = None  # the task to update, move or delete
+    task: Optional[TaskCreate] = None  # create
+    changes: Optional[TaskUpdate] = None  # update
+    column: Optional[str] = None  # move
+
+class BulkTaskRequest(BaseModel):
+    operations: List[BulkTaskOperation] = Field(..., max_length=1000)
+    atomic: bool = True  # apply nothing if any operation fails
+
+class BulkTaskResult(BaseModel):
+    index: int
+    op: str
+    status: str  # ok, error, or skipped when an atomic batch was rolled back
+    id: Optional[int] = None
+    task: Optional[Task] = None
+    detail: Optional[str] = None
+
+class BulkTaskResponse(BaseModel):
+    committed: bool
+    results: List[BulkTaskResult]
+
 # SubTask schemas
 class SubTaskBase(BaseModel):
     title: str
@@ -105,6 +138,7 @@ class SubTaskUpdate(BaseModel):
 class SubTask(SubTaskBase):
     id: int
     parent_task_id: int
+    rank: Optional[str] = None  # sort key within the parent task
     created_at: datetime
 
     class Config:
@@ -122,9 +156,35 @@ class TokenData(BaseModel):
 class TaskWithSubtasks(Task):
     subtasks: List[SubTask] = []
 
+class TaskListItem(Task):
+    # Only filled in when requested with ?include=...; read from attributes
+    # crud.get_tasks sets, so listing never lazy-loads Task.subtasks
+    subtasks: Optional[List[SubTask]] = Field(None, validation_alias="included_subtasks")
+    subtask_count: Optional[int] = None
+    completed_subtask_count: Optional[int] = None
+
+class TaskSearchResult(Task):
+    # Set by crud.search_tasks; highlights are HTML-escaped task text with
+    # matches wrapped in <mark>...</mark>
+    search_score: float  # lower is a better match
+    title_highlight: str
+    notes_snippet: Optional[str] = None
+
 class ProjectWithTasks(Project):
     tasks: List[Task] = []
 
+class SyncDeletions(BaseModel):
+    projects: List[int] = []
+    tasks: List[int] = []  # a deleted task's subtasks are gone too
+    subtasks: List[int] = []
+
+class SyncResponse(BaseModel):
+    revision: int  # pass as `since` on the next sync
+    projects: List[Project]
+    tasks: List[Task]
+    subtasks: List[SubTask]
+    deleted: SyncDeletions
+
 class DashboardStats(BaseModel):
     total_tasks: int
     completed_tasks: int
@@ -133,3 +193,16 @@ class DashboardStats(BaseModel):
     today_tasks: int
     this_week_tasks: int
     completion_rate: float
+
+class TrendPoint(BaseModel):
+    period_start: date
+    tasks_created: int
+    tasks_completed: int
+    estimated_minutes: int
+    actual_minutes: int
+
+class Trends(BaseModel):
+    date_from: date = Field(alias="from")
+    date_to: date = Field(alias="to")
+    granularity: str
+    points: List[TrendPoint]
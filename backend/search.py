@@ -0,0 +1,137 @@
+"""Full-text search over task titles and notes.
+
+SQLite: an FTS5 external-content index (tasks_fts) over tasks.owner_id,
+title and notes, kept in step with the tasks table by triggers. Indexing
+owner_id as a column lets a search intersect the user's postings with the
+terms' postings inside the index, instead of matching every user's tasks
+and filtering afterwards. Results are ordered by bm25 with titles weighted
+above notes.
+
+Postgres: a generated tsvector column (title weighted A, notes B) with a
+GIN index, ordered by ts_rank.
+
+Both use plain word tokens without stemming, so the two backends match the
+same tasks. Queries are parsed here rather than passed through: every word
+must match, and a word ending in * matches as a prefix.
+
+Highlights are HTML: the task text is escaped and matches are wrapped in
+<mark>...</mark>. The database marks matches with private-use characters,
+which become the tags only after the text around them is escaped.
+"""
+import html
+import re
+from typing import List, Optional, Tuple
+from sqlalchemy import inspect, text
+
+MARK_START = "<mark>"
+MARK_END = "</mark>"
+SNIPPET_WORDS = 12
+_MATCH_START = "\ue000"
+_MATCH_END = "\ue001"
+
+_TERM = re.compile(r"(\w+)(\*?)")
+
+_SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+        owner_id, title, notes,
+        content='tasks', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+        INSERT INTO tasks_fts(rowid, owner_id, title, notes) VALUES (new.id, new.owner_id, new.title, new.notes);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, owner_id, title, notes) VALUES ('delete', old.id, old.owner_id, old.title, old.notes);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF owner_id, title, notes ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, owner_id, title, notes) VALUES ('delete', old.id, old.owner_id, old.title, old.notes);
+        INSERT INTO tasks_fts(rowid, owner_id, title, notes) VALUES (new.id, new.owner_id, new.title, new.notes);
+    END""",
+]
+
+_POSTGRES_DDL = [
+    """ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce(notes, '')), 'B')
+    ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_tasks_search_vector ON tasks USING GIN (search_vector)",
+]
+
+def install_search_index(engine):
+    """Create the search index and its triggers; a no-op once they exist."""
+    if engine.dialect.name == "sqlite":
+        new_index = not inspect(engine).has_table("tasks_fts")
+        with engine.begin() as conn:
+            for statement in _SQLITE_DDL:
+                conn.exec_driver_sql(statement)
+            if new_index:
+                # Index the tasks that predate the triggers
+                conn.exec_driver_sql("INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')")
+    elif engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            for statement in _POSTGRES_DDL:
+                conn.exec_driver_sql(statement)
+
+def parse_terms(query: str) -> List[Tuple[str, bool]]:
+    """The query's words as (word, is_prefix) pairs, lowercased."""
+    return [(word.lower(), bool(star)) for word, star in _TERM.findall(query)]
+
+def _fts5_match(user_id: int, terms) -> str:
+    phrases = " ".join(f'"{word}"' + ("*" if prefix else "") for word, prefix in terms)
+    return f'owner_id : "{user_id}" AND {{title notes}} : ({phrases})'
+
+def _tsquery(terms) -> str:
+    return " & ".join(word + (":*" if prefix else "") for word, prefix in terms)
+
+def _markup(fragment: Optional[str]) -> Optional[str]:
+    if fragment is None:
+        return None
+    return html.escape(fragment).replace(_MATCH_START, MARK_START).replace(_MATCH_END, MARK_END)
+
+def search_task_ids(db, user_id: int, terms, limit: int, after: Optional[Tuple[float, int]] = None):
+    """One page of matches as (task id, score, title highlight, notes snippet) rows.
+
+    Rows are ordered by ascending score (best first), then id; `after` is
+    the (score, id) of the last row of the previous page.
+    """
+    dialect = db.get_bind().dialect.name
+    params = {"limit": limit}
+    if dialect == "sqlite":
+        score = "bm25(tasks_fts, 0.0, 10.0, 1.0)"
+        sql = f"""
+            SELECT rowid, {score} AS score,
+                   highlight(tasks_fts, 1, :mark_start, :mark_end),
+                   snippet(tasks_fts, 2, :mark_start, :mark_end, '…', :words)
+            FROM tasks_fts
+            WHERE tasks_fts MATCH :match {{after}}
+            ORDER BY score, rowid
+            LIMIT :limit
+        """
+        id_column = "rowid"
+        params["match"] = _fts5_match(user_id, terms)
+    elif dialect == "postgresql":
+        score = "-ts_rank(search_vector, to_tsquery('simple', :match))"
+        sql = f"""
+            SELECT id, {score} AS score,
+                   ts_headline('simple', coalesce(title, ''), to_tsquery('simple', :match),
+                               'HighlightAll=true, StartSel=' || :mark_start || ', StopSel=' || :mark_end),
+                   ts_headline('simple', coalesce(notes, ''), to_tsquery('simple', :match),
+                               'MaxWords=' || :words || ', MinWords=' || (:words / 2) || ', StartSel=' || :mark_start || ', StopSel=' || :mark_end)
+            FROM tasks
+            WHERE owner_id = :user_id AND search_vector @@ to_tsquery('simple', :match) {{after}}
+            ORDER BY score, id
+            LIMIT :limit
+        """
+        id_column = "id"
+        params.update(match=_tsquery(terms), user_id=user_id)
+    else:
+        raise NotImplementedError(f"Task search is not available on {dialect}")
+
+    condition = ""
+    if after is not None:
+        condition = f"AND ({score} > :after_score OR ({score} = :after_score AND {id_column} > :after_id))"
+        params.update(after_score=after[0], after_id=after[1])
+    params.update(mark_start=_MATCH_START, mark_end=_MATCH_END, words=SNIPPET_WORDS)
+    return [
+        (task_id, score, _markup(title), _markup(notes))
+        for task_id, score, title, notes in db.execute(text(sql.format(after=condition)), params)
+    ]
@@ -0,0 +1,145 @@
+"""Slow-query log with the query plan of each slow statement.
+
+With settings.slow_query_log, every statement slower than
+slow_query_threshold_ms is written as one JSON line to a rotating log
+file. Each line records:
+- the statement text
+- the shape of its parameters (types, never values)
+- its duration
+- the route that ran it
+- its plan, from EXPLAIN QUERY PLAN on SQLite or EXPLAIN on Postgres
+
+The plan is read with a fresh cursor on the same connection, right after
+the statement ran. `full_scan` marks a plan that reads a whole table
+instead of searching an index.
+
+capture_plans() records the plan of every statement run inside it. Tests
+use it to fail when a hot query stops using its index.
+"""
+import json
+import logging
+import re
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from sqlalchemy import event
+from metrics import current_request, route_label
+
+EXPLAINABLE = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b", re.IGNORECASE)
+# SQLite: "SCAN tasks", "SCAN TABLE tasks", "SCAN tasks USING COVERING INDEX ..."
+# (virtual tables such as the FTS index search themselves); Postgres: "Seq Scan on tasks"
+_SQLITE_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)\b(?! VIRTUAL TABLE)")
+_SQLITE_DERIVED = re.compile(r"^(?:CO-ROUTINE|MATERIALIZE) (\w+)")
+_POSTGRES_SCAN = re.compile(r"Seq Scan on (\w+)")
+
+logger = logging.getLogger("blitzit.slow_queries")
+recent = deque(maxlen=100)  # the latest slow-query records, newest last
+
+def parameter_shape(parameters):
+    """Parameter types without their values; executemany shows its first row and count."""
+    if isinstance(parameters, list):
+        return {"rows": len(parameters), "first": parameter_shape(parameters[0]) if parameters else None}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, tuple):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+def explain(cursor, dialect: str, statement: str, parameters):
+    """The plan of `statement` as text lines, run on `cursor`'s connection."""
+    if isinstance(parameters, list):
+        parameters = parameters[0] if parameters else ()
+    prefix = "EXPLAIN QUERY PLAN " if dialect == "sqlite" else "EXPLAIN "
+    explain_cursor = cursor.connection.cursor()
+    try:
+        explain_cursor.execute(prefix + statement, parameters)
+        rows = explain_cursor.fetchall()
+    finally:
+        explain_cursor.close()
+    # SQLite rows are (id, parent, notused, detail); Postgres rows are one text column
+    return [row[-1] for row in rows]
+
+def full_scans(plan, dialect: str):
+    """Tables the plan reads in full."""
+    pattern = _SQLITE_SCAN if dialect == "sqlite" else _POSTGRES_SCAN
+    # Scanning a subquery's or CTE's own result is not a table scan
+    derived = {"CONSTANT"} | {match.group(1) for match in map(_SQLITE_DERIVED.match, plan) if match}
+    tables = []
+    for line in plan:
+        match = pattern.search(line.strip())
+        if match and match.group(1) not in derived:
+            tables.append(match.group(1))
+    return tables
+
+def _on_statements(engine, callback):
+    """Call callback(cursor, statement, parameters, seconds) after each explainable statement."""
+    def start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("slow_query_start", []).append(time.perf_counter())
+
+    def end(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["slow_query_start"].pop()
+        if EXPLAINABLE.match(statement):
+            callback(cursor, statement, parameters, elapsed)
+
+    def failed(context):
+        starts = context.connection.info.get("slow_query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+    listeners = [("before_cursor_execute", start), ("after_cursor_execute", end), ("handle_error", failed)]
+    for name, fn in listeners:
+        event.listen(engine, name, fn)
+    return listeners
+
+def install_slow_query_log(engine, threshold_ms: float, path: str, max_bytes: int, backups: int):
+    """Log statements on `engine` slower than `threshold_ms` to a rotating file at `path`."""
+    if path and not logger.handlers:
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    dialect = engine.dialect.name
+    threshold = threshold_ms / 1000
+
+    def record(cursor, statement, parameters, seconds):
+        if seconds < threshold:
+            return
+        try:
+            plan = explain(cursor, dialect, statement, parameters)
+        except Exception as exc:
+            plan = [f"EXPLAIN failed: {exc}"]
+        request = current_request.get()
+        entry = {
+            "at": datetime.utcnow().isoformat(),
+            "duration_ms": round(seconds * 1000, 3),
+            "route": route_label(request.scope) if request is not None and request.scope is not None else None,
+            "statement": statement,
+            "parameters": parameter_shape(parameters),
+            "plan": plan,
+            "full_scan": full_scans(plan, dialect),
+        }
+        recent.append(entry)
+        logger.info(json.dumps(entry))
+
+    _on_statements(engine, record)
+    return engine
+
+@contextmanager
+def capture_plans(engine):
+    """Collect {"statement", "plan", "full_scan"} for every statement run on `engine` in the block."""
+    dialect = engine.dialect.name
+    plans = []
+
+    def record(cursor, statement, parameters, seconds):
+        plan = explain(cursor, dialect, statement, parameters)
+        plans.append({"statement": statement, "plan": plan, "full_scan": full_scans(plan, dialect)})
+
+    listeners = _on_statements(engine, record)
+    try:
+        yield plans
+    finally:
+        for name, fn in listeners:
+            event.remove(engine, name, fn)
@@ -0,0 +1,78 @@
+"""Shared fixtures: the app against a scratch SQLite database.
+
+Settings are read once at import, so the environment is set here, before
+any backend module is imported.
+"""
+import itertools
+import os
+import sys
+import tempfile
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..")
+
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='blitzit-tests-')}/test.db"
+sys.path.insert(0, BACKEND_DIR)
+
+_usernames = (f"user{n}" for n in itertools.count())
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from main import app
+
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture
+def db(client):
+    from database import SessionLocal
+
+    session = SessionLocal()
+    yield session
+    session.close()
+
+@pytest.fixture
+def user(client):
+    """A fresh user: (id, auth headers)."""
+    username = next(_usernames)
+    response = client.post("/auth/register", json={
+        "email": f"{username}@example.com", "username": username, "password": "pw",
+    })
+    assert response.status_code == 200
+    token = client.post("/auth/token", data={"username": username, "password": "pw"}).json()["access_token"]
+    return response.json()["id"], {"Authorization": f"Bearer {token}"}
+
+@pytest.fixture
+def project(client, user):
+    """A project of `user`: its id."""
+    _, headers = user
+    return client.post("/projects/", json={"name": "Project"}, headers=headers).json()["id"]
+
+@pytest.fixture
+def create_task(client, user, project):
+    """create_task(**fields): a task in `project` as `user`, as JSON.
+
+    Pass `headers` (and a `project_id`) to create it as another user.
+    """
+    _, user_headers = user
+
+    def create(headers=None, **fields):
+        body = {"title": "t", "project_id": project, **fields}
+        response = client.post("/tasks/", json=body, headers=headers or user_headers)
+        assert response.status_code == 200
+        return response.json()
+    return create
+
+@pytest.fixture
+def assert_indexed(db):
+    """assert_indexed(fn, *args, **kwargs): run fn and fail if a statement it runs reads a whole table."""
+    from slow_queries import capture_plans
+
+    def check(fn, *args, **kwargs):
+        with capture_plans(db.get_bind()) as plans:
+            result = fn(*args, **kwargs)
+        scans = [f"{plan['statement']}\n  -> {plan['plan']}" for plan in plans if plan["full_scan"]]
+        assert not scans, "Full table scan in:\n" + "\n".join(scans)
+        return result
+    return check
@@ -0,0 +1,119 @@
+"""Archiving old Done tasks out of the tasks table, and bringing them back."""
+from datetime import datetime, timedelta
+import crud
+from archive import ArchiveJob
+from models import Task, ArchivedTask, ArchivedSubTask
+
+def _done_tasks(client, db, headers, project, count, days_ago=100):
+    """`count` tasks, each with a subtask, completed `days_ago` days ago."""
+    task_ids = []
+    for n in range(count):
+        task_id = client.post("/tasks/", json={"title": f"old {n}", "project_id": project}, headers=headers).json()["id"]
+        client.post("/subtasks/", json={"title": "s", "parent_task_id": task_id}, headers=headers)
+        client.put(f"/tasks/{task_id}/move", params={"column": "Done"}, headers=headers)
+        task_ids.append(task_id)
+    for n, task_id in enumerate(task_ids):
+        db.query(Task).filter(Task.id == task_id).update(
+            {"completed_at": datetime.utcnow() - timedelta(days=days_ago, minutes=n)}
+        )
+    db.commit()
+    return task_ids
+
+def _archive(db, user_id):
+    return crud.archive_completed_tasks(db, datetime.utcnow() - timedelta(days=90), 1000, user_id=user_id)
+
+def test_old_done_tasks_move_to_the_archive(client, db, user, project):
+    user_id, headers = user
+    task_id, = _done_tasks(client, db, headers, project, 1)
+    recent = client.post("/tasks/", json={"title": "recent", "project_id": project}, headers=headers).json()["id"]
+    client.put(f"/tasks/{recent}/move", params={"column": "Done"}, headers=headers)
+    since = client.get("/sync/", params={"since": 0}, headers=headers).json()["revision"]
+
+    assert _archive(db, user_id) == 1
+    assert _archive(db, user_id) == 0
+
+    assert task_id not in [task["id"] for task in client.get("/tasks/", headers=headers).json()]
+    assert client.get(f"/tasks/{task_id}", headers=headers).status_code == 404
+    assert db.query(ArchivedSubTask).filter(ArchivedSubTask.parent_task_id == task_id).count() == 1
+    archived = client.get("/tasks/archive", headers=headers).json()
+    assert [task["id"] for task in archived] == [task_id]
+    assert archived[0]["archived_at"]
+    assert client.get("/dashboard/stats", headers=headers).json()["completed_tasks"] == 1
+    assert crud.rebuild_task_counters(db, user_id=user_id) == []
+    assert client.get("/sync/", params={"since": since}, headers=headers).json()["deleted"]["tasks"] == [task_id]
+
+def test_archive_pages_most_recently_completed_first(client, db, user, project):
+    user_id, headers = user
+    task_ids = _done_tasks(client, db, headers, project, 3)
+    _archive(db, user_id)
+
+    first = client.get("/tasks/archive", params={"limit": 2}, headers=headers)
+    second = client.get("/tasks/archive", params={"limit": 2, "cursor": first.headers["X-Next-Cursor"]}, headers=headers)
+    assert [task["id"] for task in first.json() + second.json()] == task_ids
+    assert "X-Next-Cursor" not in second.headers
+    assert client.get("/tasks/archive", params={"cursor": "nope"}, headers=headers).status_code == 400
+
+def test_restore_and_reopen_bring_tasks_back(client, db, user, project):
+    user_id, headers = user
+    restored, reopened = _done_tasks(client, db, headers, project, 2)
+    _archive(db, user_id)
+
+    response = client.post(f"/tasks/archive/{restored}/restore", params={"column": "Backlog"}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["column"] == "Backlog" and response.json()["completed_at"] is None
+    assert client.put(f"/tasks/{reopened}/move", params={"column": "Today"}, headers=headers).status_code == 200
+
+    board = {task["id"]: task["column"] for task in client.get("/tasks/", headers=headers).json()}
+    assert board[restored] == "Backlog" and board[reopened] == "Today"
+    assert len(client.get(f"/tasks/{restored}", headers=headers).json()["subtasks"]) == 1
+    assert client.get("/tasks/archive", headers=headers).json() == []
+    assert crud.rebuild_task_counters(db, user_id=user_id) == []
+    assert client.post(f"/tasks/archive/{restored}/restore", headers=headers).status_code == 404
+
+def test_restored_tasks_sync_with_their_subtasks(client, db, user, project):
+    user_id, headers = user
+    restored, reopened = _done_tasks(client, db, headers, project, 2)
+    before = client.get("/sync/", params={"since": 0}, headers=headers).json()["revision"]
+    _archive(db, user_id)
+    since = client.get("/sync/", params={"since": 0}, headers=headers).json()["revision"]
+
+    client.post(f"/tasks/archive/{restored}/restore", headers=headers)
+    client.put(f"/tasks/{reopened}/move", params={"column": "Today"}, headers=headers)
+    for revision in (before, since):
+        changes = client.get("/sync/", params={"since": revision}, headers=headers).json()
+        assert {task["id"] for task in changes["tasks"]} >= {restored, reopened}
+        assert {subtask["parent_task_id"] for subtask in changes["subtasks"]} >= {restored, reopened}
+        assert changes["deleted"]["tasks"] == []
+
+def test_archiving_the_newest_task_keeps_its_id(client, db, user, project):
+    user_id, headers = user
+    task_id, = _done_tasks(client, db, headers, project, 1)
+    assert _archive(db, user_id) == 1
+
+    newer = client.post("/tasks/", json={"title": "new", "project_id": project}, headers=headers).json()["id"]
+    assert newer > task_id
+    assert client.post(f"/tasks/archive/{task_id}/restore", headers=headers).status_code == 200
+    assert {newer, task_id} <= {task["id"] for task in client.get("/tasks/", headers=headers).json()}
+
+def test_archived_tasks_are_deleted_with_them_or_their_project(client, db, user, project):
+    user_id, headers = user
+    deleted, kept = _done_tasks(client, db, headers, project, 2)
+    _archive(db, user_id)
+    etag = client.get("/tasks/archive", headers=headers).headers["etag"]
+
+    assert client.delete(f"/tasks/{deleted}", headers=headers).status_code == 200
+    listed = client.get("/tasks/archive", headers={**headers, "If-None-Match": etag})
+    assert listed.status_code == 200 and [task["id"] for task in listed.json()] == [kept]
+    assert client.delete(f"/projects/{project}", headers=headers).status_code == 200
+    db.expire_all()
+    assert db.query(ArchivedTask).filter(ArchivedTask.id.in_([deleted, kept])).count() == 0
+    assert db.query(ArchivedSubTask).filter(ArchivedSubTask.parent_task_id.in_([deleted, kept])).count() == 0
+
+def test_the_job_archives_in_batches(client, db, user, project):
+    _, headers = user
+    task_ids = _done_tasks(client, db, headers, project, 3, days_ago=400)
+    job = ArchiveJob(after_days=365, batch_size=2, interval_minutes=60, pause_ms=0)
+
+    assert job.run_once() >= 3
+    assert db.query(ArchivedTask).filter(ArchivedTask.id.in_(task_ids)).count() == 3
+    assert job.stats()["runs"] == 1
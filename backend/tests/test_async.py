@@ -0,0 +1,70 @@
+"""The async routers (settings.async_database) against the same database."""
+import pytest
+
+@pytest.fixture(scope="module")
+def async_client(client):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    import database
+    from async_routers import projects, tasks, subtasks, dashboard, sync
+
+    engine = database.create_async_db_engine()
+    database.AsyncSessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    app = FastAPI()
+    for module in (projects, tasks, subtasks, dashboard, sync):
+        app.include_router(module.router)
+    try:
+        with TestClient(app) as async_client:
+            yield async_client
+    finally:
+        database.AsyncSessionLocal = None
+
+def test_async_settings_derive_the_driver():
+    from config import Settings
+
+    assert Settings(database_url="sqlite:///./a.db").get_async_database_url() == "sqlite+aiosqlite:///./a.db"
+    assert Settings(database_url="postgresql://u@h/db").get_async_database_url() == "postgresql+asyncpg://u@h/db"
+
+def test_async_routers_serve_the_same_api(async_client, client, user):
+    _, headers = user
+    project = async_client.post("/projects/", json={"name": "p"}, headers=headers).json()["id"]
+    task = async_client.post("/tasks/", json={"title": "t", "project_id": project}, headers=headers).json()["id"]
+    async_client.post("/subtasks/", json={"title": "s", "parent_task_id": task}, headers=headers)
+    async_client.put(f"/tasks/{task}/move", params={"column": "Done"}, headers=headers)
+
+    listed = async_client.get("/tasks/", params={"include": "subtasks"}, headers=headers)
+    assert [subtask["title"] for subtask in listed.json()[0]["subtasks"]] == ["s"]
+    assert async_client.get("/tasks/", params={"include": "subtasks"},
+                            headers={**headers, "If-None-Match": listed.headers["etag"]}).status_code == 304
+    assert async_client.get(f"/tasks/{task}", headers=headers).json()["completed_at"] is not None
+    assert async_client.get("/dashboard/stats", headers=headers).json()["completed_tasks"] == 1
+
+    bulk = async_client.post("/tasks/bulk", json={"operations": [{"op": "delete", "id": task}]}, headers=headers)
+    assert bulk.json()["committed"]
+    assert async_client.get("/sync/", params={"since": 1}, headers=headers).json()["deleted"]["tasks"] == [task]
+    # Both modes see the same data
+    assert client.get("/tasks/", headers=headers).json() == []
+
+def test_async_routers_share_the_errors_and_background_work(async_client, db, user, monkeypatch):
+    import write_queue
+    from models import Task
+
+    _, headers = user
+    queue = write_queue.GroupCommitQueue(max_batch=16, window_ms=50)
+    monkeypatch.setattr(write_queue, "group_commit", queue)
+    try:
+        project = async_client.post("/projects/", json={"name": "p"}, headers=headers).json()["id"]
+        task = async_client.post("/tasks/", json={"title": "t", "project_id": project}, headers=headers).json()["id"]
+        assert async_client.get("/tasks/0", headers=headers).status_code == 404
+        assert async_client.put(f"/tasks/{task}/move", params={"column": "Nope"}, headers=headers).status_code == 400
+        assert async_client.get("/dashboard/trends", params={"from": "1000-01-01"}, headers=headers).status_code == 400
+        # Writes on the event loop don't wait for the writer thread
+        assert queue.stats()["units"] == 0
+
+        # The purge runs after the response, in the threadpool
+        assert async_client.delete(f"/projects/{project}", headers=headers).status_code == 200
+        assert db.query(Task).filter(Task.project_id == project).count() == 0
+        assert queue.stats()["units"] > 0
+    finally:
+        queue.shutdown()
@@ -0,0 +1,66 @@
+"""Authentication and the authenticated-user cache."""
+from cache import user_cache
+import crud
+
+def test_repeat_requests_hit_the_user_cache(client, user):
+    _, headers = user
+    client.get("/projects/", headers=headers)
+    hits = user_cache.stats()["hits"]
+    client.get("/projects/", headers=headers)
+    assert user_cache.stats()["hits"] == hits + 1
+
+def test_me_returns_the_full_profile(client, user):
+    user_id, headers = user
+    me = client.get("/auth/me", headers=headers).json()
+    assert me["id"] == user_id
+    assert me["email"].endswith("@example.com")
+
+def test_deactivation_takes_effect_immediately(client, db, user):
+    user_id, headers = user
+    assert client.get("/projects/", headers=headers).status_code == 200
+
+    crud.set_user_active(db, user_id, False)
+    assert client.get("/projects/", headers=headers).status_code == 400
+
+    crud.set_user_active(db, user_id, True)
+    assert client.get("/projects/", headers=headers).status_code == 200
+
+def test_renamed_user_loses_the_old_token(client, db, user):
+    user_id, headers = user
+    assert client.get("/projects/", headers=headers).status_code == 200
+
+    renamed = crud.update_user(db, user_id, {"username": f"renamed{user_id}"})
+    assert renamed.username == f"renamed{user_id}"
+    assert client.get("/projects/", headers=headers).status_code == 401
+
+def test_entries_expire_and_evict():
+    from cache import TTLCache
+
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None  # least recently used
+    assert cache.get("a") == 1
+
+    expired = TTLCache(maxsize=2, ttl=0)
+    expired.set("a", 1)
+    assert expired.get("a") is None
+
+def test_password_hashing_sheds_load_when_the_queue_is_full(client, monkeypatch):
+    from hashing import password_pool
+
+    monkeypatch.setattr(password_pool, "queue_limit", 0)
+    response = client.post("/auth/token", data={"username": "anyone", "password": "pw"})
+    # Unknown users never reach the pool
+    assert response.status_code == 401
+    response = client.post("/auth/register", json={"email": "busy@example.com", "username": "busy", "password": "pw"})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert password_pool.stats()["rejected"] >= 1
+
+def test_health_reports_password_pool(client, user):
+    stats = client.get("/health").json()["password_hashing"]
+    assert stats["completed"] >= 1
+    assert stats["in_flight"] == 0
@@ -0,0 +1,69 @@
+"""Batches of task operations through POST /tasks/bulk."""
+
+def test_mixed_batch_applies_in_one_request(client, user, project, create_task):
+    _, headers = user
+    moved, updated, deleted = (create_task()["id"] for _ in range(3))
+    client.post("/subtasks/", json={"title": "s", "parent_task_id": deleted}, headers=headers)
+
+    response = client.post("/tasks/bulk", json={"operations": [
+        {"op": "create", "task": {"title": "new", "project_id": project, "column": "Today"}},
+        {"op": "move", "id": moved, "column": "Done"},
+        {"op": "update", "id": updated, "changes": {"title": "renamed", "task_priority": "High"}},
+        {"op": "delete", "id": deleted},
+    ]}, headers=headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["committed"]
+    results = body["results"]
+    assert [result["status"] for result in results] == ["ok"] * 4
+    assert results[0]["task"]["title"] == "new"
+    assert results[1]["task"]["column"] == "Done"
+    assert results[1]["task"]["completed_at"] is not None
+    assert results[2]["task"]["title"] == "renamed"
+    assert results[3]["task"] is None
+
+    assert client.get(f"/tasks/{deleted}", headers=headers).status_code == 404
+    stats = client.get("/dashboard/stats", headers=headers).json()
+    assert stats["total_tasks"] == 3
+    assert stats["completed_tasks"] == 1
+    assert stats["today_tasks"] == 1
+
+def test_atomic_batch_rolls_back_on_any_failure(client, user, create_task):
+    _, headers = user
+    task = create_task()["id"]
+
+    response = client.post("/tasks/bulk", json={"operations": [
+        {"op": "move", "id": task, "column": "Today"},
+        {"op": "delete", "id": 10 ** 9},
+    ]}, headers=headers)
+    assert response.status_code == 409
+    assert [result["status"] for result in response.json()["results"]] == ["skipped", "error"]
+    assert client.get(f"/tasks/{task}", headers=headers).json()["column"] == "Backlog"
+
+def test_non_atomic_batch_applies_what_it_can(client, user, create_task):
+    _, headers = user
+    task = create_task()["id"]
+
+    response = client.post("/tasks/bulk", json={"atomic": False, "operations": [
+        {"op": "move", "id": task, "column": "Today"},
+        {"op": "move", "id": task, "column": "Done"},
+        {"op": "move", "id": task, "column": "Nowhere"},
+    ]}, headers=headers)
+    assert response.status_code == 200
+    assert [result["status"] for result in response.json()["results"]] == ["ok", "error", "error"]
+    assert client.get(f"/tasks/{task}", headers=headers).json()["column"] == "Today"
+
+def test_other_users_tasks_and_projects_are_not_found(client, user, project, create_task):
+    _, headers = user
+    task = create_task()["id"]
+    other = client.post("/auth/register", json={"email": "bulk-other@example.com", "username": "bulk-other", "password": "pw"})
+    assert other.status_code == 200
+    token = client.post("/auth/token", data={"username": "bulk-other", "password": "pw"}).json()["access_token"]
+    other_headers = {"Authorization": f"Bearer {token}"}
+
+    response = client.post("/tasks/bulk", json={"atomic": False, "operations": [
+        {"op": "delete", "id": task},
+        {"op": "create", "task": {"title": "x", "project_id": project}},
+    ]}, headers=other_headers)
+    assert [result["detail"] for result in response.json()["results"]] == ["Task not found", "Project not found"]
+    assert client.get(f"/tasks/{task}", headers=headers).status_code == 200
@@ -0,0 +1,50 @@
+"""The per-user change stream."""
+import asyncio
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+def _token(headers):
+    return headers["Authorization"].split()[1]
+
+def test_writes_are_pushed_to_the_owner(client, user, project):
+    _, headers = user
+    with client.websocket_connect(f"/changes/ws?token={_token(headers)}") as ws:
+        task = client.post("/tasks/", json={"title": "t", "project_id": project}, headers=headers).json()["id"]
+        client.put(f"/tasks/{task}/move", params={"column": "Today"}, headers=headers)
+        client.put(f"/tasks/{task}/move", params={"column": "Done"}, headers=headers)
+        client.put(f"/tasks/{task}", json={"title": "u"}, headers=headers)
+        client.delete(f"/tasks/{task}", headers=headers)
+
+        events = [ws.receive_json() for _ in range(5)]
+    assert [event["type"] for event in events] == [
+        "task.created", "task.moved", "task.completed", "task.updated", "task.deleted",
+    ]
+    assert {event["id"] for event in events} == {task}
+    revisions = [event["revision"] for event in events]
+    assert revisions == sorted(revisions)
+
+def test_invalid_token_is_refused(client):
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect("/changes/ws?token=nope") as ws:
+            ws.receive_json()
+
+def test_slow_subscribers_get_a_resync_instead_of_a_backlog():
+    from events import ChangeFeed
+
+    async def scenario():
+        feed = ChangeFeed(buffer_size=2)
+        subscription = feed.subscribe(1)
+        feed.publish(1, [{"type": "task.created", "id": n} for n in range(3)])
+        feed.publish(2, [{"type": "task.created", "id": 99}])
+        await asyncio.sleep(0)
+        received = [await subscription.get()]
+        feed.publish(1, [{"type": "task.deleted", "id": 0}])
+        await asyncio.sleep(0)
+        received.append(await subscription.get())
+        feed.unsubscribe(subscription)
+        return received, subscription.queue.empty(), feed.stats()
+
+    received, empty, stats = asyncio.run(scenario())
+    assert received == [{"type": "resync"}, {"type": "task.deleted", "id": 0}]
+    assert empty
+    assert stats == {"users": 0, "connections": 0}
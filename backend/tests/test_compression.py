@@ -0,0 +1,86 @@
+"""Response compression."""
+import asyncio
+import gzip
+import compression
+from compression import CompressionMiddleware, CompressionStats, negotiate
+
+def test_negotiate_picks_the_best_accepted_encoding():
+    encodings = ["zstd", "br", "gzip"]
+    assert negotiate("gzip, deflate, br", encodings) == "br"
+    assert negotiate("gzip;q=1.0, br;q=0.5", encodings) == "gzip"
+    assert negotiate("br;q=0, *;q=0.2", encodings) == "zstd"
+    assert negotiate("identity", encodings) is None
+    assert negotiate("", encodings) is None
+    assert negotiate("gzip;q=bogus", ["gzip"]) is None
+
+def _run(app, accept_encoding="gzip"):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    stats = CompressionStats()
+    middleware = CompressionMiddleware(app, minimum_size=100, stats=stats)
+    middleware.encodings = ["gzip"]
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", accept_encoding.encode())]}
+    asyncio.run(middleware(scope, receive, send))
+    return sent, stats
+
+def _app(chunks, content_type=b"application/json", status=200):
+    async def app(scope, receive, send):
+        headers = [(b"content-type", content_type), (b"etag", b'"1.2"')]
+        if len(chunks) == 1:
+            headers.append((b"content-length", str(len(chunks[0])).encode()))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        for index, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": index < len(chunks) - 1})
+    return app
+
+def test_streamed_bodies_are_compressed_chunk_by_chunk():
+    chunks = [b'{"notes": "' + b"x" * 500 + b'"}'] * 3
+    sent, stats = _run(_app(chunks))
+    start = dict(sent[0]["headers"])
+    assert start[b"content-encoding"] == b"gzip"
+    assert b"content-length" not in start
+    assert start[b"etag"] == b'W/"1.2"'
+    assert start[b"vary"] == b"Accept-Encoding"
+    assert len(sent) == 1 + len(chunks)
+    assert gzip.decompress(b"".join(message["body"] for message in sent[1:])) == b"".join(chunks)
+    [(route, totals)] = stats.snapshot().items()
+    assert totals["bytes_in"] == sum(map(len, chunks)) and totals["ratio"] < 0.1
+
+def test_small_binary_or_unaccepted_bodies_pass_through():
+    body = b"y" * 1000
+    for app, accept_encoding in (
+        (_app([b"{}"]), "gzip"),
+        (_app([body], content_type=b"image/png"), "gzip"),
+        (_app([body]), "identity"),
+    ):
+        sent, stats = _run(app, accept_encoding)
+        assert b"content-encoding" not in dict(sent[0]["headers"])
+        assert stats.snapshot() == {}
+
+def test_api_responses_are_compressed_and_revalidate(client, user, project):
+    _, headers = user
+    for n in range(20):
+        client.post("/tasks/", json={"title": f"t{n}", "notes": "long notes " * 20, "project_id": project}, headers=headers)
+
+    response = client.get("/tasks/", headers={**headers, "Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.json()) == 20
+    etag = response.headers["etag"]
+    assert etag.startswith('W/"')
+
+    cached = client.get("/tasks/", headers={**headers, "Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+
+    plain = client.get("/tasks/", headers={**headers, "Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.json() == response.json()
+
+    assert client.get("/health").json()["compression"]["/tasks/"]["ratio"] < 1
+    assert compression.compression_stats.snapshot()["/tasks/"]["responses"] >= 1
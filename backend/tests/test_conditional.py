@@ -0,0 +1,55 @@
+"""ETags and If-None-Match on the polled list endpoints."""
+import pytest
+
+@pytest.mark.parametrize("path", ["/tasks/", "/projects/", "/dashboard/stats"])
+def test_unchanged_data_is_not_modified(client, user, project, path):
+    _, headers = user
+    first = client.get(path, headers=headers)
+    etag = first.headers["etag"]
+
+    again = client.get(path, headers={**headers, "If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == etag
+
+    client.post("/tasks/", json={"title": "t", "project_id": project}, headers=headers)
+    changed = client.get(path, headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+def test_every_write_bumps_the_revision(client, db, user, project):
+    import crud
+
+    user_id, headers = user
+    revisions = [crud.get_revision(db, user_id)]
+    def wrote():
+        db.expire_all()
+        revisions.append(crud.get_revision(db, user_id))
+        assert revisions[-1] > revisions[-2]
+
+    task_id = client.post("/tasks/", json={"title": "t", "project_id": project}, headers=headers).json()["id"]
+    wrote()
+    client.put(f"/tasks/{task_id}", json={"title": "u"}, headers=headers)
+    wrote()
+    subtask_id = client.post("/subtasks/", json={"title": "s", "parent_task_id": task_id}, headers=headers).json()["id"]
+    wrote()
+    client.put(f"/subtasks/{subtask_id}", json={"is_completed": True}, headers=headers)
+    wrote()
+    client.delete(f"/subtasks/{subtask_id}", headers=headers)
+    wrote()
+    client.post("/tasks/bulk", json={"operations": [{"op": "move", "id": task_id, "column": "Today"}]}, headers=headers)
+    wrote()
+    client.delete(f"/tasks/{task_id}", headers=headers)
+    wrote()
+    client.put(f"/projects/{project}", json={"name": "renamed"}, headers=headers)
+    wrote()
+    client.delete(f"/projects/{project}", headers=headers)
+    wrote()
+
+def test_etags_are_per_user_and_match_weakly(client, user, project):
+    _, headers = user
+    # Uncompressed, so the server sends its strong validator
+    headers = {**headers, "Accept-Encoding": "identity"}
+    etag = client.get("/projects/", headers=headers).headers["etag"]
+    assert client.get("/projects/", headers={**headers, "If-None-Match": f'"other", W/{etag}'}).status_code == 304
+    assert client.get("/projects/", headers={**headers, "If-None-Match": '"0.0"'}).status_code == 200
@@ -0,0 +1,20 @@
+"""Dashboard stats served from the per-user task counters."""
+import threading
+import crud
+
+def test_concurrent_writes_keep_the_counters_exact(client, db, user, project):
+    user_id, headers = user
+    responses = []
+
+    def create(worker):
+        for n in range(15):
+            responses.append(client.post("/tasks/", json={"title": f"t{worker}-{n}", "project_id": project}, headers=headers))
+    threads = [threading.Thread(target=create, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [response.status_code for response in responses] == [200] * 120
+    assert client.get("/dashboard/stats", headers=headers).json()["total_tasks"] == 120
+    assert crud.rebuild_task_counters(db, user_id=user_id) == []
@@ -0,0 +1,28 @@
+"""Engine profiles."""
+from sqlalchemy import text
+from config import Settings
+from database import create_db_engine, engine
+
+def test_sqlite_connections_get_the_tuned_pragmas():
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+        assert conn.execute(text("PRAGMA cache_size")).scalar() == -64000
+
+def test_profile_overrides(tmp_path):
+    profile = Settings(sqlite_journal_mode="DELETE", sqlite_synchronous="FULL", sqlite_busy_timeout_ms=10)
+    custom = create_db_engine(f"sqlite:///{tmp_path}/custom.db", profile)
+    with custom.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "delete"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 2  # FULL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 10
+    custom.dispose()
+
+def test_server_databases_get_a_sized_pool():
+    profile = Settings(db_pool_size=3, db_max_overflow=4, db_pool_recycle=60)
+    postgres = create_db_engine("postgresql://user@localhost/blitzit", profile)
+    assert postgres.pool.size() == 3
+    assert postgres.pool._max_overflow == 4
+    assert postgres.pool._recycle == 60
+    assert postgres.pool._pre_ping
@@ -0,0 +1,51 @@
+"""Request metrics, Server-Timing and GET /metrics."""
+import re
+from metrics import Histogram, Registry
+
+def _timing(response):
+    return dict(
+        (name, params) for name, _, params in
+        (part.strip().partition(";") for part in response.headers["server-timing"].split(","))
+    )
+
+def test_server_timing_counts_the_requests_queries(client, user, project):
+    _, headers = user
+    for n in range(3):
+        client.post("/tasks/", json={"title": f"t{n}", "project_id": project}, headers=headers)
+
+    timing = _timing(client.get("/tasks/", params={"include": "subtask_counts"}, headers=headers))
+    assert set(timing) == {"app", "db", "pool"}
+    queries = int(re.search(r'desc="(\d+) queries"', timing["db"]).group(1))
+    # Revision, page and one grouped subtask count: not one query per task
+    assert 2 <= queries <= 4
+
+def test_metrics_endpoint_reports_routes_by_template(client, user, project):
+    _, headers = user
+    task = client.post("/tasks/", json={"title": "t", "project_id": project}, headers=headers).json()["id"]
+    client.get(f"/tasks/{task}", headers=headers)
+    client.get("/tasks/999999", headers=headers)
+    client.get("/no/such/path")
+
+    text = client.get("/metrics").text
+    assert 'http_requests_total{method="GET",route="/tasks/{task_id}",status="200"}' in text
+    assert 'http_requests_total{method="GET",route="/tasks/{task_id}",status="404"}' in text
+    assert 'route="unmatched"' in text
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/tasks/{task_id}",le="+Inf"}' in text
+    assert 'db_queries_per_request_count{method="POST",route="/tasks/"}' in text
+    assert "db_pool_checkout_seconds_count" in text
+    assert "http_requests_in_flight 1" in text  # the scrape itself
+
+def test_histogram_exposition():
+    registry = Registry()
+    histogram = registry.register(Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0)))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value, route='/a"b')
+    assert registry.render().splitlines() == [
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/a\\"b",le="0.1"} 1',
+        'latency_seconds_bucket{route="/a\\"b",le="1.0"} 2',
+        'latency_seconds_bucket{route="/a\\"b",le="+Inf"} 3',
+        'latency_seconds_sum{route="/a\\"b"} 5.55',
+        'latency_seconds_count{route="/a\\"b"} 3',
+    ]
@@ -0,0 +1,162 @@
+"""Upgrading a database created by the original schema."""
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+import crud
+import migrations
+from schemas import TaskCreate
+from models import Base, Tombstone
+
+# The tables as the first release created them
+ORIGINAL_SCHEMA = """
+CREATE TABLE users (
+    id INTEGER NOT NULL PRIMARY KEY, email VARCHAR, username VARCHAR, full_name VARCHAR,
+    hashed_password VARCHAR, is_active BOOLEAN, created_at DATETIME
+);
+CREATE TABLE projects (
+    id INTEGER NOT NULL PRIMARY KEY, name VARCHAR, description TEXT, color VARCHAR,
+    owner_id INTEGER REFERENCES users (id), created_at DATETIME, updated_at DATETIME
+);
+CREATE TABLE tasks (
+    id INTEGER NOT NULL PRIMARY KEY, title VARCHAR, notes TEXT, "column" VARCHAR,
+    estimated_time INTEGER, actual_time INTEGER, task_type VARCHAR, task_priority VARCHAR,
+    due_date DATETIME, reminder_enabled BOOLEAN, reminder_offset INTEGER,
+    is_urgent BOOLEAN, is_important BOOLEAN,
+    project_id INTEGER REFERENCES projects (id), owner_id INTEGER REFERENCES users (id),
+    created_at DATETIME, updated_at DATETIME, completed_at DATETIME
+);
+CREATE TABLE subtasks (
+    id INTEGER NOT NULL PRIMARY KEY, title VARCHAR, is_completed BOOLEAN,
+    parent_task_id INTEGER REFERENCES tasks (id), created_at DATETIME
+);
+INSERT INTO users (id, username, is_active) VALUES (1, 'old', 1);
+INSERT INTO projects (id, name, owner_id) VALUES (1, 'old', 1);
+INSERT INTO tasks (id, title, "column", owner_id, project_id, created_at)
+    VALUES (1, 'a', 'Backlog', 1, 1, '2024-01-01 00:00:00'), (2, 'b', 'Done', 1, 1, '2024-01-02 00:00:00');
+"""
+
+def _original_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/original.db")
+    with engine.begin() as conn:
+        for statement in filter(str.strip, ORIGINAL_SCHEMA.split(";")):
+            conn.execute(text(statement))
+    return engine
+
+def test_upgrade_creates_missing_indexes(tmp_path):
+    engine = _original_database(tmp_path)
+    migrations.upgrade_schema(engine)
+
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        assert {index.name for index in table.indexes} <= {index["name"] for index in inspector.get_indexes(table.name)}
+    engine.dispose()
+
+def test_upgrade_is_idempotent(tmp_path):
+    engine = _original_database(tmp_path)
+    migrations.upgrade_schema(engine)
+    migrations.upgrade_schema(engine)
+    engine.dispose()
+
+def test_upgrade_adds_missing_columns(tmp_path):
+    engine = _original_database(tmp_path)
+    migrations.upgrade_schema(engine)
+
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        assert {column.name for column in table.columns} <= {column["name"] for column in inspector.get_columns(table.name)}
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT revision FROM tasks ORDER BY id")).scalars().all() == [0, 0]
+    engine.dispose()
+
+def test_upgrade_fills_the_daily_rollup(tmp_path):
+    engine = _original_database(tmp_path)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "UPDATE tasks SET completed_at = '2024-01-03 10:00:00', estimated_time = 25, actual_time = 20 WHERE id = 2"
+        ))
+    migrations.upgrade_schema(engine)
+    migrations.upgrade_schema(engine)
+
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT day, tasks_created, tasks_completed, estimated_minutes, actual_minutes FROM daily_user_stats ORDER BY day"
+        )).all()
+    assert [tuple(row) for row in rows] == [
+        ("2024-01-01", 1, 0, 0, 0), ("2024-01-02", 1, 0, 0, 0), ("2024-01-03", 0, 1, 25, 20),
+    ]
+    engine.dispose()
+
+def test_upgrade_fills_the_task_counters(tmp_path):
+    engine = _original_database(tmp_path)
+    migrations.upgrade_schema(engine)
+    migrations.upgrade_schema(engine)
+
+    db = Session(engine)
+    try:
+        # The first write after the upgrade adds to the existing counts
+        crud.create_task(db, TaskCreate(title="new", project_id=1), user_id=1)
+        stats = crud.get_dashboard_stats(db, user_id=1)
+        assert (stats["total_tasks"], stats["completed_tasks"]) == (3, 1)
+        assert crud.rebuild_task_counters(db, user_id=1) == []
+    finally:
+        db.close()
+    engine.dispose()
+
+def test_upgrade_adds_cascading_foreign_keys(tmp_path):
+    engine = _original_database(tmp_path)
+    with engine.begin() as conn:
+        # A subtask left behind by an earlier project delete, and a live one
+        conn.execute(text("INSERT INTO subtasks (id, title, parent_task_id) VALUES (1, 'orphan', 99), (2, 'kept', 1)"))
+    migrations.upgrade_schema(engine)
+    migrations.upgrade_schema(engine)
+
+    inspector = inspect(engine)
+    rules = {
+        (table, fk["referred_table"]): fk["options"].get("ondelete")
+        for table in ("tasks", "subtasks") for fk in inspector.get_foreign_keys(table)
+    }
+    assert rules[("tasks", "projects")] == rules[("subtasks", "tasks")] == "CASCADE"
+    with engine.begin() as conn:
+        assert conn.execute(text("SELECT id FROM subtasks")).scalars().all() == [2]
+        assert conn.execute(text("SELECT count(*) FROM tasks")).scalar() == 2
+        # The rebuild dropped the search triggers with the table; they are back
+        assert conn.execute(text("SELECT count(*) FROM sqlite_master WHERE type = 'trigger'")).scalar() == 3
+    with engine.begin() as conn:
+        conn.exec_driver_sql("PRAGMA foreign_keys=ON")
+        conn.execute(text("DELETE FROM projects WHERE id = 1"))
+        assert conn.execute(text("SELECT count(*) FROM tasks")).scalar() == 0
+        assert conn.execute(text("SELECT count(*) FROM subtasks")).scalar() == 0
+    engine.dispose()
+
+def test_upgrade_sets_pending_reminders(tmp_path):
+    engine = _original_database(tmp_path)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO tasks (id, title, \"column\", due_date, reminder_enabled, reminder_offset, owner_id, project_id) VALUES "
+            "(3, 'soon', 'Today', '2999-01-01 12:00:00', 1, 30, 1, 1), "
+            "(4, 'past', 'Today', '2020-01-01 12:00:00', 1, 0, 1, 1), "
+            "(5, 'done', 'Done', '2999-01-01 12:00:00', 1, 0, 1, 1)"
+        ))
+    migrations.upgrade_schema(engine)
+
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT id, remind_at FROM tasks WHERE remind_at IS NOT NULL")).all()
+    assert [tuple(row) for row in rows] == [(3, "2999-01-01 11:30:00.000000")]
+    engine.dispose()
+
+def test_upgrade_stops_sqlite_reusing_ids(tmp_path):
+    engine = _original_database(tmp_path)
+    # A task deleted after the tombstones arrived, with a higher id than any left
+    Tombstone.__table__.create(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO tombstones (owner_id, entity, entity_id, revision) VALUES (1, 'task', 9, 1)"))
+    migrations.upgrade_schema(engine)
+    migrations.upgrade_schema(engine)
+
+    with engine.begin() as conn:
+        for table in ("projects", "tasks", "subtasks"):
+            sql = conn.execute(text("SELECT sql FROM sqlite_master WHERE name = :name"), {"name": table}).scalar()
+            assert "AUTOINCREMENT" in sql
+        conn.execute(text("INSERT INTO tasks (title, owner_id, project_id) VALUES ('new', 1, 1)"))
+        assert conn.execute(text("SELECT max(id) FROM tasks")).scalar() == 10
+        assert conn.execute(text("SELECT count(*) FROM tasks")).scalar() == 3
+    engine.dispose()
@@ -0,0 +1,64 @@
+"""Deleting projects: cascades, and the batched purge of large ones."""
+import config
+import crud
+from models import Project, Task, SubTask
+
+def _fill(client, headers, project, tasks):
+    task_ids = [
+        client.post("/tasks/", json={"title": f"t{n}", "project_id": project}, headers=headers).json()["id"]
+        for n in range(tasks)
+    ]
+    for task_id in task_ids:
+        client.post("/subtasks/", json={"title": "s", "parent_task_id": task_id}, headers=headers)
+    return task_ids
+
+def _rows(db, project, task_ids):
+    db.expire_all()
+    return (
+        db.query(Project).filter(Project.id == project).count(),
+        db.query(Task).filter(Task.id.in_(task_ids)).count(),
+        db.query(SubTask).filter(SubTask.parent_task_id.in_(task_ids)).count(),
+    )
+
+def test_deleting_a_project_deletes_its_subtasks(client, db, user, project):
+    _, headers = user
+    task_ids = _fill(client, headers, project, 3)
+
+    assert client.delete(f"/projects/{project}", headers=headers).status_code == 200
+    assert _rows(db, project, task_ids) == (0, 0, 0)
+
+def test_large_projects_are_hidden_then_purged_in_batches(client, db, user, project, monkeypatch):
+    user_id, headers = user
+    monkeypatch.setattr(config.settings, "project_purge_batch_size", 2)
+    task_ids = _fill(client, headers, project, 5)
+
+    assert crud.delete_project(db, project, user_id)
+    # Nothing is deleted yet, but nothing of the project can be read either
+    assert _rows(db, project, task_ids) == (1, 5, 5)
+    assert client.get(f"/projects/{project}", headers=headers).status_code == 404
+    assert client.get("/projects/", headers=headers).json() == []
+    assert client.get("/tasks/", headers=headers).json() == []
+    assert client.get(f"/tasks/{task_ids[0]}", headers=headers).status_code == 404
+    assert client.get("/dashboard/stats", headers=headers).json()["total_tasks"] == 0
+    assert crud.rebuild_task_counters(db, user_id=user_id) == []
+    body = client.get("/sync/", params={"since": 0}, headers=headers).json()
+    assert body["projects"] == body["tasks"] == body["subtasks"] == []
+
+    batches = []
+    while True:
+        batches.append(crud.purge_deleted_project(db, project, batch_size=2))
+        if not batches[-1]:
+            break
+    assert batches == [2, 2, 1, 0]
+    assert _rows(db, project, task_ids) == (0, 0, 0)
+    assert project not in crud.get_deleted_project_ids(db)
+
+def test_large_projects_are_purged_after_the_response(client, db, user, project, monkeypatch):
+    _, headers = user
+    monkeypatch.setattr(config.settings, "project_purge_batch_size", 2)
+    monkeypatch.setattr(config.settings, "project_purge_pause_ms", 0)
+    task_ids = _fill(client, headers, project, 5)
+
+    # The test client runs background tasks before returning
+    assert client.delete(f"/projects/{project}", headers=headers).status_code == 200
+    assert _rows(db, project, task_ids) == (0, 0, 0)
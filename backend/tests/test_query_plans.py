@@ -0,0 +1,73 @@
+"""The hot queries search indexes, and slow statements are logged with their plan."""
+import json
+from datetime import datetime, timedelta
+import crud
+
+def _seed(client, headers, project):
+    due = (datetime.utcnow() - timedelta(days=1)).isoformat()
+    task = client.post("/tasks/", json={"title": "seed words", "project_id": project, "due_date": due}, headers=headers).json()["id"]
+    client.post("/tasks/", json={"title": "t", "project_id": project, "column": "Done"}, headers=headers)
+    client.post("/subtasks/", json={"title": "s", "parent_task_id": task}, headers=headers)
+    return task
+
+def test_board_queries_use_indexes(client, db, user, project, assert_indexed):
+    user_id, headers = user
+    task = _seed(client, headers, project)
+
+    assert_indexed(crud.get_tasks, db, user_id, limit=50)
+    assert_indexed(crud.get_tasks, db, user_id, column="Today", cursor=task)
+    assert_indexed(crud.get_tasks, db, user_id, project_id=project, include_subtasks=True)
+    assert_indexed(crud.get_task_rows, db, user_id, due_before=datetime.utcnow(), include_subtask_counts=True)
+    assert_indexed(crud.get_task_with_subtasks, db, task, user_id)
+    assert_indexed(crud.get_subtasks, db, task, user_id)
+    assert_indexed(crud.get_project_rows, db, user_id)
+    assert_indexed(crud.search_tasks, db, user_id, "seed")
+
+def test_dashboard_and_sync_queries_use_indexes(client, db, user, project, assert_indexed):
+    user_id, headers = user
+    _seed(client, headers, project)
+    today = datetime.utcnow().date()
+
+    stats = assert_indexed(crud.get_dashboard_stats, db, user_id)
+    assert stats["overdue_tasks"] == 1
+    assert_indexed(crud.get_trends, db, user_id, today - timedelta(days=365), today, "month")
+    assert_indexed(crud.get_revision, db, user_id)
+    assert_indexed(crud.get_changes, db, user_id, since=1)
+
+def test_the_helper_catches_a_full_scan(db, assert_indexed):
+    from models import Task
+
+    try:
+        assert_indexed(lambda: db.query(Task).filter(Task.notes == "x").all())
+    except AssertionError as exc:
+        assert "SCAN tasks" in str(exc)
+    else:
+        raise AssertionError("a scan of tasks went unnoticed")
+
+def test_slow_statements_are_logged_with_their_plan(tmp_path):
+    import slow_queries
+    from sqlalchemy import create_engine, text
+
+    engine = create_engine(f"sqlite:///{tmp_path}/slow.db")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)"))
+    path = tmp_path / "slow.log"
+    slow_queries.logger.handlers.clear()
+    try:
+        slow_queries.install_slow_query_log(engine, threshold_ms=0, path=str(path), max_bytes=1 << 20, backups=1)
+        with engine.connect() as conn:
+            conn.execute(text("SELECT * FROM items WHERE name = :name"), {"name": "secret"}).all()
+            conn.execute(text("SELECT * FROM items WHERE id = :id"), {"id": 1}).all()
+    finally:
+        for handler in slow_queries.logger.handlers:
+            handler.close()
+        slow_queries.logger.handlers.clear()
+
+    scan, search = [json.loads(line) for line in path.read_text().splitlines()]
+    assert scan["statement"] == "SELECT * FROM items WHERE name = ?"
+    assert scan["parameters"] == ["str"]
+    assert "secret" not in json.dumps(scan)
+    assert scan["full_scan"] == ["items"]
+    assert search["full_scan"] == [] and "SEARCH items" in search["plan"][0]
+    assert scan["route"] is None and scan["duration_ms"] >= 0
+    engine.dispose()
@@ -0,0 +1,105 @@
+"""Rank keys and PUT /tasks/{id}/position."""
+import random
+from ranks import key_between, evenly_spaced_keys
+
+def _board(client, headers, column="Backlog"):
+    tasks = client.get("/tasks/", params={"column": column}, headers=headers).json()
+    return [task["id"] for task in sorted(tasks, key=lambda task: task["rank"])]
+
+def test_key_between_always_finds_room():
+    rng = random.Random(20240601)
+    keys = []
+    for _ in range(2000):
+        index = rng.randint(0, len(keys))
+        before = keys[index - 1] if index > 0 else None
+        after = keys[index] if index < len(keys) else None
+        key = key_between(before, after)
+        assert (before is None or before < key) and (after is None or key < after)
+        keys.insert(index, key)
+    assert keys == sorted(keys)
+
+def test_appended_keys_stay_short():
+    keys = [key_between(None, None)]
+    for _ in range(100000):
+        keys.append(key_between(keys[-1], None))
+    assert keys == sorted(keys) and len(set(keys)) == len(keys)
+    assert len(keys[1000]) == 3 and max(len(key) for key in keys) == 5
+    assert not any(key.endswith("0") for key in keys)
+
+def test_evenly_spaced_keys_are_short_and_ordered():
+    keys = evenly_spaced_keys(1000)
+    assert keys == sorted(keys)
+    assert len(set(keys)) == 1000
+    assert max(len(key) for key in keys) == 2
+
+def test_ranks_compare_bytewise_on_postgres():
+    from sqlalchemy.dialects import postgresql
+    from sqlalchemy.schema import CreateTable
+    from models import Task, SubTask
+
+    for model in (Task, SubTask):
+        assert 'rank VARCHAR COLLATE "C"' in str(CreateTable(model.__table__).compile(dialect=postgresql.dialect()))
+
+def test_new_tasks_go_to_the_bottom(client, user, create_task):
+    _, headers = user
+    ids = [create_task()["id"] for _ in range(3)]
+    assert _board(client, headers) == ids
+
+def test_created_tasks_keep_short_ranks(client, user, create_task):
+    _, headers = user
+    for _ in range(200):
+        create_task()
+    assert max(len(task["rank"]) for task in client.get("/tasks/", headers=headers).json()) == 3
+
+def test_position_writes_one_task(client, user, create_task):
+    _, headers = user
+    a, b, c = (create_task()["id"] for _ in range(3))
+    ranks = {task["id"]: task["rank"] for task in client.get("/tasks/", headers=headers).json()}
+
+    response = client.put(f"/tasks/{c}/position", json={"after_id": a, "before_id": b}, headers=headers)
+    assert response.status_code == 200
+    assert _board(client, headers) == [a, c, b]
+    after = {task["id"]: task["rank"] for task in client.get("/tasks/", headers=headers).json()}
+    assert after[a] == ranks[a] and after[b] == ranks[b]
+
+    client.put(f"/tasks/{a}/position", json={"after_id": b}, headers=headers)
+    assert _board(client, headers) == [c, b, a]
+
+def test_position_into_another_column(client, user, create_task):
+    _, headers = user
+    moved = create_task()["id"]
+    done = create_task(column="Done")["id"]
+
+    response = client.put(f"/tasks/{moved}/position", json={"column": "Done", "before_id": done}, headers=headers)
+    assert response.json()["column"] == "Done"
+    assert response.json()["completed_at"] is not None
+    assert _board(client, headers, "Done") == [moved, done]
+    assert client.get("/dashboard/stats", headers=headers).json()["completed_tasks"] == 2
+
+def test_stale_or_foreign_neighbours_conflict(client, user, create_task):
+    _, headers = user
+    a, b, c = (create_task()["id"] for _ in range(3))
+    today = create_task(column="Today")["id"]
+
+    assert client.put(f"/tasks/{c}/position", json={"after_id": b, "before_id": a}, headers=headers).status_code == 409
+    assert client.put(f"/tasks/{c}/position", json={"after_id": today}, headers=headers).status_code == 409
+    assert client.put(f"/tasks/{c}/position", json={"after_id": c}, headers=headers).status_code == 409
+    assert client.put(f"/tasks/{c}/position", json={"column": "Nowhere"}, headers=headers).status_code == 400
+
+def test_long_ranks_are_rebalanced(client, user, create_task, monkeypatch):
+    import config
+
+    _, headers = user
+    monkeypatch.setattr(config.settings, "rank_max_length", 3)
+    first, last = (create_task()["id"] for _ in range(2))
+    middle = [create_task()["id"] for _ in range(30)]
+    # Keep inserting right after `first`, which lengthens the keys
+    order = [first]
+    for task_id in middle:
+        client.put(f"/tasks/{task_id}/position", json={"after_id": first, "before_id": order[1] if len(order) > 1 else last}, headers=headers)
+        order.insert(1, task_id)
+    order.append(last)
+
+    tasks = client.get("/tasks/", params={"column": "Backlog"}, headers=headers).json()
+    assert max(len(task["rank"]) for task in tasks) <= 4
+    assert _board(client, headers) == order
@@ -0,0 +1,116 @@
+"""The reminder scheduler: fire times kept by the writes, sent from a heap."""
+from datetime import datetime, timedelta
+import crud
+import reminders
+from reminders import ReminderScheduler
+from models import Task
+
+class ListSink:
+    def __init__(self):
+        self.delivered = []
+
+    def deliver(self, batch):
+        self.delivered.extend(batch)
+
+    def ids(self, task_ids):
+        return [reminder["id"] for reminder in self.delivered if reminder["id"] in task_ids]
+
+def _scheduler(monkeypatch, now, window_minutes, sink=None):
+    """A scheduler that crud reports to, polled by hand instead of by its thread."""
+    sink = sink or ListSink()
+    scheduler = ReminderScheduler(sink, window_minutes=window_minutes)
+    scheduler.poll(now)
+    monkeypatch.setattr(reminders, "reminder_scheduler", scheduler)
+    return scheduler, sink
+
+def _task(client, headers, project, due_date, **fields):
+    body = {"title": "t", "project_id": project, "due_date": due_date.isoformat(), "reminder_enabled": True, **fields}
+    return client.post("/tasks/", json=body, headers=headers).json()["id"]
+
+def test_reminders_fire_when_due(client, db, user, project, monkeypatch):
+    _, headers = user
+    now = datetime.utcnow()
+    scheduler, sink = _scheduler(monkeypatch, now, window_minutes=24 * 60)
+
+    first = _task(client, headers, project, now + timedelta(hours=2), reminder_offset=30)
+    moved = _task(client, headers, project, now + timedelta(hours=3))
+    client.put(f"/tasks/{moved}", json={"reminder_offset": 60}, headers=headers)
+    done = _task(client, headers, project, now + timedelta(hours=1))
+    client.put(f"/tasks/{done}/move", params={"column": "Done"}, headers=headers)
+    silent = _task(client, headers, project, now + timedelta(hours=1), reminder_enabled=False)
+    task_ids = {first, moved, done, silent}
+
+    # It sleeps until the earliest reminder
+    assert scheduler.poll(now) == now + timedelta(hours=1, minutes=30)
+    scheduler.poll(now + timedelta(hours=1, minutes=31))
+    assert sink.ids(task_ids) == [first]
+    scheduler.poll(now + timedelta(hours=5))
+    assert sink.ids(task_ids) == [first, moved]
+    assert sink.delivered[0]["remind_at"] == now + timedelta(hours=1, minutes=30)
+
+    # Sent reminders are cleared, and editing the task doesn't re-arm them
+    client.put(f"/tasks/{first}", json={"title": "renamed"}, headers=headers)
+    db.expire_all()
+    assert db.query(Task).filter(Task.id.in_(task_ids), Task.remind_at.isnot(None)).count() == 0
+
+def test_reminders_beyond_the_window_are_loaded_with_it(client, db, user, project, monkeypatch, assert_indexed):
+    _, headers = user
+    now = datetime.utcnow()
+    scheduler, sink = _scheduler(monkeypatch, now, window_minutes=60)
+
+    later = _task(client, headers, project, now + timedelta(hours=3))
+    assert later not in scheduler._pending
+
+    scheduler.poll(now + timedelta(hours=1))
+    scheduler.poll(now + timedelta(hours=2, minutes=30))
+    assert later in scheduler._pending
+    scheduler.poll(now + timedelta(hours=3))
+    assert sink.ids({later}) == [later]
+    assert_indexed(crud.get_reminder_times, db, before=now + timedelta(hours=2), since=now + timedelta(hours=1))
+
+def test_reopening_a_task_re_arms_its_reminder(client, db, user, project, monkeypatch):
+    _, headers = user
+    now = datetime.utcnow()
+    scheduler, sink = _scheduler(monkeypatch, now, window_minutes=24 * 60)
+
+    task_id = _task(client, headers, project, now + timedelta(hours=2), column="Done")
+    assert scheduler.poll(now + timedelta(hours=3)) and sink.ids({task_id}) == []
+    client.put(f"/tasks/{task_id}/move", params={"column": "Today"}, headers=headers)
+    scheduler.poll(now + timedelta(hours=3))
+    assert sink.ids({task_id}) == [task_id]
+
+def test_deleted_tasks_are_not_reminded(client, db, user, project, monkeypatch):
+    _, headers = user
+    now = datetime.utcnow()
+    scheduler, sink = _scheduler(monkeypatch, now, window_minutes=24 * 60)
+
+    task_id = _task(client, headers, project, now + timedelta(hours=2))
+    client.delete(f"/tasks/{task_id}", headers=headers)
+    scheduler.poll(now + timedelta(hours=3))
+    assert sink.ids({task_id}) == []
+
+class FailingSink(ListSink):
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    def deliver(self, batch):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("webhook down")
+        super().deliver(batch)
+
+def test_failed_deliveries_are_retried(client, db, user, project, monkeypatch):
+    _, headers = user
+    now = datetime.utcnow()
+    scheduler, sink = _scheduler(monkeypatch, now, window_minutes=24 * 60, sink=FailingSink(failures=1))
+
+    task_id = _task(client, headers, project, now + timedelta(hours=2))
+    assert scheduler.poll(now + timedelta(hours=2)) == now + timedelta(hours=2, seconds=30)
+    assert sink.ids({task_id}) == []
+    db.expire_all()
+    assert db.get(Task, task_id).remind_at == now + timedelta(hours=2, seconds=30)
+
+    scheduler.poll(now + timedelta(hours=2, seconds=30))
+    assert sink.ids({task_id}) == [task_id]
+    assert scheduler.stats()["failed"] == 1 and scheduler.stats()["delivered"] >= 1
@@ -0,0 +1,75 @@
+"""GET /tasks/search."""
+
+def _search(client, headers, **params):
+    response = client.get("/tasks/search", params=params, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+def test_matches_every_word_with_titles_first(client, user, create_task):
+    _, headers = user
+    in_notes = create_task(title="Call the bank", notes="ask about the quarterly report")["id"]
+    in_title = create_task(title="Quarterly report", notes="numbers for Q3")["id"]
+    split = create_task(title="Report bug", notes="nothing quarterly-ish here")["id"]
+    create_task(title="Unrelated")
+
+    results = _search(client, headers, q="Quarterly REPORT")
+    assert results[0]["id"] == in_title
+    assert {task["id"] for task in results} == {in_title, in_notes, split}
+    top = results[0]
+    assert top["title_highlight"] == "<mark>Quarterly</mark> <mark>report</mark>"
+    assert top["search_score"] <= results[-1]["search_score"]
+    assert _search(client, headers, q="quarterly unrelated") == []
+
+def test_prefix_queries_and_snippets(client, user, create_task):
+    _, headers = user
+    task = create_task(title="Groceries", notes="buy tomatoes and potatoes for dinner")["id"]
+
+    assert _search(client, headers, q="tomato") == []
+    [result] = _search(client, headers, q="tomat*")
+    assert result["id"] == task
+    assert "<mark>tomatoes</mark>" in result["notes_snippet"]
+
+def test_highlights_escape_the_task_text(client, user, create_task):
+    _, headers = user
+    create_task(title="<img src=x onerror=alert(1)> report", notes="a & b <script>report</script>")
+
+    [result] = _search(client, headers, q="report")
+    assert result["title_highlight"] == "&lt;img src=x onerror=alert(1)&gt; <mark>report</mark>"
+    assert result["notes_snippet"] == "a &amp; b &lt;script&gt;<mark>report</mark>&lt;/script&gt;"
+
+def test_index_follows_updates_and_deletes(client, user, create_task):
+    _, headers = user
+    task = create_task(title="Draft proposal")["id"]
+    client.put(f"/tasks/{task}", json={"title": "Final proposal"}, headers=headers)
+    assert _search(client, headers, q="draft") == []
+    assert [result["id"] for result in _search(client, headers, q="final")] == [task]
+
+    client.delete(f"/tasks/{task}", headers=headers)
+    assert _search(client, headers, q="proposal") == []
+
+def test_only_the_users_tasks_are_searched(client, user, create_task):
+    _, headers = user
+    mine = create_task(title="Shared word zebra")["id"]
+
+    client.post("/auth/register", json={"email": "zebra@example.com", "username": "zebra", "password": "pw"})
+    token = client.post("/auth/token", data={"username": "zebra", "password": "pw"}).json()["access_token"]
+    other_headers = {"Authorization": f"Bearer {token}"}
+    other_project = client.post("/projects/", json={"name": "P"}, headers=other_headers).json()["id"]
+    create_task(headers=other_headers, project_id=other_project, title="Zebra crossing")
+
+    assert [result["id"] for result in _search(client, headers, q="zebra")] == [mine]
+
+def test_keyset_pages(client, user, create_task):
+    _, headers = user
+    ids = {create_task(title=f"Page item {n}")["id"] for n in range(5)}
+
+    seen, cursor = [], None
+    while True:
+        params = {"q": "page", "limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/tasks/search", params=params, headers=headers)
+        seen += [task["id"] for task in response.json()]
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+    assert sorted(seen) == sorted(ids)
+    assert client.get("/tasks/search", params={"q": "page", "cursor": "nonsense"}, headers=headers).status_code == 400
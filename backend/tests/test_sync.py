@@ -0,0 +1,77 @@
+"""Incremental sync through GET /sync."""
+
+def _sync(client, headers, since):
+    response = client.get("/sync/", params={"since": since}, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+def test_first_sync_returns_everything(client, user, project):
+    _, headers = user
+    task = client.post("/tasks/", json={"title": "t", "project_id": project}, headers=headers).json()["id"]
+    client.post("/subtasks/", json={"title": "s", "parent_task_id": task}, headers=headers)
+
+    body = _sync(client, headers, 0)
+    assert [p["id"] for p in body["projects"]] == [project]
+    assert [t["id"] for t in body["tasks"]] == [task]
+    assert len(body["subtasks"]) == 1
+    assert body["revision"] > 0
+
+def test_later_syncs_return_only_changes_and_deletions(client, user, project):
+    _, headers = user
+    kept, changed, removed = (
+        client.post("/tasks/", json={"title": "t", "project_id": project}, headers=headers).json()["id"]
+        for _ in range(3)
+    )
+    subtask = client.post("/subtasks/", json={"title": "s", "parent_task_id": kept}, headers=headers).json()["id"]
+    since = _sync(client, headers, 0)["revision"]
+
+    client.put(f"/tasks/{changed}", json={"title": "changed"}, headers=headers)
+    client.delete(f"/tasks/{removed}", headers=headers)
+    client.delete(f"/subtasks/{subtask}", headers=headers)
+
+    body = _sync(client, headers, since)
+    assert [t["id"] for t in body["tasks"]] == [changed]
+    assert body["projects"] == []
+    assert body["deleted"] == {"projects": [], "tasks": [removed], "subtasks": [subtask]}
+    assert _sync(client, headers, body["revision"])["tasks"] == []
+
+def test_project_deletion_tombstones_only_the_project(client, user, project):
+    _, headers = user
+    client.post("/tasks/", json={"title": "t", "project_id": project}, headers=headers)
+    since = _sync(client, headers, 0)["revision"]
+
+    client.delete(f"/projects/{project}", headers=headers)
+    # The project's tombstone stands for its tasks
+    assert _sync(client, headers, since)["deleted"] == {"projects": [project], "tasks": [], "subtasks": []}
+
+def test_bulk_changes_are_stamped(client, user, project):
+    _, headers = user
+    moved, removed = (
+        client.post("/tasks/", json={"title": "t", "project_id": project}, headers=headers).json()["id"]
+        for _ in range(2)
+    )
+    since = _sync(client, headers, 0)["revision"]
+
+    client.post("/tasks/bulk", json={"operations": [
+        {"op": "move", "id": moved, "column": "Today"},
+        {"op": "delete", "id": removed},
+        {"op": "create", "task": {"title": "new", "project_id": project}},
+    ]}, headers=headers)
+    body = _sync(client, headers, since)
+    assert [t["title"] for t in body["tasks"]] == ["t", "new"]
+    assert body["deleted"]["tasks"] == [removed]
+
+def test_deleted_ids_are_never_reused(client, user, project):
+    _, headers = user
+    since = _sync(client, headers, 0)["revision"]
+    removed = client.post("/tasks/", json={"title": "t", "project_id": project}, headers=headers).json()["id"]
+    subtask = client.post("/subtasks/", json={"title": "s", "parent_task_id": removed}, headers=headers).json()["id"]
+    client.delete(f"/tasks/{removed}", headers=headers)
+
+    # The deleted task was the newest row, which SQLite would otherwise hand out again
+    created = client.post("/tasks/", json={"title": "t", "project_id": project}, headers=headers).json()["id"]
+    new_subtask = client.post("/subtasks/", json={"title": "s", "parent_task_id": created}, headers=headers).json()["id"]
+    assert created != removed and new_subtask != subtask
+    body = _sync(client, headers, since)
+    assert [t["id"] for t in body["tasks"]] == [created]
+    assert body["deleted"]["tasks"] == [removed]
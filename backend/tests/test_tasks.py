@@ -0,0 +1,122 @@
+"""Listing, filtering and paging tasks."""
+from datetime import datetime, timedelta
+
+def test_keyset_pages_cover_every_task_once(client, user, create_task):
+    _, headers = user
+    ids = [create_task(title=f"t{n}")["id"] for n in range(5)]
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/tasks/", params=params, headers=headers)
+        seen += [task["id"] for task in response.json()]
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+    assert seen == ids
+    # Without a limit the full list comes back, as before
+    assert [task["id"] for task in client.get("/tasks/", headers=headers).json()] == ids
+
+def test_filters(client, user, create_task):
+    _, headers = user
+    now = datetime.utcnow()
+    soon = create_task(due_date=(now + timedelta(days=1)).isoformat(), is_urgent=True)["id"]
+    later = create_task(due_date=(now + timedelta(days=9)).isoformat())["id"]
+    today = create_task(column="Today")["id"]
+
+    def ids(**params):
+        return [task["id"] for task in client.get("/tasks/", params=params, headers=headers).json()]
+
+    assert ids(column="Today") == [today]
+    assert ids(due_before=(now + timedelta(days=2)).isoformat()) == [soon]
+    assert ids(due_after=(now + timedelta(days=2)).isoformat()) == [later]
+    assert ids(is_urgent=True) == [soon]
+
+def test_cross_origin_clients_can_read_the_cursor(client, user, create_task):
+    _, headers = user
+    for n in range(3):
+        create_task(title=f"t{n}")
+    response = client.get("/tasks/", params={"limit": 2}, headers={**headers, "Origin": "https://app.example.com"})
+    assert response.headers["x-next-cursor"]
+    exposed = {header.strip().lower() for header in response.headers["access-control-expose-headers"].split(",")}
+    assert "x-next-cursor" in exposed
+
+def _count_queries(client, *args, **kwargs):
+    from sqlalchemy import event
+    from database import engine
+
+    statements = []
+    def record(conn, cursor, statement, *rest):
+        statements.append(statement)
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.get(*args, **kwargs)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert response.status_code == 200
+    return response, len(statements)
+
+def test_include_subtasks_costs_constant_queries(client, user, create_task):
+    _, headers = user
+    first = create_task()["id"]
+    client.post("/subtasks/", json={"title": "s", "parent_task_id": first, "is_completed": True}, headers=headers)
+    client.post("/subtasks/", json={"title": "s", "parent_task_id": first}, headers=headers)
+    client.get("/tasks/", headers=headers)  # warm the user cache
+
+    response, few = _count_queries(client, "/tasks/", params={"include": "subtasks"}, headers=headers)
+    task = response.json()[0]
+    assert [subtask["title"] for subtask in task["subtasks"]] == ["s", "s"]
+    assert (task["subtask_count"], task["completed_subtask_count"]) == (2, 1)
+
+    for n in range(5):
+        task_id = create_task()["id"]
+        client.post("/subtasks/", json={"title": "s", "parent_task_id": task_id}, headers=headers)
+    _, many = _count_queries(client, "/tasks/", params={"include": "subtasks"}, headers=headers)
+    assert many == few
+
+    response, _ = _count_queries(client, "/tasks/", params={"include": "subtask_counts"}, headers=headers)
+    task = response.json()[0]
+    assert task["subtasks"] is None
+    assert (task["subtask_count"], task["completed_subtask_count"]) == (2, 1)
+
+    plain = client.get("/tasks/", headers=headers).json()[0]
+    assert plain["subtasks"] is None and plain["subtask_count"] is None
+
+def test_task_detail_is_one_query(client, user, create_task):
+    _, headers = user
+    task_id = create_task()["id"]
+    client.post("/subtasks/", json={"title": "s", "parent_task_id": task_id}, headers=headers)
+    client.get("/tasks/", headers=headers)  # warm the user cache
+
+    response, queries = _count_queries(client, f"/tasks/{task_id}", headers=headers)
+    assert [subtask["title"] for subtask in response.json()["subtasks"]] == ["s"]
+    assert queries == 1
+
+def test_unknown_include_is_rejected(client, user):
+    _, headers = user
+    assert client.get("/tasks/", params={"include": "owner"}, headers=headers).status_code == 400
+
+def test_fast_list_path_matches_the_response_models(client, db, user, create_task):
+    import json
+    from typing import List
+    from pydantic import TypeAdapter
+    import crud
+    from schemas import TaskListItem, Project
+
+    user_id, headers = user
+    task = create_task(title="Café ✓", notes=None, due_date=datetime(2030, 1, 2, 3, 4, 5, 600).isoformat())["id"]
+    create_task(column="Done", estimated_time=15)
+    client.post("/subtasks/", json={"title": "s", "parent_task_id": task}, headers=headers)
+
+    def model_json(schema, objects):
+        adapter = TypeAdapter(List[schema])
+        return json.dumps(adapter.dump_python(adapter.validate_python(objects), mode="json"), ensure_ascii=False, separators=(",", ":"))
+
+    for include in (None, "subtask_counts", "subtasks"):
+        params = {"include": include} if include else {}
+        response = client.get("/tasks/", params=params, headers=headers)
+        expected = crud.get_tasks(
+            db, user_id, include_subtasks=include == "subtasks", include_subtask_counts=include == "subtask_counts"
+        )
+        assert response.text == model_json(TaskListItem, expected)
+    assert client.get("/projects/", headers=headers).text == model_json(Project, crud.get_projects(db, user_id))
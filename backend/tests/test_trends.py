@@ -0,0 +1,120 @@
+"""The daily rollup and GET /dashboard/trends."""
+import threading
+from datetime import date, datetime, timedelta
+
+def _trends(client, headers, **params):
+    response = client.get("/dashboard/trends", params=params, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+def _today(client, headers):
+    today = datetime.utcnow().date().isoformat()
+    [point] = _trends(client, headers, **{"from": today, "to": today})["points"]
+    return point
+
+def test_writes_maintain_the_rollup(client, user, create_task):
+    _, headers = user
+    a = create_task(estimated_time=30)["id"]
+    b = create_task(estimated_time=10)["id"]
+    create_task()
+    client.put(f"/tasks/{a}", json={"column": "Done", "actual_time": 45}, headers=headers)
+    client.put(f"/tasks/{b}/move", params={"column": "Done"}, headers=headers)
+
+    assert _today(client, headers) == {
+        "period_start": datetime.utcnow().date().isoformat(),
+        "tasks_created": 3, "tasks_completed": 2, "estimated_minutes": 40, "actual_minutes": 45,
+    }
+
+    # Reopening takes the completion back out; deleting keeps the history
+    client.put(f"/tasks/{b}", json={"column": "Today"}, headers=headers)
+    client.delete(f"/tasks/{a}", headers=headers)
+    point = _today(client, headers)
+    assert (point["tasks_created"], point["tasks_completed"], point["estimated_minutes"]) == (3, 1, 30)
+
+def test_bulk_operations_maintain_the_rollup(client, user, project, create_task):
+    _, headers = user
+    task = create_task(estimated_time=5)["id"]
+    client.post("/tasks/bulk", json={"operations": [
+        {"op": "create", "task": {"title": "new", "project_id": project, "column": "Done"}},
+        {"op": "update", "id": task, "changes": {"column": "Done", "estimated_time": 20, "actual_time": 15}},
+    ]}, headers=headers)
+
+    point = _today(client, headers)
+    assert (point["tasks_created"], point["tasks_completed"]) == (2, 1)
+    assert (point["estimated_minutes"], point["actual_minutes"]) == (20, 15)
+
+def test_editing_a_done_task_keeps_its_completion(client, user, create_task):
+    _, headers = user
+    single = create_task()["id"]
+    bulk = create_task()["id"]
+    for task in (single, bulk):
+        client.put(f"/tasks/{task}/move", params={"column": "Done"}, headers=headers)
+    completed_at = client.get(f"/tasks/{single}", headers=headers).json()["completed_at"]
+
+    client.put(f"/tasks/{single}", json={"notes": "edited"}, headers=headers)
+    client.post("/tasks/bulk", json={"operations": [
+        {"op": "update", "id": bulk, "changes": {"notes": "edited"}},
+    ]}, headers=headers)
+
+    assert client.get(f"/tasks/{single}", headers=headers).json()["completed_at"] == completed_at
+    assert client.get(f"/tasks/{bulk}", headers=headers).json()["completed_at"] is not None
+    assert _today(client, headers)["tasks_completed"] == 2
+
+def test_periods_are_filled_and_grouped(client, user, create_task):
+    _, headers = user
+    create_task()
+    today = datetime.utcnow().date()
+
+    trends = _trends(client, headers)
+    assert trends["granularity"] == "day"
+    assert len(trends["points"]) == 30
+    assert trends["points"][-1]["tasks_created"] == 1
+    assert sum(point["tasks_created"] for point in trends["points"]) == 1
+
+    start = today.replace(year=today.year - 3, month=1, day=1)
+    yearly = _trends(client, headers, **{"from": start.isoformat(), "granularity": "year"})["points"]
+    assert [point["period_start"] for point in yearly] == [date(start.year + n, 1, 1).isoformat() for n in range(4)]
+    assert [point["tasks_created"] for point in yearly] == [0, 0, 0, 1]
+
+    weekly = _trends(client, headers, **{"from": today.isoformat(), "granularity": "week"})["points"]
+    assert weekly[0]["period_start"] == (today - timedelta(days=today.weekday())).isoformat()
+
+def test_project_filter_and_bad_ranges(client, user, create_task):
+    _, headers = user
+    other = client.post("/projects/", json={"name": "Other"}, headers=headers).json()["id"]
+    create_task()
+    create_task(project_id=other)
+    today = datetime.utcnow().date()
+
+    assert _trends(client, headers, project_id=other)["points"][-1]["tasks_created"] == 1
+    assert _trends(client, headers)["points"][-1]["tasks_created"] == 2
+    response = client.get("/dashboard/trends", params={"from": today.isoformat(), "to": (today - timedelta(days=1)).isoformat()}, headers=headers)
+    assert response.status_code == 400
+    assert client.get("/dashboard/trends", params={"granularity": "hour"}, headers=headers).status_code == 422
+
+def test_concurrent_writes_keep_the_rollup_exact(client, user, project):
+    _, headers = user
+    responses = []
+
+    def create(worker):
+        for n in range(15):
+            responses.append(client.post("/tasks/", json={"title": f"t{worker}-{n}", "project_id": project}, headers=headers))
+    threads = [threading.Thread(target=create, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [response.status_code for response in responses] == [200] * 120
+    assert _today(client, headers)["tasks_created"] == 120
+
+def test_ranges_are_bounded(client, user):
+    _, headers = user
+    response = client.get("/dashboard/trends", params={"from": "0001-01-01", "to": "9999-12-31"}, headers=headers)
+    assert response.status_code == 400
+    assert client.get("/dashboard/trends", params={"from": "2020-01-01", "to": "2024-12-31"}, headers=headers).status_code == 400
+
+    # The last representable dates are fine
+    points = _trends(client, headers, **{"from": "9990-06-01", "to": "9999-12-31", "granularity": "year"})["points"]
+    assert [point["period_start"] for point in points] == [f"{year}-01-01" for year in range(9990, 10000)]
+    assert len(_trends(client, headers, **{"from": "9999-12-30", "to": "9999-12-31"})["points"]) == 2
@@ -0,0 +1,58 @@
+"""Group commit through the single-writer queue."""
+import threading
+import pytest
+
+@pytest.fixture
+def group_commit(monkeypatch):
+    import write_queue
+
+    queue = write_queue.GroupCommitQueue(max_batch=16, window_ms=50)
+    monkeypatch.setattr(write_queue, "group_commit", queue)
+    yield queue
+    queue.shutdown()
+
+def test_concurrent_writes_share_a_commit(client, user, project, group_commit):
+    _, headers = user
+    responses = []
+
+    def create(n):
+        responses.append(client.post("/tasks/", json={"title": f"t{n}", "project_id": project}, headers=headers))
+    threads = [threading.Thread(target=create, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(response.status_code == 200 for response in responses)
+    assert sorted(response.json()["title"] for response in responses) == sorted(f"t{n}" for n in range(8))
+    stats = group_commit.stats()
+    assert stats["units"] == 8
+    assert stats["max_batch_size"] > 1
+    assert stats["batches"] < 8
+    assert len(client.get("/tasks/", headers=headers).json()) == 8
+    assert client.get("/dashboard/stats", headers=headers).json()["total_tasks"] == 8
+
+def test_a_failing_unit_only_rolls_back_itself(client, user, project, group_commit):
+    import crud
+    from schemas import TaskCreate
+
+    user_id, headers = user
+
+    def create_then_fail(db):
+        crud.create_task(db, TaskCreate(title="doomed", project_id=project), user_id)
+        raise RuntimeError("boom")
+
+    failed = group_commit.submit(create_then_fail)
+    kept = group_commit.submit(crud.create_task, TaskCreate(title="kept", project_id=project), user_id)
+    assert kept.result().title == "kept"
+    with pytest.raises(RuntimeError):
+        failed.result()
+    assert [task["title"] for task in client.get("/tasks/", headers=headers).json()] == ["kept"]
+    assert client.get("/dashboard/stats", headers=headers).json()["total_tasks"] == 1
+
+def test_events_wait_for_the_batch_commit(client, user, project, group_commit):
+    _, headers = user
+    token = headers["Authorization"].split()[1]
+    with client.websocket_connect(f"/changes/ws?token={token}") as ws:
+        task = client.post("/tasks/", json={"title": "t", "project_id": project}, headers=headers).json()["id"]
+        assert ws.receive_json()["id"] == task
@@ -0,0 +1,213 @@
+"""Group commit: one writer thread commits many requests' writes at once.
+
+With SQLite every commit takes the database lock and pays an fsync, so
+concurrent writers queue behind each other one commit at a time. With
+settings.group_commit, routers hand their crud write calls to
+GroupCommitQueue.submit instead. The writer thread collects whatever is
+queued (up to group_commit_max_batch units, waiting at most
+group_commit_window_ms for more), runs each unit in its own savepoint of
+one transaction and commits once. A unit that raises only rolls back its
+own savepoint; each caller gets its unit's result after the batch commits.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from sqlalchemy import event
+from sqlalchemy.orm import Session, sessionmaker
+from config import settings
+from database import create_db_engine
+from events import change_feed
+from reminders import reminder_scheduler
+
+class GroupCommitSession(Session):
+    """A session whose commit() and rollback() stay inside the current unit.
+
+    crud functions commit and roll back as if they owned the transaction;
+    while a unit runs those act on the unit's savepoint instead, and the
+    writer commits the real transaction once the batch is done.
+    """
+    _unit = None
+
+    def begin_unit(self):
+        self._unit = self.begin_nested()
+
+    def end_unit(self, ok: bool):
+        unit, self._unit = self._unit, None
+        if unit.is_active:
+            if ok:
+                unit.commit()
+            else:
+                unit.rollback()
+
+    def commit(self):
+        if self._unit is None:
+            return super().commit()
+        self.flush()
+
+    def rollback(self):
+        if self._unit is None:
+            return super().rollback()
+        self._unit.rollback()
+        self._unit = self.begin_nested()
+
+def _writer_engine():
+    engine = create_db_engine()
+    if engine.dialect.name == "sqlite":
+        # pysqlite's own transaction handling breaks SAVEPOINT; take control
+        # of BEGIN, and take the write lock up front
+        @event.listens_for(engine, "connect")
+        def disable_pysqlite_transactions(dbapi_connection, connection_record):
+            dbapi_connection.isolation_level = None
+
+        @event.listens_for(engine, "begin")
+        def begin_immediate(conn):
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+    return engine
+
+class _Unit:
+    __slots__ = ("fn", "args", "kwargs", "future")
+
+    def __init__(self, fn, args, kwargs):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+
+class GroupCommitQueue:
+    def __init__(self, max_batch: int, window_ms: float):
+        self.max_batch = max(max_batch, 1)
+        self.window = window_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._Session = None
+        self._batches = 0
+        self._units = 0
+        self._max_batch_seen = 0
+        self._commit_seconds = 0.0
+        self._max_commit_seconds = 0.0
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._Session = sessionmaker(
+                    bind=_writer_engine(), class_=GroupCommitSession,
+                    autoflush=False, expire_on_commit=False,
+                )
+                self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+                self._thread.start()
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """Queue fn(db, *args, **kwargs) for the next batch."""
+        self._start()
+        unit = _Unit(fn, args, kwargs)
+        self._queue.put(unit)
+        return unit.future
+
+    def run(self, fn, *args, **kwargs):
+        """submit() and wait for the batch to commit."""
+        return self.submit(fn, *args, **kwargs).result()
+
+    def _run(self):
+        while True:
+            unit = self._queue.get()
+            if unit is None:
+                return
+            batch = [unit]
+            deadline = time.monotonic() + self.window
+            stop = False
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                try:
+                    unit = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if unit is None:
+                    stop = True
+                    break
+                batch.append(unit)
+            self._commit_batch(batch)
+            if stop:
+                return
+
+    def _commit_batch(self, batch):
+        db = self._Session()
+        db.info["deferred_events"] = events = []
+        db.info["deferred_reminders"] = reminders = []
+        outcomes = []
+        start = time.perf_counter()
+        try:
+            for unit in batch:
+                mark, reminder_mark = len(events), len(reminders)
+                db.begin_unit()
+                try:
+                    value = unit.fn(db, *unit.args, **unit.kwargs)
+                except Exception as exc:
+                    db.end_unit(False)
+                    del events[mark:]
+                    del reminders[reminder_mark:]
+                    outcomes.append((unit, exc, False))
+                else:
+                    db.end_unit(True)
+                    outcomes.append((unit, value, True))
+            db.commit()
+        except Exception as exc:
+            db.rollback()
+            outcomes = [(unit, exc, False) for unit in batch]
+            events, reminders = [], []
+        finally:
+            db.close()
+        elapsed = time.perf_counter() - start
+
+        for user_id, user_events in events:
+            change_feed.publish(user_id, user_events)
+        if reminders:
+            reminder_scheduler.schedule_many(reminders)
+        for unit, value, ok in outcomes:
+            if ok:
+                unit.future.set_result(value)
+            else:
+                unit.future.set_exception(value)
+
+        with self._lock:
+            self._batches += 1
+            self._units += len(batch)
+            self._max_batch_seen = max(self._max_batch_seen, len(batch))
+            self._commit_seconds += elapsed
+            self._max_commit_seconds = max(self._max_commit_seconds, elapsed)
+
+    def stats(self):
+        """Batch sizes and per-batch latency (running the units plus the commit)."""
+        with self._lock:
+            return {
+                "batches": self._batches,
+                "units": self._units,
+                "queued": self._queue.qsize(),
+                "avg_batch_size": self._units / self._batches if self._batches else 0.0,
+                "max_batch_size": self._max_batch_seen,
+                "avg_commit_seconds": self._commit_seconds / self._batches if self._batches else 0.0,
+                "max_commit_seconds": self._max_commit_seconds,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+group_commit = GroupCommitQueue(
+    max_batch=settings.group_commit_max_batch,
+    window_ms=settings.group_commit_window_ms,
+) if settings.group_commit else None
+
+def run_write(db: Session, fn, *args, **kwargs):
+    """Run the crud write fn(db, ...) directly, or through group commit when enabled.
+
+    Async endpoints always write directly: their session runs on the event
+    loop, which must not block on the writer thread.
+    """
+    if group_commit is None or db.info.get("async"):
+        return fn(db, *args, **kwargs)
+    return group_commit.run(fn, *args, **kwargs)
@@ -0,0 +1,93 @@
+"""Throughput of an authenticated endpoint as concurrent clients increase.
+
+Starts the API on a scratch SQLite database (or targets --url), then issues
+GET /projects/ from 1, 2, 4, ... concurrent clients and prints requests per
+second for each level. With the auth dependency off the event loop,
+throughput should grow with concurrency until the thread pool saturates,
+rather than staying flat.
+
+--lookup-delay adds a sleep to every user lookup to stand in for a remote
+database; the user cache is disabled so every request pays it.
+
+    python benchmarks/auth_concurrency.py --requests 400 --lookup-delay 0.005
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..", "backend")
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(lookup_delay):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='blitzit-bench-')}/bench.db"
+    os.environ["USER_CACHE_SIZE"] = "0"
+    sys.path.insert(0, BACKEND_DIR)
+    import uvicorn
+    import crud
+    from main import app
+
+    if lookup_delay:
+        lookup = crud.get_user_by_username
+
+        def slow_lookup(db, username):
+            time.sleep(lookup_delay)
+            return lookup(db, username)
+        crud.get_user_by_username = slow_lookup
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+async def run_level(client, headers, concurrency, total):
+    remaining = iter(range(total))
+
+    async def worker():
+        for _ in remaining:
+            response = await client.get("/projects/", headers=headers)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return total / (time.perf_counter() - start)
+
+async def main(url, total, levels, username, password):
+    import httpx
+
+    async with httpx.AsyncClient(base_url=url, timeout=30) as client:
+        await client.post("/auth/register", json={
+            "email": f"{username}@example.com", "username": username, "password": password,
+        })
+        token = (await client.post("/auth/token", data={"username": username, "password": password})).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        await run_level(client, headers, 1, min(total, 20))  # warm up
+        print(f"{'clients':>8} {'req/s':>10}")
+        for concurrency in levels:
+            rate = await run_level(client, headers, concurrency, total)
+            print(f"{concurrency:>8} {rate:>10.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Authenticated-request throughput by client concurrency")
+    parser.add_argument("--url", help="Benchmark a running server instead of starting one")
+    parser.add_argument("--requests", type=int, default=400, help="Requests per concurrency level")
+    parser.add_argument("--levels", default="1,2,4,8,16", help="Comma-separated client counts")
+    parser.add_argument("--lookup-delay", type=float, default=0.0, help="Seconds added to each user lookup")
+    parser.add_argument("--username", default="bench")
+    parser.add_argument("--password", default="bench-password")
+    args = parser.parse_args()
+
+    url = args.url or start_server(args.lookup_delay)
+    levels = [int(level) for level in args.levels.split(",")]
+    asyncio.run(main(url, args.requests, levels, args.username, args.password))
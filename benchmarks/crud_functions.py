@@ -0,0 +1,314 @@
+"""Microbenchmarks for every public function in crud.py, across data sizes.
+
+For each --sizes total task count, a synthetic database is generated with
+dataset.py: --tasks-per-user tasks per user, so a larger size means more
+users around the same board. Generated databases are kept in --data-dir
+and reused by later runs. Each run works on a fresh copy, so the writes
+of one run never leak into the next. Every case then calls its crud
+function on user 1, --rounds times, after one warm-up call, and records:
+
+- time per call, median and minimum, in microseconds
+- SQL statements issued per call
+- peak Python memory allocated during one call, via tracemalloc
+
+Setup, such as creating the task a delete will remove, is never timed.
+The results go to --output as JSON, one row per function and size. The
+table shows, for each function, how its median grows with the table:
+`scaling` is the log-log slope between the smallest and largest size.
+About 0 means the cost is independent of the table size (an index does
+its job). About 1 means it grows linearly (a scan). --compare takes an
+earlier output file and shows each median's change against it.
+
+    python benchmarks/crud_functions.py --sizes 1000,100000,1000000 --output crud.json
+    python benchmarks/crud_functions.py --sizes 1000,100000 --only get_tasks,update_task --compare crud.json
+
+Generating 1M tasks takes several minutes the first time.
+"""
+import argparse
+import inspect
+import json
+import math
+import os
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from itertools import count
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import sessionmaker
+from database import create_db_engine
+from models import Project, Task, SubTask, ArchivedTask
+from schemas import UserCreate, ProjectCreate, TaskCreate, SubTaskCreate, BulkTaskOperation, TaskUpdate
+from dataset import PASSWORD, generate
+import crud
+
+USER_ID = 1
+_serial = count()
+
+class Context:
+    """Ids on user 1's board, read once per database."""
+
+    def __init__(self, db):
+        self.project_id = db.scalar(select(Project.id).where(Project.owner_id == USER_ID).order_by(Project.id))
+        self.task_ids = list(db.scalars(
+            select(Task.id).where(Task.owner_id == USER_ID, Task.column != "Done").order_by(Task.column, Task.rank)
+        ))
+        self.parent_id = db.scalar(
+            select(SubTask.parent_task_id).join(Task, Task.id == SubTask.parent_task_id)
+            .where(Task.owner_id == USER_ID).limit(1)
+        ) or self.task_ids[0]
+        self.subtask_id = db.scalar(select(SubTask.id).where(SubTask.parent_task_id == self.parent_id).limit(1))
+
+    def task(self, n):
+        return self.task_ids[n % len(self.task_ids)]
+
+def _new_task(db, ctx, **fields):
+    task = crud.create_task(db, TaskCreate(title="bench task", project_id=ctx.project_id, **fields), USER_ID)
+    return task.id
+
+def _new_project_with_tasks(db, ctx, tasks=50):
+    project = crud.create_project(db, ProjectCreate(name=f"bench {next(_serial)}"), USER_ID)
+    for n in range(tasks):
+        crud.create_task(db, TaskCreate(title=f"bench {n}", project_id=project.id), USER_ID)
+    return project.id
+
+def _deleted_project(db, ctx):
+    project_id = _new_project_with_tasks(db, ctx)
+    db.query(Project).filter(Project.id == project_id).update({"deleted_at": datetime.utcnow()})
+    db.commit()
+    return project_id
+
+def _archived_task(db):
+    """An archived task of user 1, archiving a batch first when there is none."""
+    task_id = db.scalar(select(ArchivedTask.id).where(ArchivedTask.owner_id == USER_ID).limit(1))
+    if task_id is None:
+        crud.archive_completed_tasks(db, datetime.utcnow(), 100, user_id=USER_ID)
+        task_id = db.scalar(select(ArchivedTask.id).where(ArchivedTask.owner_id == USER_ID).limit(1))
+    return task_id
+
+def _user_with_archive(db):
+    _archived_task(db)
+    return USER_ID
+
+# crud function name -> setup(db, ctx) returning its arguments after db
+CASES = {
+    "get_user_by_email": lambda db, ctx: ("load1@example.com",),
+    "get_user_by_username": lambda db, ctx: ("load1",),
+    "create_user": lambda db, ctx: (UserCreate(
+        email=f"bench{next(_serial)}-{time.time_ns()}@example.com",
+        username=f"bench{next(_serial)}-{time.time_ns()}", password=PASSWORD),),
+    "get_user": lambda db, ctx: (USER_ID,),
+    "update_user": lambda db, ctx: (USER_ID, {"full_name": f"Load User {next(_serial)}"}),
+    "set_user_active": lambda db, ctx: (USER_ID, True),
+    "verify_password": lambda db, ctx: (PASSWORD, crud.get_user(db, USER_ID).hashed_password),
+    "authenticate_user": lambda db, ctx: ("load1", PASSWORD),
+    "get_revision": lambda db, ctx: (USER_ID,),
+    "get_changes": lambda db, ctx: (USER_ID, max(0, crud.get_revision(db, USER_ID) - 5)),
+    "get_projects": lambda db, ctx: (USER_ID,),
+    "get_project_rows": lambda db, ctx: (USER_ID,),
+    "create_project": lambda db, ctx: (ProjectCreate(name="bench"), USER_ID),
+    "get_project": lambda db, ctx: (ctx.project_id, USER_ID),
+    "update_project": lambda db, ctx: (ctx.project_id, {"description": f"bench {next(_serial)}"}, USER_ID),
+    "delete_project": lambda db, ctx: (_new_project_with_tasks(db, ctx), USER_ID),
+    "get_deleted_project_ids": lambda db, ctx: (),
+    "purge_deleted_project": lambda db, ctx: (_deleted_project(db, ctx), 1000),
+    "rebuild_task_counters": lambda db, ctx: (USER_ID,),
+    "get_tasks": lambda db, ctx: (USER_ID,),
+    "get_task_rows": lambda db, ctx: (USER_ID,),
+    "get_subtask_counts": lambda db, ctx: (ctx.task_ids,),
+    "search_tasks": lambda db, ctx: (USER_ID, "quarterly report"),
+    "create_task": lambda db, ctx: (TaskCreate(title="bench task", project_id=ctx.project_id), USER_ID),
+    "get_task": lambda db, ctx: (ctx.task(next(_serial)), USER_ID),
+    "get_task_with_subtasks": lambda db, ctx: (ctx.parent_id, USER_ID),
+    "update_task": lambda db, ctx: (ctx.task(next(_serial)), {"notes": f"bench {next(_serial)}"}, USER_ID),
+    "position_task": lambda db, ctx: (ctx.task_ids[1], USER_ID, None, ctx.task_ids[0]) if next(_serial) % 2
+        else (ctx.task_ids[0], USER_ID, None, ctx.task_ids[1]),
+    "rebalance_ranks": lambda db, ctx: (USER_ID, "Backlog"),
+    "delete_task": lambda db, ctx: (_new_task(db, ctx), USER_ID),
+    "bulk_task_operations": lambda db, ctx: ([
+        BulkTaskOperation(op="update", id=ctx.task(next(_serial)), changes=TaskUpdate(is_urgent=bool(n % 2)))
+        for n in range(20)
+    ] + [BulkTaskOperation(op="delete", id=_new_task(db, ctx)) for _ in range(5)], USER_ID),
+    "archive_completed_tasks": lambda db, ctx: (datetime.utcnow() - timedelta(days=30), 100, USER_ID),
+    "get_archived_tasks": lambda db, ctx: (_user_with_archive(db),),
+    "restore_task": lambda db, ctx: (_archived_task(db), USER_ID),
+    "get_subtasks": lambda db, ctx: (ctx.parent_id, USER_ID),
+    "create_subtask": lambda db, ctx: (SubTaskCreate(title="bench", parent_task_id=ctx.parent_id), USER_ID),
+    "update_subtask": lambda db, ctx: (ctx.subtask_id, {"is_completed": bool(next(_serial) % 2)}, USER_ID),
+    "delete_subtask": lambda db, ctx: (
+        crud.create_subtask(db, SubTaskCreate(title="bench", parent_task_id=ctx.parent_id), USER_ID).id, USER_ID),
+    "get_reminder_times": lambda db, ctx: (datetime.utcnow() + timedelta(hours=1), datetime.utcnow()),
+    "claim_due_reminders": lambda db, ctx: (
+        [_new_task(db, ctx, due_date=datetime.utcnow(), reminder_enabled=True)], datetime.utcnow()),
+    "get_dashboard_stats": lambda db, ctx: (USER_ID,),
+    "get_trends": lambda db, ctx: (USER_ID, date.today() - timedelta(days=365), date.today(), "week"),
+}
+# Password hashing is deliberately slow; a few rounds show all there is to see
+ROUNDS = {"create_user": 3, "verify_password": 3, "authenticate_user": 3}
+# Functions that take no session
+SESSIONLESS = {"verify_password"}
+
+def uncovered():
+    """Public crud functions without a case, so the suite keeps up with crud.py."""
+    return sorted(
+        name for name, fn in vars(crud).items()
+        if inspect.isfunction(fn) and fn.__module__ == "crud" and not name.startswith("_") and name not in CASES
+    )
+
+def database(data_dir, size, tasks_per_user, seed):
+    """A working copy of the generated database for `size` tasks, generating it once."""
+    path = os.path.join(data_dir, f"crud-{size}-{tasks_per_user}-{seed}.db")
+    if not os.path.exists(path):
+        start = time.perf_counter()
+        engine = create_db_engine(f"sqlite:///{path}.partial")
+        generate(engine, max(1, size // tasks_per_user), 4, min(size, tasks_per_user), 1.5, seed)
+        engine.dispose()
+        with sqlite3.connect(f"{path}.partial") as conn:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        os.replace(f"{path}.partial", path)
+        _remove(f"{path}.partial")
+        print(f"generated {size} tasks in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    working = os.path.join(data_dir, f"run-{os.getpid()}.db")
+    shutil.copyfile(path, working)
+    return working
+
+def _remove(path):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+def measure(Session, engine, ctx, name, rounds):
+    fn = getattr(crud, name)
+    setup = CASES[name]
+    statements = []
+    times = []
+    issued = 0
+
+    def counted(conn, cursor, statement, parameters, context, executemany):
+        nonlocal issued
+        issued += 1
+
+    event.listen(engine, "before_cursor_execute", counted)
+    try:
+        for n in range(rounds + 2):
+            db = Session()
+            try:
+                args = setup(db, ctx)
+                if name not in SESSIONLESS:
+                    args = (db, *args)
+                issued = 0
+                if n == rounds + 1:
+                    # Separately, as tracemalloc slows every allocation
+                    tracemalloc.start()
+                    fn(*args)
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                else:
+                    start = time.perf_counter()
+                    fn(*args)
+                    if n:  # the first call warms caches and is not counted
+                        times.append(time.perf_counter() - start)
+                statements.append(issued)
+            finally:
+                db.close()
+    finally:
+        event.remove(engine, "before_cursor_execute", counted)
+    return {
+        "rounds": rounds,
+        "median_us": round(statistics.median(times) * 1e6, 1),
+        "min_us": round(min(times) * 1e6, 1),
+        "statements": statistics.median(statements[1:-1]),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+def scaling(by_size):
+    """log-log slope of the median time between the smallest and largest size."""
+    (small, first), (large, last) = by_size[0], by_size[-1]
+    if large == small or first <= 0 or last <= 0:
+        return None
+    return round(math.log(last / first) / math.log(large / small), 2)
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time, statements and memory of each crud function by data size")
+    parser.add_argument("--sizes", default="1000,100000,1000000", help="Total task counts, comma separated")
+    parser.add_argument("--tasks-per-user", type=int, default=250)
+    parser.add_argument("--rounds", type=int, default=25)
+    parser.add_argument("--only", help="Comma separated function names")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "blitzit-bench"))
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="An earlier --output file to compare medians against")
+    args = parser.parse_args()
+
+    missing = uncovered()
+    if missing:
+        print(f"no benchmark for: {', '.join(missing)}", file=sys.stderr)
+    names = args.only.split(",") if args.only else list(CASES)
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+    os.makedirs(args.data_dir, exist_ok=True)
+
+    results = []
+    for size in sizes:
+        path = database(args.data_dir, size, args.tasks_per_user, args.seed)
+        engine = create_db_engine(f"sqlite:///{path}")
+        Session = sessionmaker(bind=engine, autoflush=False)
+        try:
+            with Session() as db:
+                ctx = Context(db)
+            for name in names:
+                row = measure(Session, engine, ctx, name, ROUNDS.get(name, args.rounds))
+                results.append({"function": name, "tasks": size, **row})
+                print(f"{size:>9} {name:<24} {row['median_us']:>11.1f} us {row['statements']:>5} stmts "
+                      f"{row['peak_kib']:>9.1f} KiB", file=sys.stderr)
+        finally:
+            engine.dispose()
+            _remove(path)
+
+    previous = {}
+    if args.compare:
+        with open(args.compare) as f:
+            previous = {(row["function"], row["tasks"]): row for row in json.load(f)["results"]}
+
+    print(f"\n{'function':<24}" + "".join(f"{f'{size} tasks':>16}" for size in sizes) + f"{'scaling':>9}")
+    for name in names:
+        rows = [row for row in results if row["function"] == name]
+        cells = []
+        for row in rows:
+            cell = f"{row['median_us']:.0f}us"
+            before = previous.get((name, row["tasks"]))
+            if before and before["median_us"]:
+                cell += f" {(row['median_us'] / before['median_us'] - 1) * 100:+.0f}%"
+            cells.append(f"{cell:>16}")
+        slope = scaling([(row["tasks"], row["median_us"]) for row in rows])
+        print(f"{name:<24}" + "".join(cells) + f"{'' if slope is None else slope:>9}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "commit": git_commit(),
+                "at": datetime.utcnow().isoformat(),
+                "python": sys.version.split()[0],
+                "sqlite": sqlite3.sqlite_version,
+                "tasks_per_user": args.tasks_per_user,
+                "results": results,
+                "scaling": {
+                    name: scaling([(row["tasks"], row["median_us"]) for row in results if row["function"] == name])
+                    for name in names
+                },
+            }, f, indent=2)
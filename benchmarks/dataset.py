@@ -0,0 +1,165 @@
+"""Seeded synthetic data: users x projects x tasks x subtasks.
+
+The distributions follow how the board is used:
+- Columns: about a third of tasks in Backlog, a third Done, and the rest
+  in This Week and Today.
+- Creation dates spread over the last two years.
+- Completion dates fall after creation, mostly within a few weeks.
+- About 40% of tasks have a due date, within the past month to two months
+  ahead. Some pending ones are overdue. 30% of those have a reminder, and
+  the ones still to come have their fire time set.
+- Notes are often empty and otherwise long-tailed (lognormal size).
+- Estimates come from the app's usual choices. Actual minutes scatter
+  around the estimate for done tasks.
+- Subtask counts are geometric around the requested mean.
+
+Every user's password is PASSWORD. The same --seed gives the same data.
+Rows are inserted in bulk. The task counters, daily rollup and search
+index are then built in one pass each, as upgrade_schema would for an
+existing database.
+
+    python benchmarks/dataset.py --url sqlite:///./load.db --users 200 --projects 4 --tasks 250 --subtasks 2
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+PASSWORD = "load-test-password"
+COLUMNS = ["Backlog", "This Week", "Today", "Done"]
+COLUMN_WEIGHTS = [35, 20, 10, 35]
+PRIORITIES = [None, "Low", "Medium", "High"]
+TASK_TYPES = [None, "Work", "Personal", "Other"]
+ESTIMATES = [0, 15, 30, 45, 60, 90, 120, 240]
+WORDS = (
+    "review draft report meeting budget invoice email call plan design test deploy fix bug write "
+    "update clean order book pay send check prepare schedule quarterly weekly client team release "
+    "roadmap notes follow up backlog grocery gym dentist renew insurance taxes trip slides"
+).split()
+
+def _sentence(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+def _notes(rng):
+    if rng.random() < 0.45:
+        return None
+    return _sentence(rng, max(1, int(rng.lognormvariate(2.5, 1.0))))
+
+def _task(rng, now, owner_id, project_id):
+    column = rng.choices(COLUMNS, COLUMN_WEIGHTS)[0]
+    created_at = now - timedelta(minutes=rng.randint(0, 730 * 24 * 60))
+    completed_at = None
+    if column == "Done":
+        completed_at = min(now, created_at + timedelta(minutes=int(rng.expovariate(1 / (14 * 24 * 60)))))
+    due_date = None
+    if rng.random() < 0.4:
+        due_date = now + timedelta(days=rng.uniform(-30, 60))
+    estimate = rng.choice(ESTIMATES)
+    actual = int(estimate * rng.uniform(0.5, 1.8)) if column == "Done" and estimate else 0
+    reminder_enabled = due_date is not None and rng.random() < 0.3
+    reminder_offset = rng.choice([0, 15, 60, 1440])
+    remind_at = None
+    if reminder_enabled and column != "Done" and due_date - timedelta(minutes=reminder_offset) > now:
+        remind_at = due_date - timedelta(minutes=reminder_offset)
+    return {
+        "title": _sentence(rng, rng.randint(2, 7)),
+        "notes": _notes(rng),
+        "column": column,
+        "estimated_time": estimate,
+        "actual_time": actual,
+        "task_type": rng.choice(TASK_TYPES),
+        "task_priority": rng.choice(PRIORITIES),
+        "due_date": due_date,
+        "reminder_enabled": reminder_enabled,
+        "reminder_offset": reminder_offset,
+        "remind_at": remind_at,
+        "is_urgent": rng.random() < 0.2,
+        "is_important": rng.random() < 0.3,
+        "project_id": project_id,
+        "owner_id": owner_id,
+        "created_at": created_at,
+        "updated_at": completed_at or created_at,
+        "completed_at": completed_at,
+    }
+
+def generate(engine, users: int, projects: int, tasks: int, subtasks: float, seed: int = 0):
+    """Fill an empty database; `tasks` is per user and `subtasks` the mean per task."""
+    from sqlalchemy import insert, select
+    from sqlalchemy.orm import Session
+    from hashing import pwd_context
+    from migrations import backfill_daily_stats
+    from models import Base, User, Project, Task, SubTask
+    from ranks import evenly_spaced_keys
+    from search import install_search_index
+    import crud
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    hashed_password = pwd_context.hash(PASSWORD)
+    Base.metadata.create_all(bind=engine)
+
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": n, "email": f"load{n}@example.com", "username": f"load{n}", "full_name": f"Load User {n}",
+             "hashed_password": hashed_password, "is_active": True, "created_at": now - timedelta(days=730)}
+            for n in range(1, users + 1)
+        ])
+        conn.execute(insert(Project), [
+            {"id": (owner_id - 1) * projects + n, "name": _sentence(rng, 2), "owner_id": owner_id,
+             "created_at": now - timedelta(days=730), "updated_at": now - timedelta(days=730)}
+            for owner_id in range(1, users + 1) for n in range(1, projects + 1)
+        ])
+        for owner_id in range(1, users + 1):
+            rows = [
+                _task(rng, now, owner_id, (owner_id - 1) * projects + rng.randint(1, projects))
+                for _ in range(tasks)
+            ]
+            by_column = {}
+            for row in sorted(rows, key=lambda row: row["created_at"]):
+                by_column.setdefault(row["column"], []).append(row)
+            for column_rows in by_column.values():
+                for row, rank in zip(column_rows, evenly_spaced_keys(len(column_rows))):
+                    row["rank"] = rank
+            conn.execute(insert(Task), rows)
+
+        if subtasks > 0:
+            batch = []
+            continue_probability = subtasks / (subtasks + 1)
+            for task_id, created_at in conn.execute(select(Task.id, Task.created_at)):
+                count = 0
+                while rng.random() < continue_probability:
+                    count += 1
+                for rank in evenly_spaced_keys(count) if count else ():
+                    batch.append({"title": _sentence(rng, rng.randint(1, 4)), "is_completed": rng.random() < 0.4,
+                                  "parent_task_id": task_id, "rank": rank, "created_at": created_at})
+                if len(batch) >= 10000:
+                    conn.execute(insert(SubTask), batch)
+                    batch = []
+            if batch:
+                conn.execute(insert(SubTask), batch)
+
+    backfill_daily_stats(engine)
+    install_search_index(engine)
+    with Session(engine) as db:
+        crud.rebuild_task_counters(db)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic Blitzit database")
+    parser.add_argument("--url", required=True, help="An empty (scratch!) database URL")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--projects", type=int, default=4, help="Projects per user")
+    parser.add_argument("--tasks", type=int, default=250, help="Tasks per user")
+    parser.add_argument("--subtasks", type=float, default=1.5, help="Mean subtasks per task")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from database import create_db_engine
+
+    start = time.perf_counter()
+    engine = create_db_engine(args.url)
+    generate(engine, args.users, args.projects, args.tasks, args.subtasks, args.seed)
+    print(f"{args.users} users, {args.users * args.tasks} tasks in {time.perf_counter() - start:.1f}s")
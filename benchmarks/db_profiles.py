@@ -0,0 +1,121 @@
+"""Concurrent read/write throughput of the database engine profiles.
+
+Each profile gets a fresh SQLite file seeded with tasks. Reader threads
+list a user's board page while writer threads update tasks, for a fixed
+duration, and the reads and writes per second are reported. The profiles:
+
+- default: SQLite's own defaults (rollback journal, synchronous=FULL)
+- tuned:   the settings defaults (WAL, synchronous=NORMAL, mmap, cache)
+
+--url adds a server database (e.g. Postgres) run with the pool settings.
+
+    python benchmarks/db_profiles.py --readers 4 --writers 2 --seconds 5
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from sqlalchemy.orm import sessionmaker
+from config import Settings
+from database import create_db_engine
+from models import Base, User, Project, Task
+
+PROFILES = {
+    "default": Settings(sqlite_journal_mode="DELETE", sqlite_synchronous="FULL",
+                        sqlite_mmap_size=0, sqlite_cache_size=-2000),
+    "tuned": Settings(),
+}
+
+def seed(Session, users, tasks_per_user):
+    db = Session()
+    for n in range(users):
+        user = User(email=f"bench{n}@example.com", username=f"bench{n}", hashed_password="x")
+        db.add(user)
+        db.flush()
+        project = Project(name="bench", owner_id=user.id)
+        db.add(project)
+        db.flush()
+        db.add_all(
+            Task(title=f"task {i}", column="Backlog", owner_id=user.id, project_id=project.id)
+            for i in range(tasks_per_user)
+        )
+    db.commit()
+    task_ids = [task_id for (task_id,) in db.query(Task.id)]
+    db.close()
+    return task_ids
+
+def run(Session, task_ids, users, readers, writers, seconds):
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def reader():
+        db = Session()
+        done = 0
+        while time.perf_counter() < deadline:
+            owner_id = random.randint(1, users)
+            db.query(Task).filter(Task.owner_id == owner_id).order_by(Task.id).limit(50).all()
+            db.rollback()
+            done += 1
+        db.close()
+        with lock:
+            counts["reads"] += done
+
+    def writer():
+        db = Session()
+        done = errors = 0
+        while time.perf_counter() < deadline:
+            try:
+                db.query(Task).filter(Task.id == random.choice(task_ids)).update(
+                    {"title": f"renamed {time.perf_counter()}"}, synchronize_session=False
+                )
+                db.commit()
+                done += 1
+            except Exception:
+                db.rollback()
+                errors += 1
+        db.close()
+        with lock:
+            counts["writes"] += done
+            counts["errors"] += errors
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {key: value / seconds if key != "errors" else value for key, value in counts.items()}
+
+def bench(name, url, profile, args):
+    engine = create_db_engine(url, profile)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+    task_ids = seed(Session, args.users, args.tasks)
+    result = run(Session, task_ids, args.users, args.readers, args.writers, args.seconds)
+    engine.dispose()
+    print(f"{name:>10} {result['reads']:>10.0f} {result['writes']:>10.0f} {result['errors']:>8}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Read/write throughput per database profile")
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--tasks", type=int, default=500, help="Tasks per user")
+    parser.add_argument("--url", help="Also benchmark this (scratch!) server database")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="blitzit-profiles-")
+    print(f"{'profile':>10} {'reads/s':>10} {'writes/s':>10} {'errors':>8}")
+    for name, profile in PROFILES.items():
+        bench(name, f"sqlite:///{directory}/{name}.db", profile, args)
+    if args.url:
+        bench("server", args.url, Settings(), args)
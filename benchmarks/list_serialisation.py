@@ -0,0 +1,94 @@
+"""Microseconds per task to build a GET /tasks/ response body.
+
+Seeds one user's board with --tasks tasks in a scratch SQLite file, then
+times both ways of producing the JSON for the whole list:
+
+- models: crud.get_tasks loads ORM objects, then, as FastAPI does for a
+  response_model, they are validated into List[TaskListItem], dumped in
+  JSON mode and encoded with the json module
+- fast:   crud.get_task_rows reads column tuples into dicts and orjson
+  encodes them (fastjson.py)
+
+Each is reported as query time and serialisation time per task.
+
+    python benchmarks/list_serialisation.py --tasks 5000
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+import orjson
+from pydantic import TypeAdapter
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+from database import create_db_engine
+from models import Base, User, Project, Task
+from schemas import TaskListItem
+import crud
+
+def seed(engine, tasks):
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": 1, "email": "bench@example.com", "username": "bench", "hashed_password": "x"}])
+        conn.execute(insert(Project), [{"id": 1, "name": "bench", "owner_id": 1}])
+        conn.execute(insert(Task), [
+            {
+                "title": f"Task number {n}", "notes": "Some notes about the task " * 3,
+                "column": "Backlog", "estimated_time": 30, "actual_time": 0, "task_priority": "Medium",
+                "owner_id": 1, "project_id": 1, "rank": f"{n:06d}",
+            }
+            for n in range(tasks)
+        ])
+
+def models_path(db):
+    adapter = TypeAdapter(List[TaskListItem])
+    start = time.perf_counter()
+    tasks = crud.get_tasks(db, 1)
+    loaded = time.perf_counter()
+    body = json.dumps(
+        adapter.dump_python(adapter.validate_python(tasks), mode="json"),
+        ensure_ascii=False, allow_nan=False, separators=(",", ":"),
+    ).encode()
+    return loaded - start, time.perf_counter() - loaded, body
+
+def fast_path(db):
+    start = time.perf_counter()
+    rows = crud.get_task_rows(db, 1)
+    loaded = time.perf_counter()
+    body = orjson.dumps(rows)
+    return loaded - start, time.perf_counter() - loaded, body
+
+def measure(Session, path, repeat, tasks):
+    query_times, encode_times = [], []
+    for _ in range(repeat):
+        db = Session()
+        query_seconds, encode_seconds, body = path(db)
+        db.close()
+        query_times.append(query_seconds)
+        encode_times.append(encode_seconds)
+    per_task = lambda seconds: statistics.median(seconds) / tasks * 1e6
+    return per_task(query_times), per_task(encode_times), body
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-task cost of the task list response")
+    parser.add_argument("--tasks", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=15)
+    args = parser.parse_args()
+
+    engine = create_db_engine(f"sqlite:///{tempfile.mkdtemp(prefix='blitzit-json-')}/bench.db")
+    Base.metadata.create_all(bind=engine)
+    seed(engine, args.tasks)
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    results = {name: measure(Session, path, args.repeat, args.tasks) for name, path in (("models", models_path), ("fast", fast_path))}
+    assert results["models"][2] == results["fast"][2], "the two paths must produce the same JSON"
+    print(f"{args.tasks} tasks, µs per task (median of {args.repeat})")
+    print(f"{'path':>8} {'query':>8} {'encode':>8} {'total':>8}")
+    for name, (query_us, encode_us, _) in results.items():
+        print(f"{name:>8} {query_us:>8.2f} {encode_us:>8.2f} {query_us + encode_us:>8.2f}")
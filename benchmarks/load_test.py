@@ -0,0 +1,201 @@
+"""End-to-end load test of the API, in process.
+
+Generates a synthetic database (dataset.py) unless --database points at
+one. It then drives the ASGI app with httpx from --clients concurrent
+virtual users for --seconds. Each user logs in once, then replays a
+weighted mix of what the apps do:
+
+- board:     GET /tasks/?include=subtask_counts, the whole board
+- column:    GET /tasks/?column=Today
+- dashboard: GET /dashboard/stats, revalidated with If-None-Match as a poller would
+- drag:      PUT /tasks/{id}/position within a column
+- complete:  PUT /tasks/{id}/move?column=Done
+- login:     POST /auth/token
+
+The report shows requests per second and p50/p95/p99 latency per
+operation. --save writes it as a JSON baseline. --baseline compares a
+run against one and exits non-zero when an operation's p95 regressed by
+more than --tolerance.
+
+    python benchmarks/load_test.py --users 200 --clients 16 --seconds 20 --save baseline.json
+    python benchmarks/load_test.py --users 200 --clients 16 --seconds 20 --baseline baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..", "backend")
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, BACKEND_DIR)
+
+MIX = {"board": 25, "column": 15, "dashboard": 30, "drag": 15, "complete": 10, "login": 5}
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+class VirtualUser:
+    def __init__(self, client, username, password, rng):
+        self.client = client
+        self.username = username
+        self.password = password
+        self.rng = rng
+        self.headers = {}
+        self.etag = None
+        self.tasks = {}  # column -> [task ids in rank order]
+
+    async def login(self):
+        response = await self.client.post("/auth/token", data={"username": self.username, "password": self.password})
+        response.raise_for_status()
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        return response
+
+    async def board(self):
+        response = await self.client.get("/tasks/", params={"include": "subtask_counts"}, headers=self.headers)
+        self.tasks = {}
+        for task in sorted(response.json(), key=lambda task: task["rank"] or ""):
+            self.tasks.setdefault(task["column"], []).append(task["id"])
+        return response
+
+    async def column(self):
+        return await self.client.get("/tasks/", params={"column": "Today"}, headers=self.headers)
+
+    async def dashboard(self):
+        headers = {**self.headers, **({"If-None-Match": self.etag} if self.etag else {})}
+        response = await self.client.get("/dashboard/stats", headers=headers)
+        self.etag = response.headers.get("etag", self.etag)
+        return response
+
+    async def drag(self):
+        columns = [ids for column, ids in self.tasks.items() if column != "Done" and len(ids) > 2]
+        if not columns:
+            return await self.board()
+        ids = self.rng.choice(columns)
+        task_id = ids.pop(self.rng.randrange(len(ids)))
+        index = self.rng.randrange(len(ids) + 1)
+        body = {"after_id": ids[index - 1] if index > 0 else None, "before_id": ids[index] if index < len(ids) else None}
+        ids.insert(index, task_id)
+        response = await self.client.put(f"/tasks/{task_id}/position", json=body, headers=self.headers)
+        if response.status_code == 409:
+            # Our view went stale; a real client refetches
+            await self.board()
+        return response
+
+    async def complete(self):
+        pending = [(column, ids) for column, ids in self.tasks.items() if column != "Done" and ids]
+        if not pending:
+            return await self.board()
+        column, ids = self.rng.choice(pending)
+        task_id = ids.pop()
+        self.tasks.setdefault("Done", []).append(task_id)
+        return await self.client.put(f"/tasks/{task_id}/move", params={"column": "Done"}, headers=self.headers)
+
+async def run(app, users, clients, seconds, seed):
+    import httpx
+    from dataset import PASSWORD
+
+    latencies = {name: [] for name in MIX}
+    errors = {name: 0 for name in MIX}
+    names, weights = zip(*MIX.items())
+    transport = httpx.ASGITransport(app=app)
+
+    async def client_loop(n, deadline):
+        rng = random.Random(seed * 1000 + n)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=60) as client:
+            user = VirtualUser(client, f"load{rng.randint(1, users)}", PASSWORD, rng)
+            await user.login()
+            await user.board()
+            while time.perf_counter() < deadline:
+                name = rng.choices(names, weights)[0]
+                start = time.perf_counter()
+                response = await getattr(user, name)()
+                latencies[name].append(time.perf_counter() - start)
+                if response.status_code >= 400 and response.status_code != 409:
+                    errors[name] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop(n, start + seconds) for n in range(clients)))
+    elapsed = time.perf_counter() - start
+
+    report = {}
+    for name in names:
+        values = sorted(latencies[name])
+        report[name] = {
+            "requests": len(values),
+            "errors": errors[name],
+            "rps": round(len(values) / elapsed, 2),
+            "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+        }
+    total = sum(len(values) for values in latencies.values())
+    report["total"] = {"requests": total, "errors": sum(errors.values()), "rps": round(total / elapsed, 2)}
+    return report
+
+def print_report(report, baseline=None):
+    print(f"{'operation':>10} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  vs baseline p95")
+    for name, row in report.items():
+        if name == "total":
+            continue
+        change = ""
+        if baseline and name in baseline and baseline[name]["p95_ms"]:
+            change = f"{(row['p95_ms'] / baseline[name]['p95_ms'] - 1) * 100:+.0f}%"
+        print(f"{name:>10} {row['requests']:>9} {row['errors']:>7} {row['rps']:>8.1f} "
+              f"{row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f}  {change}")
+    total = report["total"]
+    print(f"{'total':>10} {total['requests']:>9} {total['errors']:>7} {total['rps']:>8.1f}")
+
+def regressions(report, baseline, tolerance):
+    """Operations whose p95 grew by more than `tolerance` (0.2 = 20%) over the baseline."""
+    return [
+        name for name, row in report.items()
+        if name in baseline and "p95_ms" in row and baseline[name]["p95_ms"]
+        and row["p95_ms"] > baseline[name]["p95_ms"] * (1 + tolerance)
+    ]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="In-process API load test with a replayed client mix")
+    parser.add_argument("--database", help="Use this generated database URL instead of generating one")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--projects", type=int, default=4)
+    parser.add_argument("--tasks", type=int, default=200, help="Tasks per user")
+    parser.add_argument("--subtasks", type=float, default=1.5)
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent virtual users")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="Write the report to this JSON file")
+    parser.add_argument("--baseline", help="Compare against this saved report")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95 growth over the baseline")
+    args = parser.parse_args()
+
+    url = args.database or f"sqlite:///{tempfile.mkdtemp(prefix='blitzit-load-')}/load.db"
+    os.environ["DATABASE_URL"] = url
+    if not args.database:
+        from database import engine
+        from dataset import generate
+
+        start = time.perf_counter()
+        generate(engine, args.users, args.projects, args.tasks, args.subtasks, args.seed)
+        print(f"generated {args.users} users x {args.tasks} tasks in {time.perf_counter() - start:.1f}s")
+    from main import app
+
+    report = asyncio.run(run(app, args.users, args.clients, args.seconds, args.seed))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+    if baseline is not None:
+        slower = regressions(report, baseline, args.tolerance)
+        if slower:
+            print(f"p95 regressed more than {args.tolerance:.0%}: {', '.join(slower)}")
+            sys.exit(1)
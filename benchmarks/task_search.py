@@ -0,0 +1,91 @@
+"""Latency of GET /tasks/search's query over a large tasks table.
+
+Seeds a fresh SQLite file with --tasks tasks spread over --users users,
+builds the search index, then times crud.search_tasks for common words,
+rare words and prefixes, for one user and for a first and a later page.
+
+    python benchmarks/task_search.py --tasks 1000000 --users 1000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+from database import create_db_engine
+from migrations import upgrade_schema
+from models import Base, User, Project, Task
+import crud
+
+WORDS = (
+    "report review draft meeting budget invoice email call plan design test deploy fix bug "
+    "write read update clean order book pay send check prepare schedule quarterly weekly"
+).split()
+RARE = ["zanzibar", "quixotic", "marmalade"]
+
+def seed(engine, users, tasks):
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": n, "email": f"bench{n}@example.com", "username": f"bench{n}", "hashed_password": "x"}
+            for n in range(1, users + 1)
+        ])
+        conn.execute(insert(Project), [{"id": n, "name": "bench", "owner_id": n} for n in range(1, users + 1)])
+        batch = []
+        for n in range(tasks):
+            owner_id = n % users + 1
+            title = " ".join(random.choices(WORDS, k=4))
+            if random.random() < 0.001:
+                title += " " + random.choice(RARE)
+            batch.append({
+                "title": title, "notes": " ".join(random.choices(WORDS, k=12)),
+                "column": "Backlog", "owner_id": owner_id, "project_id": owner_id,
+            })
+            if len(batch) == 10000:
+                conn.execute(insert(Task), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(Task), batch)
+
+def timed(Session, user_id, query, pages, limit):
+    db = Session()
+    samples = []
+    for _ in range(20):
+        cursor = None
+        start = time.perf_counter()
+        for _ in range(pages):
+            tasks, cursor = crud.search_tasks(db, user_id, query, limit=limit, cursor=cursor)
+            if cursor is None:
+                break
+        samples.append((time.perf_counter() - start) * 1000)
+        db.rollback()
+    db.close()
+    return statistics.median(samples), max(samples)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Task search latency")
+    parser.add_argument("--tasks", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="blitzit-search-")
+    engine = create_db_engine(f"sqlite:///{directory}/search.db")
+    # Seed the plain tables first; upgrade_schema then indexes them in one rebuild
+    Base.metadata.create_all(bind=engine)
+    start = time.perf_counter()
+    seed(engine, args.users, args.tasks)
+    upgrade_schema(engine)
+    print(f"seeded and indexed {args.tasks} tasks in {time.perf_counter() - start:.1f}s")
+
+    Session = sessionmaker(bind=engine, autoflush=False)
+    print(f"{'query':>22} {'pages':>6} {'median ms':>10} {'max ms':>8}")
+    for query in ("report", "report review", "rev*", RARE[0], "quarterly weekly budget"):
+        for pages in (1, 3):
+            median, worst = timed(Session, 1, query, pages, args.limit)
+            print(f"{query:>22} {pages:>6} {median:>10.2f} {worst:>8.2f}")
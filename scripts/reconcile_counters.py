@@ -0,0 +1,38 @@
+import sys
+import os
+import argparse
+
+# Add the backend directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from database import SessionLocal, engine
+from migrations import upgrade_schema
+import crud
+
+# Bring an older database up to the current models, as the app does at startup
+upgrade_schema(engine)
+
+def reconcile_counters(user_id=None, dry_run=False):
+    db = SessionLocal()
+    try:
+        drift = crud.rebuild_task_counters(db, user_id=user_id, commit=not dry_run)
+    finally:
+        db.close()
+    
+    if not drift:
+        print("Task counters are consistent")
+        return 0
+    
+    for owner_id, column, stored, actual in sorted(drift):
+        print(f"user {owner_id} / {column}: stored tasks={stored[0]} due={stored[1]}, "
+              f"actual tasks={actual[0]} due={actual[1]}")
+    action = "found" if dry_run else "fixed"
+    print(f"\n{len(drift)} drifted counter(s) {action}")
+    return 1 if dry_run else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild per-user task counters from the tasks table")
+    parser.add_argument("--user-id", type=int, help="Only reconcile this user")
+    parser.add_argument("--dry-run", action="store_true", help="Report drift without fixing it")
+    args = parser.parse_args()
+    sys.exit(reconcile_counters(user_id=args.user_id, dry_run=args.dry_run))